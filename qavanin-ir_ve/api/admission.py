@@ -0,0 +1,206 @@
+import logging
+import math
+import os
+import threading
+import time
+from functools import partial
+import anyio
+import anyio.to_thread
+from fastapi import HTTPException, status
+from monitoring.metrics import ADMISSION_REJECTED, WORKLOAD_THREADS
+
+logger = logging.getLogger(__name__)
+
+# Workload classes, each with its own threads so one class can never starve the others:
+# model calls and CPU-heavy text processing, database reads, and database writes
+EMBED = "embed"
+DB_READ = "db_read"
+DB_WRITE = "db_write"
+
+# Default threads and queue length of each workload; the environment variables are
+# <WORKLOAD>_WORKERS and <WORKLOAD>_MAX_QUEUE, e.g. EMBED_WORKERS and EMBED_MAX_QUEUE
+_DEFAULTS = {
+    EMBED: (4, 32),
+    DB_READ: (16, 64),
+    DB_WRITE: (4, 32),
+}
+# Environment variable setting how long a call may wait for a thread before it is shed
+QUEUE_TIMEOUT_ENV = "ADMISSION_QUEUE_TIMEOUT_SECONDS"
+
+# Weight of the latest call in the running estimate of a workload's service time
+_SERVICE_TIME_SMOOTHING = 0.2
+
+
+class Overloaded(HTTPException):
+    """
+    Raised when a workload sheds a call: 429 if its queue is full, 503 if the call waited too long.
+
+    It is an HTTPException so FastAPI answers it directly, with a `Retry-After` header telling
+    clients when the queue should have drained.
+    """
+
+    def __init__(self, workload: str, status_code: int, retry_after: int):
+        super().__init__(status_code=status_code, detail=f"The {workload} workload is overloaded, retry later.",
+                         headers={"Retry-After": str(retry_after)})
+        self.workload = workload
+        self.retry_after = retry_after
+
+
+class WorkloadPool:
+    """
+    Bounded worker threads and bounded queue for one class of blocking calls.
+
+    Calls beyond `max_queue` waiting ones are rejected right away instead of piling up,
+    and calls that wait longer than `queue_timeout` for a thread are dropped, so the
+    latency of the admitted calls stays bounded when traffic spikes.
+    """
+
+    def __init__(self, name: str, workers: int, max_queue: int, queue_timeout: float = 5.0):
+        """
+        Initialize the pool.
+
+        Args:
+            name (str): The name of the workload, used in metrics and error messages.
+            workers (int): The number of calls running at once.
+            max_queue (int): The number of calls allowed to wait for a thread.
+            queue_timeout (float): The seconds a call may wait for a thread, or 0 for no limit (default: 5).
+        """
+        self.name = name
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.limiter = anyio.CapacityLimiter(workers)
+        # Admitted calls already hold a token of `limiter`; the threads get a limiter of their own
+        self._thread_limiter = anyio.CapacityLimiter(workers)
+        self._waiting = 0
+        self._seconds_per_call = None
+        self._lock = threading.Lock()
+
+    @property
+    def waiting(self) -> int:
+        """The number of calls waiting for a thread."""
+        return self._waiting
+
+    def retry_after(self) -> int:
+        """
+        Estimate when the calls queued now will have run.
+
+        Returns:
+            int: The estimate in whole seconds, at least 1.
+        """
+        seconds_per_call = self._seconds_per_call or 1.0
+        return max(1, math.ceil((self._waiting + 1) * seconds_per_call / self.limiter.total_tokens))
+
+    def _reject(self, reason: str, status_code: int):
+        ADMISSION_REJECTED.labels(self.name, reason).inc()
+        logger.warning(f"Shedding a {self.name} call: {reason} ({self._waiting} waiting).")
+        raise Overloaded(self.name, status_code, self.retry_after())
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Run a blocking function in one of the pool's threads.
+
+        Args:
+            func (callable): The function to run.
+            *args: The positional arguments passed to `func`.
+            **kwargs: The keyword arguments passed to `func`.
+
+        Returns:
+            The return value of `func`.
+
+        Raises:
+            Overloaded: If the queue is full or the call waited longer than `queue_timeout`.
+        """
+        if self.limiter.available_tokens == 0 and self._waiting >= self.max_queue:
+            self._reject("queue_full", status.HTTP_429_TOO_MANY_REQUESTS)
+
+        acquired = False
+        self._waiting += 1
+        try:
+            with anyio.move_on_after(self.queue_timeout or math.inf):
+                await self.limiter.acquire()
+                acquired = True
+        finally:
+            self._waiting -= 1
+        if not acquired:
+            self._reject("queue_timeout", status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        try:
+            start = time.perf_counter()
+            result = await anyio.to_thread.run_sync(partial(func, *args, **kwargs), limiter=self._thread_limiter)
+            self._observe(time.perf_counter() - start)
+            return result
+        finally:
+            self.limiter.release()
+
+    def _observe(self, seconds: float):
+        with self._lock:
+            self._seconds_per_call = seconds if self._seconds_per_call is None else \
+                (1 - _SERVICE_TIME_SMOOTHING) * self._seconds_per_call + _SERVICE_TIME_SMOOTHING * seconds
+
+    def update_metrics(self):
+        """Record how many threads of the workload are busy and how many calls are waiting."""
+        WORKLOAD_THREADS.labels(self.name, "borrowed").set(self.limiter.borrowed_tokens)
+        WORKLOAD_THREADS.labels(self.name, "total").set(self.limiter.total_tokens)
+        WORKLOAD_THREADS.labels(self.name, "waiting").set(self._waiting)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_workload_pool(workload: str) -> WorkloadPool:
+    """
+    Get the pool of a workload class, creating it from the environment on first use.
+
+    Args:
+        workload (str): `EMBED`, `DB_READ` or `DB_WRITE`.
+
+    Returns:
+        WorkloadPool: The pool of the workload.
+    """
+    pool = _pools.get(workload)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(workload)
+            if pool is None:
+                workers, max_queue = _DEFAULTS[workload]
+                prefix = workload.upper()
+                pool = WorkloadPool(
+                    workload,
+                    workers=int(os.getenv(f"{prefix}_WORKERS", str(workers)) or workers),
+                    max_queue=int(os.getenv(f"{prefix}_MAX_QUEUE", str(max_queue)) or max_queue),
+                    queue_timeout=float(os.getenv(QUEUE_TIMEOUT_ENV, "5") or 5),
+                )
+                _pools[workload] = pool
+    return pool
+
+
+async def run_in_workload(workload: str, func, *args, **kwargs):
+    """
+    Run a blocking function in the threads of a workload class, shedding it under overload.
+
+    Args:
+        workload (str): `EMBED`, `DB_READ` or `DB_WRITE`.
+        func (callable): The function to run.
+        *args: The positional arguments passed to `func`.
+        **kwargs: The keyword arguments passed to `func`.
+
+    Returns:
+        The return value of `func`.
+
+    Raises:
+        Overloaded: If the workload sheds the call.
+    """
+    return await get_workload_pool(workload).run(func, *args, **kwargs)
+
+
+def update_workload_metrics():
+    """Record the thread usage of every workload pool created so far."""
+    for pool in list(_pools.values()):
+        pool.update_metrics()
+
+
+def reset_workload_pools():
+    """Forget the pools, so the next calls create them again from the environment."""
+    with _pools_lock:
+        _pools.clear()
@@ -0,0 +1,220 @@
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from database.db_oprations import insert_job, update_job, get_job, get_latest_job_id
+
+logger = logging.getLogger(__name__)
+
+# Environment variables setting the number of background workers and how long finished jobs are remembered
+JOB_WORKERS_ENV = "JOB_WORKERS"
+JOB_RETENTION_ENV = "JOB_RETENTION_HOURS"
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+# A newer job for the same document was submitted before this one ran, or the document was
+# written again before this job stored its result, so the job was skipped
+SUPERSEDED = "superseded"
+
+
+class JobSuperseded(Exception):
+    """Raised by a job function when the document changed meanwhile and the job's result must not be stored."""
+
+
+class DatabaseJobStore:
+    """
+    Job status kept in the `document_jobs` table, so every API worker sees every job.
+    """
+
+    def __init__(self, retention_hours: float = 24):
+        """
+        Initialize the store.
+
+        Args:
+            retention_hours (float): How long finished jobs are remembered for status queries (default: 24).
+        """
+        self.retention = timedelta(hours=retention_hours)
+
+    def create(self, job: dict):
+        insert_job(job, forget_before=datetime.now(timezone.utc) - self.retention)
+
+    def update(self, job_id: str, **fields):
+        update_job(job_id, **fields)
+
+    def get(self, job_id: str):
+        return get_job(job_id)
+
+    def latest_job_id(self, document_id: int):
+        return get_latest_job_id(document_id)
+
+
+class MemoryJobStore:
+    """
+    Job status kept in the memory of one process, for a single API worker and for tests.
+    """
+
+    def __init__(self, max_finished_jobs: int = 1000):
+        """
+        Initialize the store.
+
+        Args:
+            max_finished_jobs (int): How many finished jobs are remembered for status queries (default: 1000).
+        """
+        self.max_finished_jobs = max_finished_jobs
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, job: dict):
+        with self._lock:
+            self._jobs[job["job_id"]] = dict(job, finished_at=None, error=None)
+            finished = [job_id for job_id, known in self._jobs.items() if known["finished_at"] is not None]
+            for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+                del self._jobs[job_id]
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def get(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def latest_job_id(self, document_id: int):
+        with self._lock:
+            for job_id in reversed(self._jobs):
+                if self._jobs[job_id]["document_id"] == document_id:
+                    return job_id
+        return None
+
+
+class JobQueue:
+    """
+    Local background worker pool for slow document writes (Markdown conversion and re-embedding).
+
+    Jobs are keyed by a random ID so their progress can be polled, and their status is kept in
+    a store shared by every API worker (the database by default). Jobs for the same document never
+    run concurrently in one worker, and a job that has not started yet is skipped when a newer job
+    for its document was submitted to any worker. Job functions raise `JobSuperseded` when the
+    document was written again meanwhile, so stale content never overwrites newer content.
+    """
+
+    # Number of locks that serialize jobs per document
+    _LOCK_STRIPES = 64
+
+    def __init__(self, max_workers: int = 2, store=None):
+        """
+        Initialize the JobQueue.
+
+        Args:
+            max_workers (int): The number of worker threads (default: 2).
+            store (DatabaseJobStore | MemoryJobStore): Where job status is kept (default: the database).
+        """
+        self.store = store if store is not None else DatabaseJobStore()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job-worker")
+        self._document_locks = [threading.Lock() for _ in range(self._LOCK_STRIPES)]
+
+    def submit(self, document_id: int, func, *args) -> str:
+        """
+        Queue a job that writes to a document.
+
+        Args:
+            document_id (int): The ID of the document the job writes to.
+            func (callable): The function to run in the background.
+            *args: The arguments passed to `func`.
+
+        Returns:
+            str: The ID of the queued job.
+        """
+        job_id = uuid.uuid4().hex
+        self.store.create({
+            "job_id": job_id,
+            "document_id": document_id,
+            "status": QUEUED,
+            "created_at": datetime.now(timezone.utc),
+        })
+        self._executor.submit(self._run, job_id, document_id, func, *args)
+        return job_id
+
+    def _run(self, job_id: str, document_id: int, func, *args):
+        with self._document_locks[hash(document_id) % self._LOCK_STRIPES]:
+            try:
+                if self.store.latest_job_id(document_id) != job_id:
+                    self._finish(job_id, SUPERSEDED)
+                    return
+                self.store.update(job_id, status=RUNNING)
+                try:
+                    func(*args)
+                except JobSuperseded as e:
+                    logger.info(f"Job {job_id} for document {document_id} superseded: {str(e)}")
+                    self._finish(job_id, SUPERSEDED, str(e))
+                    return
+                except Exception as e:
+                    logger.error(f"Job {job_id} for document {document_id} failed: {str(e)}")
+                    self._finish(job_id, FAILED, str(e))
+                    return
+                self._finish(job_id, SUCCEEDED)
+            except Exception as e:
+                logger.error(f"Cannot record the status of job {job_id}: {str(e)}")
+
+    def _finish(self, job_id: str, job_status: str, error: str = None):
+        self.store.update(job_id, status=job_status, error=error, finished_at=datetime.now(timezone.utc))
+
+    def get(self, job_id: str):
+        """
+        Get the status of a job.
+
+        Args:
+            job_id (str): The ID of the job.
+
+        Returns:
+            dict: A copy of the job's status, or None if the job is unknown.
+        """
+        return self.store.get(job_id)
+
+    def shutdown(self, wait: bool = True):
+        """
+        Stop accepting jobs and, by default, wait for the queued ones to finish.
+
+        Args:
+            wait (bool): Whether to wait for queued jobs (default: True).
+        """
+        self._executor.shutdown(wait=wait)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """
+    Return the shared job queue, creating it on first use with JOB_WORKERS workers
+    and a database store remembering finished jobs for JOB_RETENTION_HOURS (default 24).
+
+    Returns:
+        JobQueue: The shared job queue.
+    """
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue(max_workers=int(os.getenv(JOB_WORKERS_ENV, "2")),
+                                  store=DatabaseJobStore(float(os.getenv(JOB_RETENTION_ENV, "24") or 24)))
+    return _queue
+
+
+def shutdown_job_queue():
+    """
+    Wait for the queued jobs to finish and drop the shared job queue.
+    """
+    global _queue
+    with _queue_lock:
+        queue, _queue = _queue, None
+    if queue is not None:
+        queue.shutdown(wait=True)
@@ -1,12 +1,112 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
+import anyio.to_thread
+from fastapi import FastAPI, Response, status
+from fastapi.concurrency import run_in_threadpool
 from .router.endpoints import router as api_router
+from .responses import ORJSONResponse
+from .jobs import shutdown_job_queue
+from .admission import update_workload_metrics
+from .warmup import warm_up, save_recorded_queries, get_warmup_queries_path, get_warmup_save_seconds
+from .middleware import MetricsMiddleware
+from monitoring.metrics import CONTENT_TYPE_LATEST, is_metrics_enabled, render_metrics, update_pool_metrics, \
+    update_threadpool_metrics
+from data_processing.vectorizer import load_model, warmup_model
+from data_processing.reranker import is_reranker_enabled, load_reranker, warmup_reranker
+from database.models import get_engine, get_engines, dispose_engine
+from database.backends import get_backend
+from database.db_oprations import build_vector_index, refresh_vector_index
+from database.vector_index import is_vector_index_enabled, get_vector_index_refresh_seconds, set_vector_index
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Manage the lifecycle of the heavy resources used by the API.
+
+    On startup the database engine is created, the embedding model (and the cross-encoder,
+    if re-ranking is enabled) is loaded and warmed up with a dummy encode, the in-process
+    vector index is built (if enabled, or if the database cannot search vectors itself),
+    the search table and indexes are prewarmed and the popular saved queries are replayed,
+    and only then the service is marked as ready.
+    On shutdown the recorded queries are saved, the queued background jobs are finished and
+    the engine's connection pool is disposed.
+    A startup error is logged and re-raised, so the server fails to start instead of serving
+    a worker that never becomes ready.
+    """
+    app.state.ready = False
+    refresh_task = None
+    save_task = None
+    try:
+        engine = await run_in_threadpool(get_engine)
+        await run_in_threadpool(load_model)
+        await run_in_threadpool(warmup_model)
+        if is_reranker_enabled():
+            await run_in_threadpool(load_reranker)
+            await run_in_threadpool(warmup_reranker)
+        # Databases that cannot search vectors themselves (SQLite) always need the index
+        if is_vector_index_enabled() or get_backend(engine).needs_vector_index:
+            await run_in_threadpool(build_vector_index)
+            refresh_seconds = get_vector_index_refresh_seconds()
+            if refresh_seconds > 0:
+                refresh_task = asyncio.create_task(_refresh_vector_index_periodically(refresh_seconds))
+        await run_in_threadpool(warm_up)
+        save_seconds = get_warmup_save_seconds()
+        if get_warmup_queries_path() and save_seconds > 0:
+            save_task = asyncio.create_task(_save_recorded_queries_periodically(save_seconds))
+        app.state.ready = True
+        logger.info("API is ready to serve requests.")
+    except Exception as e:
+        logger.error(f"Error during API startup: {str(e)}")
+        await _cancel_tasks(refresh_task, save_task)
+        set_vector_index(None)
+        await run_in_threadpool(dispose_engine)
+        raise
+    yield
+    await _cancel_tasks(refresh_task, save_task)
+    await run_in_threadpool(save_recorded_queries)
+    await run_in_threadpool(shutdown_job_queue)
+    set_vector_index(None)
+    await run_in_threadpool(dispose_engine)
+
+
+async def _cancel_tasks(*tasks):
+    """Cancel the background tasks that were started and wait for them to stop."""
+    for task in tasks:
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+
+
+async def _refresh_vector_index_periodically(interval: float):
+    """Pick up writes made by other workers or processes into the in-process vector index."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(refresh_vector_index)
+        except Exception as e:
+            logger.error(f"Error refreshing the vector index: {str(e)}")
+
+
+async def _save_recorded_queries_periodically(interval: float):
+    """Save the popular queries now and then, so a crashed worker does not lose them all."""
+    while True:
+        await asyncio.sleep(interval)
+        await run_in_threadpool(save_recorded_queries)
 
 
 app = FastAPI(
     title="Law Document API",
     description="API for querying and managing law documents",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
+app.add_middleware(MetricsMiddleware)
 app.include_router(api_router, prefix="/api")
 
 
@@ -15,6 +115,33 @@ async def root():
     return {"message": "Welcome to the Law Document API"}
 
 
+@app.get("/ready")
+async def ready(response: Response):
+    """
+    Report whether the model and the database engine are loaded and the API can serve requests.
+    """
+    is_ready = getattr(app.state, "ready", False)
+    if not is_ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"ready": is_ready}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Expose request, stage, model batch, database pool and threadpool (default and per workload) metrics
+    in the Prometheus format.
+    """
+    if not is_metrics_enabled():
+        return Response("prometheus_client is not installed.\n", status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                        media_type="text/plain")
+    for name, engine in get_engines():
+        update_pool_metrics(engine, name)
+    update_threadpool_metrics(anyio.to_thread.current_default_thread_limiter())
+    update_workload_metrics()
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+
 if __name__ == "__main__":
     import uvicorn
 
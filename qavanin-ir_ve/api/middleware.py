@@ -0,0 +1,60 @@
+import time
+from monitoring.metrics import REQUEST_LATENCY, REQUESTS_IN_PROGRESS
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the latency and concurrency of HTTP requests.
+
+    Requests are labelled with their route template (e.g. `/api/get_document/{document_id}`)
+    rather than the raw path, so document IDs do not create one time series each.
+    Unlike `BaseHTTPMiddleware`, it does not buffer the response, so streamed content is unaffected.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_progress.dec()
+            REQUEST_LATENCY.labels(method, _route_template(scope), str(status_code)).observe(
+                time.perf_counter() - start)
+
+
+def _route_template(scope) -> str:
+    """
+    Get the template of the route that handled a request, including the prefix of its router.
+
+    Depending on the FastAPI version, the matched route's path may not include the prefix the
+    router was included with, so the prefix is recovered from the request path.
+    """
+    route = scope.get("route")
+    path_format = getattr(route, "path_format", None)
+    if path_format is None:
+        return "unmatched"
+    try:
+        rendered = path_format.format(**scope.get("path_params", {}))
+    except (KeyError, IndexError, ValueError):
+        return path_format
+    path = scope.get("path", "")
+    if path.endswith(rendered):
+        return path[:len(path) - len(rendered)] + path_format
+    return path_format
@@ -1,46 +1,300 @@
-from fastapi import APIRouter, HTTPException, status
-from data_processing.vectorizer import generate_embeddings
+import base64
+import hashlib
+import json
+import logging
+import time
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
+from data_processing.vectorizer import generate_embeddings, generate_embeddings_batch
 from database.db_oprations import get_closest_document, get_document_count, get_document_by_id, update_document, \
-    delete_document
+    delete_document, get_closest_documents_batch, get_document_length, get_document_chunk, upsert_documents, \
+    update_document_content, get_source_ids_by_content_hash, update_document_metadata, \
+    get_embeddings_by_content_hash
+from database.result_cache import get_result_cache, normalize_query
+from database.filters import build_search_filters, normalize_law_type, normalize_approve_date
 from data_processing.text_cleaner import convert_to_markdown
+from data_processing.snippets import extract_snippet
+from data_processing.dedup import content_hash, deduplicate as deduplicate_documents, embed_distinct, UNCHANGED
+from data_processing.reranker import rerank as rerank_documents, get_rerank_candidates, get_rerank_budget
 from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
+from monitoring.metrics import track_stage
+from ..jobs import get_job_queue, JobSuperseded
+from ..admission import run_in_workload, EMBED, DB_READ, DB_WRITE
+from ..warmup import get_query_recorder
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Maximum number of queries accepted by a single batch search request
+MAX_BATCH_QUERIES = 64
+
+# Maximum number of documents returned per query by a search request
+MAX_SEARCH_LIMIT = 100
+
+# Deepest offset a search cursor can reach; an ANN query fetches every row before the page
+MAX_SEARCH_OFFSET = 1000
+
+# Longest snippet a search request can ask for, so a snippet cannot return the whole document
+MAX_SNIPPET_WIDTH = 2000
+
+# Characters of a document's content read from the database per streamed chunk
+CONTENT_CHUNK_CHARS = 65536
+
+# Maximum number of documents accepted by a single bulk upsert request
+MAX_BULK_DOCUMENTS = 256
+
+# Fields a search request can ask for, and the fields returned by default
+SEARCH_FIELDS = {"id", "content", "snippet"}
+DEFAULT_FIELDS = "id,content"
+
 
 class TextInput(BaseModel):
     text: str
 
 
+class BatchTextInput(BaseModel):
+    texts: List[str]
+
+
+class DocumentInput(BaseModel):
+    source_id: str
+    text: str
+    law_type: Optional[str] = None
+    zone: Optional[str] = None
+    approve_date: Optional[str] = None
+
+
+class BulkDocumentsInput(BaseModel):
+    documents: List[DocumentInput]
+
+
+def _parse_fields(fields: str) -> set:
+    """Parse the `fields` parameter of a search request."""
+    requested_fields = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown_fields = requested_fields - SEARCH_FIELDS
+    if unknown_fields:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown_fields))}. "
+                         f"Allowed fields: {', '.join(sorted(SEARCH_FIELDS))}.")
+    return requested_fields or {"id"}
+
+
+def _check_limit(limit: int):
+    """Validate the `limit` of a search request, so one request cannot ask for the whole table."""
+    if not 1 <= limit <= MAX_SEARCH_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_SEARCH_LIMIT}.")
+
+
+def _check_snippet_width(snippet_width: int):
+    """Validate the `snippet_width` of a search request."""
+    if not 1 <= snippet_width <= MAX_SNIPPET_WIDTH:
+        raise ValueError(f"snippet_width must be between 1 and {MAX_SNIPPET_WIDTH}.")
+
+
+def _search_key(text: str, filters: dict, rerank: bool) -> str:
+    """Identify a search, so its cursors cannot be replayed against another query."""
+    key = json.dumps([normalize_query(text), sorted(filters.items()), rerank], ensure_ascii=False)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+def _encode_cursor(offset: int, search_key: str) -> str:
+    """Encode a pagination offset of the search identified by `search_key` as an opaque cursor."""
+    cursor = {"offset": offset, "search": search_key}
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: Optional[str], search_key: str) -> int:
+    """Decode a cursor returned by `_encode_cursor` for the same search back into an offset."""
+    if not cursor:
+        return 0
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        offset, cursor_key = decoded["offset"], decoded["search"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor.")
+    if not isinstance(offset, int) or not 0 <= offset <= MAX_SEARCH_OFFSET:
+        raise ValueError("Invalid cursor.")
+    if cursor_key != search_key:
+        raise ValueError("The cursor belongs to another search.")
+    return offset
+
+
+def _project_documents(documents: List[dict], requested_fields: set, query: str = "",
+                       snippet_width: int = 300) -> List[dict]:
+    """Keep only the requested fields of each document, computing snippets if asked to."""
+    projected = []
+    for document in documents:
+        item = {field: document[field] for field in ("id", "content") if field in requested_fields}
+        if "snippet" in requested_fields:
+            with track_stage("snippet"):
+                item["snippet"] = extract_snippet(document["content"], query, snippet_width)
+        projected.append(item)
+    return projected
+
+
+async def _run_cache(cache, func, *args):
+    """
+    Call a result cache method inline for the in-process cache, or in the threadpool for a networked one.
+
+    Cache errors are logged and treated as a miss so a cache outage never fails a search.
+    """
+    try:
+        if cache.is_local:
+            return func(*args)
+        return await run_in_threadpool(func, *args)
+    except Exception as e:
+        logger.error(f"Result cache error: {str(e)}")
+        return None
+
+
 @router.post("/get_closest_match", status_code=status.HTTP_200_OK)
-async def get_closest_match(input_data: TextInput, limit: int):
+async def get_closest_match(input_data: TextInput, limit: int, fields: str = DEFAULT_FIELDS,
+                            cursor: Optional[str] = None, snippet_width: int = 300, rerank: bool = False,
+                            rerank_budget_ms: Optional[int] = None, law_type: Optional[str] = None,
+                            zone: Optional[str] = None, approved_from: Optional[str] = None,
+                            approved_to: Optional[str] = None):
     """
     Find the closest matching documents for a given input text.
 
     Args:
         input_data (TextInput): The input text to match against.
         limit (int): The maximum number of matching documents to return.
+        fields (str): Comma-separated fields to return for each document, among
+                      `id`, `content` and `snippet` (default: `id,content`).
+        cursor (str): The `next_cursor` of a previous response with the same text, filters and `rerank`,
+                      to fetch the next page; pages go at most MAX_SEARCH_OFFSET documents deep.
+        snippet_width (int): The length of the snippet in characters, at most MAX_SNIPPET_WIDTH (default: 300).
+        rerank (bool): Fetch RERANK_CANDIDATES candidates and re-order them with the cross-encoder
+                       before paginating; pages only go as far as those candidates (default: False).
+        rerank_budget_ms (int): Time budget of the whole search when re-ranking, in milliseconds
+                                (default: RERANK_BUDGET_MS); re-ranking is skipped if it does not fit.
+        law_type (str): Only match documents of this type: `law`, `regulation`, `vote` or `opinion`.
+        zone (str): Only match documents of this zone.
+        approved_from (str): Only match documents approved on or after this Jalali date (YYYY/MM/DD).
+        approved_to (str): Only match documents approved on or before this Jalali date (YYYY/MM/DD).
 
     Returns:
-        dict: A dictionary containing the closest matching documents and total document count.
+        dict: A dictionary containing the closest matching documents, the total document count
+              and the cursor of the next page (None on the last page). Re-ranked searches also
+              report whether the candidates were actually `reranked`.
 
     Raises:
         HTTPException: If no matching document is found or an error occurs.
     """
+    start = time.monotonic()
     try:
-        user_embeddings = await run_in_threadpool(generate_embeddings, input_data.text)
-        closest_documents = await run_in_threadpool(get_closest_document, user_embeddings, limit)
+        _check_limit(limit)
+        _check_snippet_width(snippet_width)
+        requested_fields = _parse_fields(fields)
+        filters = build_search_filters(law_type, zone, approved_from, approved_to)
+        search_key = _search_key(input_data.text, filters, rerank)
+        offset = _decode_cursor(cursor, search_key)
+        if rerank_budget_ms is not None and rerank_budget_ms < 0:
+            raise ValueError("rerank_budget_ms must be zero or more.")
+        # Popular unfiltered first pages are replayed to warm up the next start (see api/warmup.py)
+        if not filters and offset == 0:
+            get_query_recorder().record(input_data.text)
+
+        cache = get_result_cache()
+        cache_key = None
+        if cache is not None:
+            cache_key = await _run_cache(cache, cache.make_key, "closest_match", input_data.text, limit,
+                                         ",".join(sorted(requested_fields)), offset, snippet_width, rerank,
+                                         sorted(filters.items()))
+            cached_response = await _run_cache(cache, cache.get, cache_key)
+            if cached_response is not None:
+                return cached_response
+
+        user_embeddings = await run_in_workload(EMBED, generate_embeddings, input_data.text)
+        include_content = bool(requested_fields & {"content", "snippet"})
+        reranked = False
+        has_more = True
+        if rerank:
+            # Re-rank a fixed candidate set and paginate within it, so pages stay consistent
+            rerank_candidates = get_rerank_candidates()
+            if offset >= rerank_candidates:
+                raise ValueError(f"Re-ranked searches only page through the first {rerank_candidates} matches.")
+            candidates = await run_in_workload(DB_READ, get_closest_document, user_embeddings,
+                                               rerank_candidates, 0, True, filters=filters)
+            has_more = offset + limit < len(candidates)
+            budget = get_rerank_budget() if rerank_budget_ms is None else rerank_budget_ms / 1000
+            candidates, reranked = await run_in_workload(EMBED, rerank_documents, input_data.text, candidates,
+                                                         start + budget)
+            closest_documents = candidates[offset:offset + limit]
+        else:
+            closest_documents = await run_in_workload(DB_READ, get_closest_document, user_embeddings, limit,
+                                                      offset, include_content, filters=filters)
 
-        if not closest_documents:
+        if not closest_documents and offset == 0:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No matching document found.")
 
-        total_documents = await run_in_threadpool(get_document_count)
+        if "snippet" in requested_fields:
+            closest_documents = await run_in_workload(EMBED, _project_documents, closest_documents,
+                                                      requested_fields, input_data.text, snippet_width)
+        else:
+            closest_documents = _project_documents(closest_documents, requested_fields)
 
-        return {
+        total_documents = await run_in_workload(DB_READ, get_document_count)
+
+        response = {
             "closest_documents": closest_documents,
+            "total_documents": total_documents,
+            "next_cursor": _encode_cursor(offset + limit, search_key)
+            if len(closest_documents) == limit and has_more and offset + limit <= MAX_SEARCH_OFFSET else None
+        }
+        if rerank:
+            response["reranked"] = reranked
+        # A search that skipped re-ranking under load is not cached, so later requests get the better order
+        if cache_key is not None and reranked == rerank:
+            await _run_cache(cache, cache.set, cache_key, response)
+        return response
+    except HTTPException:
+        raise
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An error occurred: {str(e)}")
+
+
+@router.post("/get_closest_matches", status_code=status.HTTP_200_OK)
+async def get_closest_matches(input_data: BatchTextInput, limit: int):
+    """
+    Find the closest matching documents for several input texts in one request.
+
+    All texts are embedded with a single model call and all lookups run in a single SQL statement.
+
+    Args:
+        input_data (BatchTextInput): The input texts to match against.
+        limit (int): The maximum number of matching documents to return per text.
+
+    Returns:
+        dict: A dictionary containing, for each text, its closest matching documents, and the total document count.
+
+    Raises:
+        HTTPException: If the batch is empty or too large, or an error occurs.
+    """
+    try:
+        if not input_data.texts:
+            raise ValueError("At least one text is required.")
+        if len(input_data.texts) > MAX_BATCH_QUERIES:
+            raise ValueError(f"At most {MAX_BATCH_QUERIES} texts can be searched in one request.")
+        _check_limit(limit)
+
+        user_embeddings = await run_in_workload(EMBED, generate_embeddings_batch, input_data.texts)
+        closest_documents = await run_in_workload(DB_READ, get_closest_documents_batch, user_embeddings, limit)
+        total_documents = await run_in_workload(DB_READ, get_document_count)
+
+        return {
+            "results": [
+                {"text": text, "closest_documents": documents}
+                for text, documents in zip(input_data.texts, closest_documents)
+            ],
             "total_documents": total_documents
         }
+    except HTTPException:
+        raise
     except ValueError as ve:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
     except Exception as e:
@@ -48,25 +302,49 @@ async def get_closest_match(input_data: TextInput, limit: int):
 
 
 @router.put("/update_document/{document_id}", status_code=status.HTTP_200_OK)
-async def update_documents(document_id: int, content: TextInput):
+async def update_documents(document_id: int, content: TextInput, response: Response, async_mode: bool = False):
     """
     Update the content of a specific document.
 
+    In async mode the new text is stored right away and the request returns 202 with a job ID;
+    the Markdown conversion and the re-embedding run in a background worker, whose progress
+    is reported by `GET /jobs/{job_id}`.
+
     Args:
         document_id (int): The ID of the document to update.
         content (TextInput): The new content for the document.
+        async_mode (bool): Whether to re-embed the document in the background (default: False).
 
     Returns:
-        dict: A dictionary containing a success message and the updated document information.
+        dict: A dictionary containing a success message and the updated document information
+              (and, in async mode, the ID of the background job).
 
     Raises:
         HTTPException: If the document is not found or an error occurs during the update.
     """
     try:
-        embeddings = await run_in_threadpool(generate_embeddings, content.text)
-        content_md = await run_in_threadpool(convert_to_markdown, content.text)
+        if async_mode:
+            updated_document = await run_in_workload(DB_WRITE, update_document_content, document_id, content.text)
+            if not updated_document:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found or update failed")
 
-        updated_document = await run_in_threadpool(update_document, document_id, content_md, embeddings)
+            job_id = await run_in_workload(DB_WRITE, get_job_queue().submit, document_id, _reembed_document,
+                                           document_id, content.text, content_hash(content.text))
+            response.status_code = status.HTTP_202_ACCEPTED
+            return {
+                "message": "Document update accepted",
+                "job_id": job_id,
+                "status_url": f"/api/jobs/{job_id}",
+                "document": {
+                    "content": updated_document["content"],
+                    "updated_at": updated_document["updated_at"]
+                }
+            }
+
+        embeddings = await run_in_workload(EMBED, generate_embeddings, content.text)
+        content_md = await run_in_workload(EMBED, convert_to_markdown, content.text)
+
+        updated_document = await run_in_workload(DB_WRITE, update_document, document_id, content_md, embeddings)
 
         if not updated_document:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found or update failed")
@@ -78,6 +356,135 @@ async def update_documents(document_id: int, content: TextInput):
                 "updated_at": updated_document["updated_at"]
             }
         }
+    except HTTPException:
+        raise
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+def _reembed_document(document_id: int, text: str, text_hash: str):
+    """
+    Background job: convert a document's new text to Markdown, re-embed it and store both.
+
+    The result is only stored if the document still holds the text the job was submitted with
+    (`text_hash`), so a job never overwrites a later update of the same document.
+    """
+    embeddings = generate_embeddings(text)
+    content_md = convert_to_markdown(text)
+    if not update_document(document_id, content_md, embeddings, expected_content_hash=text_hash):
+        if get_document_by_id(document_id) is not None:
+            raise JobSuperseded(f"Document {document_id} was written again before the job stored its result")
+        raise LookupError(f"Document {document_id} not found or update failed")
+
+
+@router.get("/jobs/{job_id}", status_code=status.HTTP_200_OK)
+async def get_job_status(job_id: str):
+    """
+    Report the progress of a background job.
+
+    Args:
+        job_id (str): The ID returned when the job was accepted.
+
+    Returns:
+        dict: The job's ID, document ID, status (`queued`, `running`, `succeeded`, `failed` or
+              `superseded`), timestamps and error message.
+
+    Raises:
+        HTTPException: If the job is unknown.
+    """
+    try:
+        job = await run_in_workload(DB_READ, get_job_queue().get, job_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
+
+@router.post("/upsert_documents", status_code=status.HTTP_200_OK)
+async def upsert_documents_endpoint(input_data: BulkDocumentsInput, deduplicate: bool = True,
+                                    near_duplicate_threshold: float = 0.0):
+    """
+    Insert or update many documents keyed on their qavanin law ID.
+
+    Duplicates are dropped before embedding (see `data_processing.dedup`), then the distinct texts
+    are embedded in one model call and all documents are written in one transaction.
+
+    Args:
+        input_data (BulkDocumentsInput): The documents to write, each with its qavanin `source_id`.
+        deduplicate (bool): Skip repeated law IDs and laws whose stored text is unchanged, and reuse the
+                            stored embedding of texts already stored under another law ID (default: True).
+        near_duplicate_threshold (float): The estimated Jaccard similarity from which a text is a near-duplicate
+                                          of one earlier in the request and skipped, or 0 to keep them (default: 0).
+
+    Returns:
+        dict: A dictionary containing a success message, the number of inserted and updated documents,
+              the id of each written document and the `skipped` duplicates.
+
+    Raises:
+        HTTPException: If the batch is empty or too large, or an error occurs during the write.
+    """
+    try:
+        if not input_data.documents:
+            raise ValueError("At least one document is required.")
+        if len(input_data.documents) > MAX_BULK_DOCUMENTS:
+            raise ValueError(f"At most {MAX_BULK_DOCUMENTS} documents can be written in one request.")
+
+        if not 0 <= near_duplicate_threshold <= 1:
+            raise ValueError("near_duplicate_threshold must be between 0 and 1.")
+
+        documents = [
+            {"source_id": document.source_id, "text": document.text,
+             "law_type": normalize_law_type(document.law_type), "zone": document.zone,
+             "approve_date": normalize_approve_date(document.approve_date)}
+            for document in input_data.documents
+        ]
+        contents = await run_in_workload(EMBED, lambda: [convert_to_markdown(document["text"])
+                                                         for document in documents])
+        for document, content in zip(documents, contents):
+            document["content"] = content
+
+        skipped, stored_embeddings = [], {}
+        if deduplicate:
+            known_hashes = await run_in_workload(DB_READ, get_source_ids_by_content_hash,
+                                                 [content_hash(content) for content in contents])
+            by_source_id = {str(document["source_id"]): document for document in documents}
+            documents, skipped = await run_in_workload(EMBED, deduplicate_documents, documents,
+                                                       near_duplicate_threshold, known_hashes)
+            # Unchanged laws are not re-embedded, but new metadata sent with them is still stored
+            unchanged = [by_source_id[duplicate["source_id"]] for duplicate in skipped
+                         if duplicate["reason"] == UNCHANGED]
+            if unchanged:
+                await run_in_workload(DB_WRITE, update_document_metadata, unchanged)
+            # Laws stored under another law ID with the same text reuse its embedding
+            copies = [content_hash(document["content"]) for document in documents]
+            copies = [digest for digest in copies if digest in known_hashes]
+            if copies:
+                stored_embeddings = await run_in_workload(DB_READ, get_embeddings_by_content_hash, copies)
+
+        results = []
+        if documents:
+            embeddings = await run_in_workload(EMBED, embed_distinct, documents, generate_embeddings_batch,
+                                               stored_embeddings)
+            results = await run_in_workload(DB_WRITE, upsert_documents, [
+                {**document, "embedding": embedding}
+                for document, embedding in zip(documents, embeddings)
+            ])
+        inserted = sum(1 for result in results if result["inserted"])
+
+        return {
+            "message": "Documents upserted successfully",
+            "inserted": inserted,
+            "updated": len(results) - inserted,
+            "documents": results,
+            "skipped": skipped
+        }
+    except HTTPException:
+        raise
     except ValueError as ve:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
     except Exception as e:
@@ -99,10 +506,12 @@ async def delete_document_endpoint(document_id: int):
         HTTPException: If the document is not found or an error occurs during deletion.
     """
     try:
-        success = await run_in_threadpool(delete_document, document_id)
+        success = await run_in_workload(DB_WRITE, delete_document, document_id)
         if not success:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
         return
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
@@ -124,7 +533,7 @@ async def get_document_by_id_endpoint(document_id: int):
         HTTPException: If the document is not found or an error occurs during retrieval.
     """
     try:
-        document = await run_in_threadpool(get_document_by_id, document_id)
+        document = await run_in_workload(DB_READ, get_document_by_id, document_id)
 
         if not document:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
@@ -134,7 +543,51 @@ async def get_document_by_id_endpoint(document_id: int):
             "id": document["id"],
             "content": document["content"]
         }
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+async def _stream_content(document_id: int, length: int):
+    """Read a document's content chunk by chunk, each read admitted to the DB_READ pool on its own session."""
+    for start in range(1, length + 1, CONTENT_CHUNK_CHARS):
+        chunk = await run_in_workload(DB_READ, get_document_chunk, document_id, start, CONTENT_CHUNK_CHARS)
+        if not chunk:
+            return
+        yield chunk
+
+
+@router.get("/get_document/{document_id}/content", status_code=status.HTTP_200_OK)
+async def stream_document_content(document_id: int):
+    """
+    Stream the full Markdown content of a specific document.
+
+    The content is read from the database and sent in chunks, so large laws are never
+    materialized or JSON-encoded as a whole. No database connection is held between chunks,
+    so a slow client does not keep one busy.
+
+    Args:
+        document_id (int): The ID of the document to stream.
+
+    Returns:
+        StreamingResponse: The document content as `text/markdown`.
+
+    Raises:
+        HTTPException: If the document is not found or an error occurs.
+    """
+    try:
+        length = await run_in_workload(DB_READ, get_document_length, document_id)
+        if length is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+        return StreamingResponse(
+            _stream_content(document_id, length),
+            media_type="text/markdown; charset=utf-8",
+            headers={"X-Content-Length-Chars": str(length)},
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
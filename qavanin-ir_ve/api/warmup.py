@@ -0,0 +1,270 @@
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from data_processing.vectorizer import generate_embeddings
+from database.db_oprations import get_closest_document, prewarm_database
+from database.result_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# Environment variables configuring the warm-up that runs before the API reports ready
+WARMUP_QUERIES_PATH_ENV = "WARMUP_QUERIES_PATH"
+WARMUP_QUERIES_ENV = "WARMUP_QUERIES"
+WARMUP_TIMEOUT_ENV = "WARMUP_TIMEOUT_SECONDS"
+WARMUP_SAVE_ENV = "WARMUP_SAVE_SECONDS"
+
+try:
+    import fcntl
+except ImportError:  # Windows; the saves of concurrent workers are then not serialized
+    fcntl = None
+
+# Weight kept by the saved counts at each start of the service (see `decay_saved_queries`),
+# so queries that stopped being popular fade out after a few restarts
+_SAVED_COUNT_DECAY = 0.5
+# Saved counts that decayed below this are forgotten
+_MIN_SAVED_COUNT = 0.01
+
+
+class QueryRecorder:
+    """
+    Counts the search queries served, so the most popular ones can be replayed after a restart.
+
+    Queries are normalized like result cache keys. At most `max_queries` distinct queries are
+    kept; when there are more, the least frequent half is dropped.
+    """
+
+    def __init__(self, max_queries: int = 10000):
+        """
+        Initialize the recorder.
+
+        Args:
+            max_queries (int): The number of distinct queries remembered (default: 10000).
+        """
+        self.max_queries = max_queries
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, query: str):
+        """
+        Count a search query.
+
+        Args:
+            query (str): The query text.
+        """
+        query = normalize_query(query)
+        if not query:
+            return
+        with self._lock:
+            self._counts[query] += 1
+            if len(self._counts) > self.max_queries:
+                self._counts = Counter(dict(self._counts.most_common(self.max_queries // 2)))
+
+    def top(self, count: int) -> list:
+        """
+        Return the most frequent queries.
+
+        Args:
+            count (int): The number of queries.
+
+        Returns:
+            list: The query texts, most frequent first.
+        """
+        with self._lock:
+            return [query for query, _ in self._counts.most_common(count)]
+
+    def save(self, path: str):
+        """
+        Add the recorded counts to the queries saved at `path`, and clear them.
+
+        Every API worker saves into the same file; the file is locked while it is read, merged and
+        replaced, so concurrent saves do not lose each other's counts. Nothing is written when no
+        query was recorded since the last save.
+
+        Args:
+            path (str): The JSON file of saved queries.
+        """
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        if not counts:
+            return
+        with _locked(path):
+            merged = Counter(load_saved_queries(path))
+            merged.update(counts)
+            _write_saved_queries(path, merged, self.max_queries)
+
+
+@contextmanager
+def _locked(path: str):
+    """Hold an exclusive lock on the saved queries at `path` across processes."""
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _write_saved_queries(path: str, counts: Counter, max_queries: int):
+    """Replace the saved queries atomically with the most frequent `max_queries` of `counts`."""
+    queries = [{"text": query, "count": count} for query, count in counts.most_common(max_queries)]
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as file:
+        json.dump({"queries": queries}, file, ensure_ascii=False)
+    os.replace(temporary_path, path)
+
+
+def decay_saved_queries(path: str, factor: float = _SAVED_COUNT_DECAY, max_queries: int = 10000) -> int:
+    """
+    Scale down the saved counts, so the queries popular before the last start weigh less than new ones.
+
+    Run it once per start of the service, before the API workers start (the Docker image runs
+    `python -m api.warmup --decay`), not from every worker or every save.
+
+    Args:
+        path (str): The JSON file of saved queries.
+        factor (float): The weight the saved counts keep (default: 0.5).
+        max_queries (int): The number of queries kept in the file (default: 10000).
+
+    Returns:
+        int: The number of queries still saved.
+    """
+    with _locked(path):
+        saved = load_saved_queries(path)
+        if not saved:
+            return 0
+        decayed = Counter({query: count * factor for query, count in saved.items()
+                           if count * factor >= _MIN_SAVED_COUNT})
+        _write_saved_queries(path, decayed, max_queries)
+    return len(decayed)
+
+
+def load_saved_queries(path: str) -> dict:
+    """
+    Read the queries saved by `QueryRecorder.save`.
+
+    Args:
+        path (str): The JSON file of saved queries.
+
+    Returns:
+        dict: The count of each query, or {} if the file does not exist or cannot be read.
+    """
+    try:
+        with open(path, encoding="utf-8") as file:
+            return {query["text"]: query["count"] for query in json.load(file)["queries"]}
+    except FileNotFoundError:
+        return {}
+    except (ValueError, KeyError, TypeError) as e:
+        logger.error(f"Cannot read the saved queries at {path}: {str(e)}")
+        return {}
+
+
+_recorder = QueryRecorder()
+
+
+def get_query_recorder() -> QueryRecorder:
+    """
+    Get the recorder of this process.
+
+    Returns:
+        QueryRecorder: The recorder.
+    """
+    return _recorder
+
+
+def get_warmup_queries_path() -> str:
+    """
+    Return the file popular queries are saved to and replayed from (WARMUP_QUERIES_PATH), or None if unset.
+
+    Returns:
+        str: The path, or None.
+    """
+    return os.getenv(WARMUP_QUERIES_PATH_ENV) or None
+
+
+def get_warmup_save_seconds() -> float:
+    """
+    Return how often the recorded queries are saved (WARMUP_SAVE_SECONDS, default 300).
+
+    Returns:
+        float: The interval in seconds, 0 to only save at shutdown.
+    """
+    return float(os.getenv(WARMUP_SAVE_ENV, "300") or 0)
+
+
+def replay_queries(queries: list, limit: int = 10, deadline: float = None) -> int:
+    """
+    Run queries through the embedding model and the nearest-neighbour search, discarding the results.
+
+    Args:
+        queries (list): The query texts.
+        limit (int): The number of documents fetched per query (default: 10).
+        deadline (float): The `time.monotonic()` after which the remaining queries are skipped, or None.
+
+    Returns:
+        int: The number of queries replayed.
+    """
+    replayed = 0
+    for query in queries:
+        if deadline is not None and time.monotonic() >= deadline:
+            logger.warning(f"Warm-up time is up, skipping {len(queries) - replayed} queries.")
+            break
+        get_closest_document(generate_embeddings(query), limit)
+        replayed += 1
+    return replayed
+
+
+def warm_up():
+    """
+    Warm up the database cache and the search path before the API reports ready.
+
+    The search table and its indexes are loaded with `pg_prewarm`, then the WARMUP_QUERIES (default 100)
+    most popular saved queries are replayed, within WARMUP_TIMEOUT_SECONDS (default 60). A failure is
+    logged and does not keep the API from starting.
+    """
+    deadline = time.monotonic() + float(os.getenv(WARMUP_TIMEOUT_ENV, "60") or 60)
+    start = time.perf_counter()
+    try:
+        loaded = prewarm_database()
+        for url, relations in loaded.items():
+            logger.info(f"Prewarmed {sum(relations.values())} blocks of {', '.join(relations)} on {url}")
+    except Exception as e:
+        logger.error(f"Error prewarming the database: {str(e)}")
+
+    path = get_warmup_queries_path()
+    if not path:
+        return
+    saved = load_saved_queries(path)
+    queries = sorted(saved, key=saved.get, reverse=True)[:int(os.getenv(WARMUP_QUERIES_ENV, "100") or 0)]
+    try:
+        replayed = replay_queries(queries, deadline=deadline)
+        logger.info(f"Replayed {replayed} popular queries in {time.perf_counter() - start:.1f} seconds.")
+    except Exception as e:
+        logger.error(f"Error replaying popular queries: {str(e)}")
+
+
+def save_recorded_queries():
+    """Save this process's recorded queries, if WARMUP_QUERIES_PATH is set."""
+    path = get_warmup_queries_path()
+    if path:
+        try:
+            get_query_recorder().save(path)
+        except OSError as e:
+            logger.error(f"Cannot save the recorded queries to {path}: {str(e)}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Maintain the popular queries replayed when the API starts.")
+    parser.add_argument("--decay", action="store_true",
+                        help="Halve the saved counts; run once per start of the service, before the API workers.")
+    args = parser.parse_args()
+    if args.decay and get_warmup_queries_path():
+        logger.info(f"{decay_saved_queries(get_warmup_queries_path())} popular queries saved.")
@@ -0,0 +1,111 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from benchmarks.mock_qavanin import MockQavanin, MockQavaninServer
+
+
+@contextmanager
+def working_directory(path: str):
+    """Run the crawlers in a scratch directory, since they write to ./files."""
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def run_crawler_async(base_url: str, listing_pages: int, chunk_size: int) -> dict:
+    """Crawl the listing pages and then the laws with the aiohttp crawler."""
+    os.environ["QAVANIN_BASE_URL"] = base_url
+    # Imported here because the module reads QAVANIN_BASE_URL and creates ./files on import
+    from crawler_async.scripts import crawl_pages, crawl_qavanin
+
+    listing = asyncio.run(crawl_pages.main(1, listing_pages, chunk_size=chunk_size))
+    crawler = crawl_qavanin.QavaninPageCrawler(
+        chunk_size=chunk_size, ids=[link.split("IDS=")[-1] for link in listing["links"]])
+    asyncio.run(crawler.main())
+    return {"links": len(listing["links"]), "listing_pages": len(listing["completed"]),
+            "law_pages": len(crawler.completed)}
+
+
+def run_crawler_http(base_url: str, listing_pages: int, page_size: int, pool_size: int) -> dict:
+    """Crawl the listing pages and then the laws with the synchronous crawler on the HTTP backend."""
+    from crawler.http_scraper import HttpWebScraper
+    from crawler.parser import HTMLLinkExtractor, HTMLParserEachPage
+    from crawler.web_scraper import Scraper
+
+    with HttpWebScraper(backoff=0.1, pool_size=pool_size) as web_scraper:
+        scraper = Scraper(web_scraper, HTMLLinkExtractor(), HTMLParserEachPage())
+        content_list = scraper.scrape_main_pages(base_url + "?PageNumber={}&page={}&size={}", 1, listing_pages,
+                                                 page_size)
+        links = scraper.extract_links(content_list)
+        pages = scraper.scrape_pages_with_ids(base_url.rstrip("/") + "{}", links)
+    return {"links": len(links), "listing_pages": len(content_list), "law_pages": len(pages)}
+
+
+def measure(name: str, mock: MockQavanin, crawl) -> dict:
+    """Run one crawler against a fresh mock server and report its throughput, retries and memory."""
+    with MockQavaninServer(mock) as server, tempfile.TemporaryDirectory() as scratch, working_directory(scratch):
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = crawl(server.base_url)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    pages = result["listing_pages"] + result["law_pages"]
+    stats = dict(mock.stats)
+    result.update({
+        "crawler": name,
+        "seconds": round(elapsed, 3),
+        "pages_per_second": round(pages / elapsed, 2) if elapsed else None,
+        "requests": stats.get("requests", 0),
+        # Every request beyond one per saved page was a challenge round trip, a retry or a lost page
+        "extra_requests": stats.get("requests", 0) - pages,
+        "challenges": stats.get("challenges", 0),
+        "bad_gateways": stats.get("bad_gateway", 0),
+        "peak_python_memory_mb": round(peak / 2 ** 20, 2),
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure crawler throughput against a local mock of qavanin.ir.")
+    parser.add_argument("--laws", type=int, default=2000, help="Laws listed by the mock.")
+    parser.add_argument("--crawlers", default="crawler_async,crawler_http", help="Crawlers to measure.")
+    parser.add_argument("--chunk-size", type=int, default=50, help="Concurrent requests of crawler_async.")
+    parser.add_argument("--pool-size", type=int, default=10, help="Keep-alive connections of the HTTP backend.")
+    parser.add_argument("--pages-dir", help="Recorded listing pages to serve, e.g. files/pages.")
+    parser.add_argument("--laws-dir", help="Recorded TreeText pages to serve, e.g. files/qavanin.")
+    parser.add_argument("--challenge-rate", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=25.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    pages_dir = os.path.abspath(args.pages_dir) if args.pages_dir else None
+    laws_dir = os.path.abspath(args.laws_dir) if args.laws_dir else None
+
+    def new_mock():
+        return MockQavanin(pages_dir, laws_dir, args.laws, args.challenge_rate, args.error_rate,
+                           args.latency_ms, args.jitter_ms, seed=args.seed)
+
+    # crawler_async asks for 1000 laws per listing page, the synchronous crawler for 25
+    crawlers = {
+        "crawler_async": lambda base_url: run_crawler_async(base_url, math.ceil(args.laws / 1000), args.chunk_size),
+        "crawler_http": lambda base_url: run_crawler_http(base_url, math.ceil(args.laws / 25), 25, args.pool_size),
+    }
+    results = [measure(name, new_mock(), crawlers[name]) for name in args.crawlers.split(",")]
+    print(json.dumps({"config": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import argparse
+import json
+import random
+import statistics
+import time
+from sqlalchemy.orm import joinedload
+from database import db_oprations
+from database.db_oprations import get_db_session
+from database.models import LawDocument, Base, get_engine
+
+
+def legacy_get_document_by_id(document_id: int):
+    """The ORM version of get_document_by_id: loads the full row, embedding included."""
+    with get_db_session() as session:
+        document = session.query(LawDocument).options(joinedload('*')).filter_by(id=document_id).first()
+        return {"id": document.id, "content": document.content} if document else None
+
+
+def legacy_update_document(document_id: int, content: str, embedding: list):
+    """The ORM version of update_document: SELECT, mutate, commit, refresh."""
+    with get_db_session() as session:
+        document = session.query(LawDocument).filter(LawDocument.id == document_id).first()
+        document.content = content
+        document.embedding = embedding
+        session.commit()
+        session.refresh(document)
+        return {"content": document.content, "updated_at": document.updated_at}
+
+
+def legacy_delete_document(document_id: int) -> bool:
+    """The ORM version of delete_document: SELECT the full row, then DELETE it."""
+    with get_db_session() as session:
+        document = session.query(LawDocument).filter(LawDocument.id == document_id).first()
+        session.delete(document)
+        session.commit()
+        return True
+
+
+def legacy_get_document_count() -> int:
+    """The ORM version of get_document_count: counts over a subquery of every column."""
+    with get_db_session() as session:
+        return session.query(LawDocument).count()
+
+
+def time_calls(func, args_list) -> dict:
+    """
+    Call a function once per argument tuple and summarize the latencies in milliseconds.
+    """
+    latencies = []
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "calls": len(latencies),
+        "mean_ms": statistics.mean(latencies),
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+def random_embedding(rng: random.Random, dim: int = 384) -> list:
+    return [rng.uniform(-1, 1) for _ in range(dim)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark the document CRUD operations.")
+    parser.add_argument("--documents", type=int, default=200, help="Documents to seed (and update/delete).")
+    parser.add_argument("--content-kb", type=int, default=100, help="Size of each document's content in KB.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    Base.metadata.create_all(get_engine())
+    content = ("ماده ۱ - متن آزمایشی قانون. " * 40 * args.content_kb)[:args.content_kb * 1024]
+
+    results = {}
+    for variant in ("legacy", "lean"):
+        ids = [db_oprations.insert_document(content, random_embedding(rng)) for _ in range(args.documents)]
+        updates = [(doc_id, content + " ویرایش", random_embedding(rng)) for doc_id in ids]
+        if variant == "legacy":
+            operations = {
+                "get_document_by_id": (legacy_get_document_by_id, [(doc_id,) for doc_id in ids]),
+                "get_document_count": (legacy_get_document_count, [()] * args.documents),
+                "update_document": (legacy_update_document, updates),
+                "delete_document": (legacy_delete_document, [(doc_id,) for doc_id in ids]),
+            }
+        else:
+            operations = {
+                "get_document_by_id": (db_oprations.get_document_by_id, [(doc_id,) for doc_id in ids]),
+                "get_document_count": (db_oprations.get_document_count, [()] * args.documents),
+                "update_document": (db_oprations.update_document, updates),
+                "delete_document": (db_oprations.delete_document, [(doc_id,) for doc_id in ids]),
+            }
+        results[variant] = {name: time_calls(func, calls) for name, (func, calls) in operations.items()}
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
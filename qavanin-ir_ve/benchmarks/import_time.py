@@ -0,0 +1,75 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Modules whose presence after the import means the model was loaded eagerly
+HEAVY_MODULES = ["torch", "sentence_transformers", "transformers"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "import_seconds": elapsed,
+    "heavy_modules_loaded": [m for m in {heavy!r} if m in sys.modules],
+    "modules_loaded": len(sys.modules),
+}}))
+"""
+
+
+def measure_import(module: str) -> dict:
+    """
+    Import a module in a fresh interpreter and measure how long it takes.
+
+    Args:
+        module (str): The dotted name of the module to import.
+
+    Returns:
+        dict: The import time, the heavy modules that got loaded and the total module count.
+    """
+    code = PROBE.format(module=module, heavy=HEAVY_MODULES)
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        return {"module": module, "error": result.stderr.strip().splitlines()[-1]}
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report["module"] = module
+    report["process_seconds"] = wall
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold import time of the API modules.")
+    parser.add_argument("--modules", nargs="+", default=["api.router.endpoints", "api.main", "database.models"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = []
+    for module in args.modules:
+        runs = [measure_import(module) for _ in range(args.repeat)]
+        errors = [run for run in runs if "error" in run]
+        if errors:
+            results.append(errors[0])
+            continue
+        results.append({
+            "module": module,
+            "import_seconds_min": min(run["import_seconds"] for run in runs),
+            "process_seconds_min": min(run["process_seconds"] for run in runs),
+            "heavy_modules_loaded": runs[0]["heavy_modules_loaded"],
+            "modules_loaded": runs[0]["modules_loaded"],
+        })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
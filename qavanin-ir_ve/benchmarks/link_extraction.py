@@ -0,0 +1,83 @@
+import argparse
+import glob
+import json
+import statistics
+import time
+import lxml.html
+from crawler.link_extractor import extract_listing_links
+from benchmarks.mock_qavanin import LISTING_PAGE, LISTING_ROW
+
+LINKS_XPATH = (
+    '//div[@id="main"]//table[@class="border-list table table-striped table-hover"]'
+    '//td[@class="text-justify"]/a/@href'
+)
+
+
+def xpath_links(html_content: str) -> list:
+    """The previous extractor: build the whole tree and run the descendant XPath."""
+    return lxml.html.fromstring(html_content).xpath(LINKS_XPATH)
+
+
+def synthetic_pages(count: int, rows: int) -> list:
+    """Listing pages shaped like the site's, for when no recorded pages are available."""
+    padding = "<ul>" + "<li><a href='#'>منو</a></li>" * 1500 + "</ul>"
+    return [
+        LISTING_PAGE.format(padding=padding, rows="".join(
+            LISTING_ROW.format(number=number, law_id=page * rows + number) for number in range(rows)))
+        for page in range(count)
+    ]
+
+
+def time_extractor(extractor, pages: list, repeat: int) -> dict:
+    """Time an extractor over every page, keeping the best of `repeat` runs per page."""
+    per_page = []
+    for html_content in pages:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            extractor(html_content)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        per_page.append(best * 1000)
+    return {
+        "total_ms": round(sum(per_page), 3),
+        "mean_ms": round(statistics.mean(per_page), 3),
+        "max_ms": round(max(per_page), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the listing-page link extractors.")
+    parser.add_argument("--pages", default="files/pages/*.html", help="Glob of saved listing pages.")
+    parser.add_argument("--synthetic", type=int, default=20,
+                        help="Synthetic pages to use when the glob matches nothing.")
+    parser.add_argument("--rows", type=int, default=1000, help="Laws per synthetic page.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per page; the fastest counts.")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(args.pages))
+    pages = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            pages.append(f.read())
+    source = f"{len(paths)} files matching {args.pages}"
+    if not pages:
+        pages = synthetic_pages(args.synthetic, args.rows)
+        source = f"{len(pages)} synthetic pages of {args.rows} rows"
+
+    mismatches = [i for i, html_content in enumerate(pages)
+                  if xpath_links(html_content) != extract_listing_links(html_content)]
+    results = {
+        "source": source,
+        "bytes": sum(len(html_content.encode("utf-8")) for html_content in pages),
+        "links": sum(len(extract_listing_links(html_content)) for html_content in pages),
+        "mismatched_pages": [paths[i] if paths else i for i in mismatches],
+        "xpath": time_extractor(xpath_links, pages, args.repeat),
+        "streaming": time_extractor(extract_listing_links, pages, args.repeat),
+    }
+    results["speedup"] = round(results["xpath"]["total_ms"] / results["streaming"]["total_ms"], 2)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+import httpx
+
+# Vocabulary of the synthetic corpus, taken from the wording of Iranian laws
+WORDS = (
+    "قانون ماده تبصره مجلس شورای اسلامی دولت وزارت سازمان مالیات بودجه کشور اجرای آیین‌نامه "
+    "مصوب هیئت وزیران اصلاح الحاق بند جزء مقررات اشخاص حقیقی حقوقی دادگاه مرجع صلاحیت "
+    "تخلف مجازات جریمه نقدی حبس تعزیری مالکیت اراضی شهرداری ثبت اسناد املاک قرارداد "
+    "کارفرما کارگر بیمه تامین اجتماعی بازنشستگی گمرک واردات صادرات کالا خدمات بانک مرکزی "
+    "اعتبارات سال مالی تصویب ابلاغ لازم‌الاجرا منسوخ موظف است می‌تواند ممنوع می‌باشد"
+).split()
+
+QUERIES = (
+    "مالیات بر ارزش افزوده",
+    "مجازات تخلفات رانندگی",
+    "بیمه تامین اجتماعی کارگران",
+    "ثبت اسناد و املاک",
+    "صادرات کالا و گمرک",
+    "بودجه سال مالی کشور",
+    "صلاحیت دادگاه‌ها",
+    "شهرداری و اراضی شهری",
+)
+
+
+def synthetic_law(rng: random.Random, number: int, chars: int) -> str:
+    """
+    Generate the text of a synthetic law of about `chars` characters.
+    """
+    parts = [f"قانون شماره {number}"]
+    length, article = len(parts[0]), 1
+    while length < chars:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 30)))
+        parts.append(f"ماده {article} - {sentence}.")
+        length += len(parts[-1]) + 1
+        article += 1
+    return "\n".join(parts)[:chars]
+
+
+async def seed_corpus(client: httpx.AsyncClient, rng: random.Random, documents: int, chars: int,
+                      batch_size: int) -> list:
+    """
+    Upsert a synthetic corpus through the API and return the ids of its documents.
+
+    The source ids are stable, so seeding twice with the same size updates the same documents.
+    """
+    ids = []
+    for start in range(0, documents, batch_size):
+        batch = [
+            {"source_id": f"bench-{number}", "text": synthetic_law(rng, number, chars)}
+            for number in range(start, min(start + batch_size, documents))
+        ]
+        response = await client.post("/api/upsert_documents", json={"documents": batch}, timeout=600)
+        response.raise_for_status()
+        ids.extend(result["id"] for result in response.json()["documents"])
+    return ids
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = min(len(sorted_values), max(1, math.ceil(fraction * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: list, errors: int, elapsed: float) -> dict:
+    """Summarize the latencies (in seconds) of one operation."""
+    latencies = sorted(latencies)
+    to_ms = (lambda value: round(value * 1000, 3) if value is not None else None)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "p50_ms": to_ms(percentile(latencies, 0.50)),
+        "p95_ms": to_ms(percentile(latencies, 0.95)),
+        "p99_ms": to_ms(percentile(latencies, 0.99)),
+        "max_ms": to_ms(latencies[-1] if latencies else None),
+    }
+
+
+def parse_mix(mix: str) -> dict:
+    """Parse a mix such as `search=8,get=1,update=1` into operation weights."""
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{name.strip()}', expected one of: {', '.join(OPERATIONS)}")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+async def search(client, rng, ids, args):
+    return await client.post(f"/api/get_closest_match?limit={args.limit}", json={"text": rng.choice(QUERIES)})
+
+
+async def get_document(client, rng, ids, args):
+    return await client.get(f"/api/get_document/{rng.choice(ids)}")
+
+
+async def update_document(client, rng, ids, args):
+    document_id = rng.choice(ids)
+    return await client.put(f"/api/update_document/{document_id}",
+                            json={"text": synthetic_law(rng, document_id, args.content_chars)})
+
+
+OPERATIONS = {"search": search, "get": get_document, "update": update_document}
+
+
+async def run_load(client: httpx.AsyncClient, ids: list, args) -> dict:
+    """
+    Drive the API with `args.concurrency` concurrent clients until `args.requests` requests
+    have been sent, choosing each request's operation from the weighted mix.
+    """
+    weights = parse_mix(args.mix)
+    names = list(weights)
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    remaining = args.requests
+
+    async def worker(worker_id: int):
+        nonlocal remaining
+        rng = random.Random(args.seed * 1000 + worker_id)
+        while remaining > 0:
+            remaining -= 1
+            name = rng.choices(names, weights=[weights[name] for name in names])[0]
+            start = time.perf_counter()
+            try:
+                response = await OPERATIONS[name](client, rng, ids, args)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            if failed:
+                errors[name] += 1
+            else:
+                latencies[name].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+
+    results = {name: summarize(latencies[name], errors[name], elapsed) for name in names}
+    results["all"] = summarize([value for name in names for value in latencies[name]],
+                               sum(errors.values()), elapsed)
+    return results
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """
+    List the operations whose p95 latency grew by more than `tolerance` (e.g. 0.2 = 20%) over the baseline.
+    """
+    regressions = []
+    for name, summary in current["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous or not previous.get("p95_ms") or summary.get("p95_ms") is None:
+            continue
+        if summary["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append({"operation": name, "baseline_p95_ms": previous["p95_ms"],
+                                "p95_ms": summary["p95_ms"]})
+    return regressions
+
+
+@asynccontextmanager
+async def api_client(args):
+    """
+    Open a client to the API at `args.url`, or with `args.in_process` to the app run in this process.
+
+    The in-process app is served through httpx's ASGI transport, with its startup and shutdown run
+    as a server would, and uses the database configured in the environment (e.g. a SQLite
+    DATABASE_URL). No network is involved, so it measures the API itself rather than a deployment.
+    """
+    if not args.in_process:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+            yield client
+        return
+
+    from api.main import app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://in-process", timeout=args.timeout) as client:
+            yield client
+
+
+async def main_async(args) -> dict:
+    started_at = datetime.now(timezone.utc).isoformat()
+    rng = random.Random(args.seed)
+    async with api_client(args) as client:
+        if args.skip_seed:
+            response = await client.post("/api/get_closest_match?limit=100&fields=id", json={"text": QUERIES[0]})
+            response.raise_for_status()
+            ids = [document["id"] for document in response.json()["closest_documents"]]
+        else:
+            ids = await seed_corpus(client, rng, args.documents, args.content_chars, args.seed_batch_size)
+        # Warm up the connections, the model and the database caches before measuring
+        for _ in range(args.warmup):
+            await search(client, rng, ids, args)
+        results = await run_load(client, ids, args)
+
+    return {
+        "started_at": started_at,
+        "config": {key: value for key, value in vars(args).items() if key not in ("baseline", "output")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the search API and report latency percentiles as JSON.")
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of the API.")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Run the API in this process instead of connecting to --url.")
+    parser.add_argument("--documents", type=int, default=1000, help="Size of the synthetic corpus.")
+    parser.add_argument("--content-chars", type=int, default=5000, help="Length of each synthetic law.")
+    parser.add_argument("--seed-batch-size", type=int, default=128, help="Documents per upsert request.")
+    parser.add_argument("--skip-seed", action="store_true", help="Use the documents already in the database.")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests sent during the measurement.")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients.")
+    parser.add_argument("--mix", default="search=8,get=1,update=1", help="Weighted operation mix.")
+    parser.add_argument("--limit", type=int, default=10, help="Documents returned per search.")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured searches sent first.")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Request timeout in seconds.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the report to this file.")
+    parser.add_argument("--baseline", help="Report of a previous run to compare with.")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed p95 growth over the baseline before the run fails (default: 0.2).")
+    args = parser.parse_args()
+    parse_mix(args.mix)
+
+    report = asyncio.run(main_async(args))
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["regressions"] = compare(report, json.load(f), args.tolerance)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
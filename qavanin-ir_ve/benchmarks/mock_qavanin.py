@@ -0,0 +1,216 @@
+import argparse
+import asyncio
+import os
+import random
+import threading
+from collections import Counter
+from aiohttp import web
+
+# Cookie set by the site's JavaScript challenge, and the token the mock's challenge evaluates to
+CHALLENGE_COOKIE = "__arcsjs"
+CHALLENGE_TOKEN = "mock-challenge-token"
+
+# Same shape as the challenge page served by qavanin.ir, so `crawler_async.core.get_hash` can solve it
+CHALLENGE_PAGE = (
+    '<html><body><div class="error-section"><h1 class="error-section__title">Checking your browser</h1></div>'
+    '<script src="/challenge.js"></script><script type="text/javascript">'
+    f'var hash = "{CHALLENGE_TOKEN}";\n'
+    '</script></body></html>'
+)
+BAD_GATEWAY_PAGE = "<html><head><title>Error 502</title></head><body><h1>Error 502 - Bad Gateway</h1></body></html>"
+
+LISTING_ROW = '<tr><td>{number}</td><td class="text-justify"><a href="/Law/TreeText/?IDS={law_id}">قانون شماره {law_id}</a></td></tr>'
+LISTING_PAGE = (
+    '<html><head><title>قوانین و مقررات</title></head><body><div id="header">{padding}</div>'
+    '<div id="main"><table class="border-list table table-striped table-hover"><tbody>{rows}</tbody></table></div>'
+    '<div id="footer">{padding}</div></body></html>'
+)
+LAW_PAGE = (
+    '<html><head><title>قانون شماره {law_id}</title></head><body><div id="treeText">'
+    '<h1 class="LawTitle">قانون شماره {law_id}</h1><p class="SecTex">مصوب ۱۴۰۰/۰۱/۰۱</p>{articles}'
+    '</div></body></html>'
+)
+
+
+class MockQavanin:
+    """
+    A local stand-in for qavanin.ir that serves listing and TreeText pages with injected faults.
+
+    Recorded pages are served from `pages_dir` (`<page>.html`) and `laws_dir` (`<IDS>.html`) when
+    present; otherwise synthetic pages with the same structure are generated. Each response can be
+    replaced by the JavaScript challenge page or a 502, and delayed by a random latency.
+    """
+
+    def __init__(self, pages_dir: str = None, laws_dir: str = None, laws: int = 4000, challenge_rate: float = 0.0,
+                 error_rate: float = 0.0, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 law_chars: int = 20000, seed: int = 0):
+        """
+        Initialize the MockQavanin.
+
+        Args:
+            pages_dir (str): Directory of recorded listing pages, or None to generate them.
+            laws_dir (str): Directory of recorded TreeText pages, or None to generate them.
+            laws (int): Number of laws in the synthetic listing (default: 4000).
+            challenge_rate (float): Fraction of requests without the challenge cookie that get the challenge page.
+            error_rate (float): Fraction of requests answered with a 502.
+            latency_ms (float): Mean added latency per request in milliseconds.
+            jitter_ms (float): Maximum random deviation from the mean latency in milliseconds.
+            law_chars (int): Approximate length of each synthetic law page (default: 20000).
+            seed (int): Seed of the fault injection.
+        """
+        self.pages_dir = pages_dir
+        self.laws_dir = laws_dir
+        self.laws = laws
+        self.challenge_rate = challenge_rate
+        self.error_rate = error_rate
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.law_chars = law_chars
+        self.rng = random.Random(seed)
+        self.stats = Counter()
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/", self.listing)
+        app.router.add_get("/Law/TreeText/", self.law)
+        app.router.add_get("/__stats", self.get_stats)
+        app.router.add_post("/__stats/reset", self.reset_stats)
+        return app
+
+    async def _faults(self, request: web.Request):
+        """Apply the latency and return a fault response, or None to serve the page."""
+        self.stats["requests"] += 1
+        if self.latency_ms or self.jitter_ms:
+            delay = max(0.0, self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms))
+            await asyncio.sleep(delay / 1000)
+        if self.rng.random() < self.error_rate:
+            self.stats["bad_gateway"] += 1
+            return web.Response(text=BAD_GATEWAY_PAGE, status=502, content_type="text/html")
+        if request.cookies.get(CHALLENGE_COOKIE) != CHALLENGE_TOKEN and self.rng.random() < self.challenge_rate:
+            self.stats["challenges"] += 1
+            return web.Response(text=CHALLENGE_PAGE, content_type="text/html")
+        return None
+
+    async def listing(self, request: web.Request) -> web.Response:
+        fault = await self._faults(request)
+        if fault is not None:
+            return fault
+        page = int(request.query.get("PageNumber") or request.query.get("page") or 1)
+        size = int(request.query.get("size") or 25)
+        self.stats["listing_pages"] += 1
+        recorded = self._recorded(self.pages_dir, str(page))
+        if recorded is not None:
+            return web.Response(text=recorded, content_type="text/html")
+        first = (page - 1) * size
+        rows = "".join(
+            LISTING_ROW.format(number=number + 1, law_id=100000 + number)
+            for number in range(first, min(first + size, self.laws))
+        )
+        # Real listing pages carry large menus and scripts around the result table
+        padding = "<ul>" + "<li><a href='#'>منو</a></li>" * 400 + "</ul>"
+        return web.Response(text=LISTING_PAGE.format(rows=rows, padding=padding), content_type="text/html")
+
+    async def law(self, request: web.Request) -> web.Response:
+        fault = await self._faults(request)
+        if fault is not None:
+            return fault
+        law_id = request.query.get("IDS", "")
+        self.stats["law_pages"] += 1
+        recorded = self._recorded(self.laws_dir, law_id)
+        if recorded is not None:
+            return web.Response(text=recorded, content_type="text/html")
+        article = "ماده {n} - متن آزمایشی ماده {n} از قانون شماره {law_id} که باید اجرا شود."
+        articles, length, n = [], 0, 1
+        while length < self.law_chars:
+            articles.append(f'<p class="SecTex">{article.format(n=n, law_id=law_id)}</p>')
+            length += len(articles[-1])
+            n += 1
+        return web.Response(text=LAW_PAGE.format(law_id=law_id, articles="".join(articles)), content_type="text/html")
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(dict(self.stats))
+
+    async def reset_stats(self, request: web.Request) -> web.Response:
+        self.stats.clear()
+        return web.json_response({})
+
+    @staticmethod
+    def _recorded(directory: str, name: str):
+        if not directory:
+            return None
+        path = os.path.join(directory, f"{name}.html")
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+
+class MockQavaninServer:
+    """Runs a MockQavanin on a background thread, for benchmarks that drive blocking crawlers."""
+
+    def __init__(self, mock: MockQavanin, host: str = "127.0.0.1", port: int = 0):
+        self.mock = mock
+        self.host = host
+        self.port = port
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._started = threading.Event()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._serve, name="mock-qavanin", daemon=True)
+        self._thread.start()
+        self._started.wait()
+
+    def _serve(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._runner = web.AppRunner(self.mock.app(), access_log=None)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, self.host, self.port)
+        self._loop.run_until_complete(site.start())
+        self.port = site._server.sockets[0].getsockname()[1]
+        self._started.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(self._runner.cleanup())
+        self._loop.close()
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local mock of qavanin.ir with injected faults.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--pages-dir", help="Recorded listing pages, e.g. files/pages.")
+    parser.add_argument("--laws-dir", help="Recorded TreeText pages, e.g. files/qavanin.")
+    parser.add_argument("--laws", type=int, default=4000, help="Laws in the synthetic listing.")
+    parser.add_argument("--challenge-rate", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=25.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    mock = MockQavanin(args.pages_dir, args.laws_dir, args.laws, args.challenge_rate, args.error_rate,
+                       args.latency_ms, args.jitter_ms, seed=args.seed)
+    web.run_app(mock.app(), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import json
+import random
+from sqlalchemy import text
+from database import db_oprations
+from database.models import get_engine, init_db
+from database.vector_index import set_vector_index
+from database.vector_storage import get_vector_storage
+from benchmarks.db_operations import time_calls, random_embedding
+
+TABLES = ("law_documents", "law_document_vectors")
+
+
+def relation_sizes(connection) -> dict:
+    """
+    Report the heap, TOAST and index sizes of the document tables in bytes.
+    """
+    sizes = {}
+    for table in TABLES:
+        row = connection.execute(text(
+            "SELECT pg_relation_size(c.oid) AS heap, "
+            "COALESCE(pg_total_relation_size(NULLIF(c.reltoastrelid, 0)), 0) AS toast, "
+            "pg_indexes_size(c.oid) AS indexes "
+            "FROM pg_class c WHERE c.oid = CAST(:table AS regclass)"
+        ), {"table": table}).one()
+        sizes[table] = {"heap_bytes": row.heap, "toast_bytes": row.toast, "index_bytes": row.indexes}
+    for name in ("idx_law_documents_embedding", "idx_law_document_vectors_embedding"):
+        sizes[name] = connection.execute(
+            text("SELECT pg_relation_size(to_regclass(:name))"), {"name": name}
+        ).scalar()
+    return sizes
+
+
+def block_counters(connection) -> dict:
+    """
+    Read the shared-buffer hit and read counters of the document tables and their indexes.
+    """
+    rows = connection.execute(text(
+        "SELECT relname, "
+        "heap_blks_hit + COALESCE(toast_blks_hit, 0) AS heap_hit, "
+        "heap_blks_read + COALESCE(toast_blks_read, 0) AS heap_read, "
+        "COALESCE(idx_blks_hit, 0) AS idx_hit, COALESCE(idx_blks_read, 0) AS idx_read "
+        "FROM pg_statio_user_tables WHERE relname = ANY(:tables)"
+    ), {"tables": list(TABLES)})
+    totals = {"hit": 0, "read": 0}
+    for row in rows:
+        totals["hit"] += row.heap_hit + row.idx_hit
+        totals["read"] += row.heap_read + row.idx_read
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the sizes and search latency of the configured vector storage layout. Run it before "
+                    "and after `python -m database.vector_storage --split` (with VECTOR_STORAGE set to match) "
+                    "to compare the inline and split layouts.")
+    parser.add_argument("--queries", type=int, default=200, help="Searches timed.")
+    parser.add_argument("--limit", type=int, default=10, help="Documents returned per search.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    init_db()
+    # Measure the database path, not the in-process index
+    set_vector_index(None)
+    engine = get_engine()
+
+    layout = get_vector_storage()
+    with engine.connect() as connection:
+        results = {"layout": layout, "documents": db_oprations.get_document_count(),
+                   "sizes": relation_sizes(connection)}
+
+    queries = [(random_embedding(rng), args.limit) for _ in range(args.queries)]
+    with engine.connect() as connection:
+        before = block_counters(connection)
+    latency = time_calls(db_oprations.get_closest_document, queries)
+    with engine.connect() as connection:
+        after = block_counters(connection)
+    # The statistics collector reports with a delay, so the ratio is approximate
+    hit, read = after["hit"] - before["hit"], after["read"] - before["read"]
+    latency["cache_hit_ratio"] = hit / (hit + read) if hit + read else None
+    results[layout] = latency
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import lxml.html
+from lxml import etree
+
+# The result table of a listing page and the cells holding the law links
+RESULT_TABLE_CLASS = "border-list table table-striped table-hover"
+LINK_CELL_CLASS = "text-justify"
+
+# How the site writes the start of the main container and of the result table
+_MAIN_MARKER = 'id="main"'
+_TABLE_MARKER = f'<table class="{RESULT_TABLE_CLASS}"'
+
+# Characters fed to the streaming parser at a time; it stops at the first chunk boundary after the result table
+CHUNK_SIZE = 16384
+
+
+class _ListingLinkTarget:
+    """
+    lxml parser target that collects `//div[@id="main"]//table[@class=...]//td[@class="text-justify"]/a/@href`
+    from parser events, without building a tree.
+    """
+
+    def __init__(self):
+        self.links = []
+        self.done = False
+        self._depth = 0
+        self._main_depth = None
+        self._table_depth = None
+        self._cell_depth = None
+
+    def start(self, tag, attrib):
+        self._depth += 1
+        if self.done:
+            return
+        if self._main_depth is None:
+            if tag == "div" and attrib.get("id") == "main":
+                self._main_depth = self._depth
+        elif self._table_depth is None:
+            if tag == "table" and attrib.get("class") == RESULT_TABLE_CLASS:
+                self._table_depth = self._depth
+        elif self._cell_depth is None:
+            if tag == "td" and attrib.get("class") == LINK_CELL_CLASS:
+                self._cell_depth = self._depth
+        elif tag == "a" and self._depth == self._cell_depth + 1 and attrib.get("href") is not None:
+            self.links.append(attrib["href"])
+
+    def end(self, tag):
+        if self._depth == self._cell_depth:
+            self._cell_depth = None
+        elif self._depth == self._table_depth:
+            self._table_depth = None
+            # Listing pages have a single result table; the rest of the page is not needed
+            self.done = True
+        elif self._depth == self._main_depth:
+            self._main_depth = None
+        self._depth -= 1
+
+    def data(self, data):
+        pass
+
+    def close(self):
+        return self.links
+
+
+def _extract_from_table_slice(html_content: str):
+    """
+    Parse only the result table, found by a plain string search.
+
+    Returns:
+        list: The links, or None if the table is not written the way the site usually writes it.
+    """
+    main_start = html_content.find(_MAIN_MARKER)
+    if main_start == -1:
+        return None
+    table_start = html_content.find(_TABLE_MARKER, main_start)
+    if table_start == -1:
+        return None
+    table_end = html_content.find("</table>", table_start)
+    if table_end == -1 or "<table" in html_content[table_start + len(_TABLE_MARKER):table_end]:
+        return None
+    table = lxml.html.fragment_fromstring(html_content[table_start:table_end + len("</table>")])
+    return table.xpath(f'.//td[@class="{LINK_CELL_CLASS}"]/a/@href')
+
+
+def _extract_streaming(html_content) -> list:
+    """Collect the links with parser events, stopping once the result table is closed."""
+    target = _ListingLinkTarget()
+    parser = etree.HTMLParser(target=target)
+    for start in range(0, len(html_content), CHUNK_SIZE):
+        parser.feed(html_content[start:start + CHUNK_SIZE])
+        if target.done:
+            break
+    return parser.close()
+
+
+def extract_listing_links(html_content) -> list:
+    """
+    Extract the law links of a listing page without building a tree of the whole page.
+
+    The result table is located with a string search and only that slice is parsed. If the
+    page is not laid out as expected (e.g. different attribute quoting or a nested table),
+    the page is fed to lxml's HTML parser in chunks with a target that only tracks the
+    elements on the path to the links, stopping once the result table has been closed.
+    For a page with a single result table, both paths return the same links as the XPath
+    `//div[@id="main"]//table[@class="border-list table table-striped table-hover"]//td[@class="text-justify"]/a/@href`.
+
+    Args:
+        html_content (str | bytes): The HTML content of the listing page.
+
+    Returns:
+        list: The extracted URLs, in document order.
+    """
+    if not html_content:
+        return []
+    if isinstance(html_content, str):
+        links = _extract_from_table_slice(html_content)
+        if links is not None:
+            return [str(link) for link in links]
+    return _extract_streaming(html_content)
@@ -1,57 +1,121 @@
 from .web_scraper import ChromeDriverSetup, WebScraper, Scraper, HTMLParserEachPage, HTMLLinkExtractor
+from .http_scraper import HttpWebScraper
+from .parser import extract_source_id
+from .sharding import parse_shard, select_shard, write_manifest
+from .tree_text import render_markdown
+from .metadata import LAW_TYPE_PARAMS, listing_query, infer_law_type
+import argparse
 import logging
+import os
 import time
-from data_processing.text_cleaner import convert_to_markdown
-from database.db_oprations import insert_document, get_document_count
+from database.db_oprations import upsert_documents, get_document_count, get_source_ids_by_content_hash, \
+    update_document_metadata, get_embeddings_by_content_hash
 from database.models import init_db
-from data_processing.vectorizer import generate_embeddings
+from data_processing.vectorizer import generate_embeddings_batch
+from data_processing.dedup import content_hash, deduplicate, embed_distinct, UNCHANGED
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def main():
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Crawl qavanin.ir laws and store them in the database.")
+    parser.add_argument("--start-page", type=int, default=1, help="First listing page (default: 1).")
+    parser.add_argument("--last-page", type=int, default=2, help="Last listing page, included (default: 2).")
+    parser.add_argument("--items-per-page", type=int, default=25, help="Laws per listing page (default: 25).")
+    parser.add_argument("--backend", choices=("selenium", "http"), default="selenium",
+                        help="Fetch pages with a headless browser or plain HTTP (default: selenium).")
+    parser.add_argument("--law-type", choices=sorted(LAW_TYPE_PARAMS),
+                        help="Only crawl laws of this type; without it the type is guessed from each title.")
+    parser.add_argument("--zone", help="Only crawl laws of this zone, stored with each law for search filters.")
+    parser.add_argument("--shard", help="Only crawl shard i/N of the listing pages, e.g. 0/4.")
+    parser.add_argument("--manifest", help="Write the crawl manifest to this file.")
+    parser.add_argument("--near-duplicate-threshold", type=float, default=0.0,
+                        help="Skip laws whose text overlaps a law kept earlier in the crawl at least this much "
+                             "(estimated Jaccard similarity of word 5-grams, e.g. 0.9); 0, the default, keeps them.")
+    parser.add_argument("--batch-size", type=int, default=256,
+                        help="Laws embedded and written per batch (default: 256).")
+    return parser
+
+
+def main(argv=None):
     """
     Main function to orchestrate the web scraping process.
 
     This function initializes the necessary components, performs the web scraping,
     processes the scraped data, and stores it in the database.
     """
-    try:
-        start = time.time()
-        # total links to load in each page
-        item_in_page = 25
-        # first page that crawling will started at
-        start_page = 1
-        # last page which will be scraped. (from start_page to last_page)
-        last_page = 2
-        # PageNumber and page will be the page's number and size will be item_in_page
-        main_url_template = 'https://qavanin.ir/?PageNumber={}&page={}&size={}'
-        law_url_template = "https://qavanin.ir{}"
+    args = build_parser().parse_args(argv)
+    shard = parse_shard(args.shard) if args.shard else None
+    start = time.time()
+    base_url = os.getenv("QAVANIN_BASE_URL", "https://qavanin.ir").rstrip("/")
+    # PageNumber and page will be the page's number and size will be item_in_page
+    main_url_template = base_url + '/?PageNumber={}&page={}&size={}' + listing_query(args.law_type, args.zone)
+    law_url_template = base_url + "{}"
 
+    init_db()
+    if args.backend == "http":
+        web_scraper = HttpWebScraper()
+    else:
         # initializing Chrome driver
-        init_db()
-        driver_setup = ChromeDriverSetup()
-    except Exception as e:
-        logger.error(f"error initializing driver and db : {e}")
-    with WebScraper(driver_setup) as web_scraper:
+        web_scraper = WebScraper(ChromeDriverSetup())
+
+    content_list, completed, failed = [], [], []
+    with web_scraper:
         scraper = Scraper(web_scraper, HTMLLinkExtractor(), HTMLParserEachPage())
 
-        content_list = scraper.scrape_main_pages(main_url_template, start_page, last_page, item_in_page)
+        for page_number in select_shard(range(args.start_page, args.last_page + 1), shard):
+            page_content = scraper.scrape_main_pages(main_url_template, page_number, page_number,
+                                                     args.items_per_page)
+            (completed if page_content else failed).append(page_number)
+            content_list.extend(page_content)
         ids = scraper.extract_links(content_list)
-        pages_html = scraper.scrape_pages(law_url_template, ids)
+        pages_html = scraper.scrape_pages_with_ids(law_url_template, ids, structured=True)
+
+        # Drop copies before they are embedded: laws seen twice, unchanged since the last crawl,
+        # or (when enabled) near-duplicates of a law kept earlier in this crawl
+        documents = [
+            {"source_id": extract_source_id(link), "content": render_markdown(page), "text": page["text"],
+             "law_type": args.law_type or infer_law_type(page["title"]), "zone": args.zone,
+             "approve_date": page["approval_date"]}
+            for link, page in pages_html
+        ]
+        known_hashes = get_source_ids_by_content_hash([content_hash(doc["content"]) for doc in documents])
+        by_source_id = {str(document["source_id"]): document for document in documents}
+        documents, skipped = deduplicate(documents, args.near_duplicate_threshold, known_hashes)
+        for duplicate in skipped:
+            logger.info(f"Skipping law {duplicate['source_id']}: {duplicate['reason']} of {duplicate['duplicate_of']}")
+        # Unchanged laws are not re-embedded, but their metadata may not have been stored yet
+        backfilled = update_document_metadata(
+            [by_source_id[duplicate["source_id"]] for duplicate in skipped if duplicate["reason"] == UNCHANGED])
+        if backfilled:
+            logger.info(f"Filled in the metadata of {backfilled} unchanged laws")
+
+        # Process and store the scraped content, keyed on the law ID so a recrawl updates in place
+        if documents:
+            # Laws whose text is stored under another law ID reuse its embedding
+            hashes = [content_hash(document["content"]) for document in documents]
+            stored_embeddings = get_embeddings_by_content_hash([digest for digest in hashes if digest in known_hashes])
+            # Embed and write in batches, so a long crawl neither holds every embedding nor writes
+            # them in one transaction; texts embedded in an earlier batch are reused
+            for batch_start in range(0, len(documents), args.batch_size):
+                batch = documents[batch_start:batch_start + args.batch_size]
+                embeddings = embed_distinct(batch, generate_embeddings_batch, stored_embeddings)
+                stored_embeddings.update(zip(hashes[batch_start:batch_start + args.batch_size], embeddings))
+                upsert_documents([
+                    {**document, "embedding": embeds}
+                    for document, embeds in zip(batch, embeddings)
+                ])
 
-        # Process and store the scraped content
-        for page in pages_html:
-            content = convert_to_markdown(page)
-            embeds = generate_embeddings(page)
-            insert_document(content, embeds)
+    if args.manifest:
+        write_manifest(args.manifest, "pages", shard, completed, failed, ids)
 
     end = time.time()
     total_time = end - start
     logger.info(f"Total scraped links (IDs extracted): {len(ids)}")
-    logger.info(f"Scraped {last_page} pages, each page contained {item_in_page} items")
+    logger.info(f"Scraped {len(completed)} pages, each page contained {args.items_per_page} items")
     logger.info(f"Scraped HTML of {len(pages_html)} pages")
+    logger.info(f"Stored {len(documents)} laws, skipped {len(skipped)} duplicates")
     logger.info(f"Total time: {total_time:.2f} seconds")
     logger.info(f"total documents in db: {get_document_count()}")
     return None
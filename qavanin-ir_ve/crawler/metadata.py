@@ -0,0 +1,57 @@
+from typing import Optional
+from urllib.parse import urlencode
+
+# Listing-page parameters (see URL_TEMPLATE in crawler_async/core.py) that restrict the results to one law type
+LAW_TYPE_PARAMS = {
+    "law": "_isLaw",
+    "regulation": "_isRegulation",
+    "vote": "_IsVote",
+    "opinion": "_isOpenion",
+}
+
+# How titles of each law type start, used when the listing was not filtered on a type
+_TITLE_PREFIXES = (
+    ("law", ("قانون",)),
+    ("regulation", ("آیین‌نامه", "آیین نامه", "آئین‌نامه", "آئین نامه", "تصویب‌نامه", "تصویب نامه",
+                    "دستورالعمل", "اساسنامه", "بخشنامه", "مصوبه")),
+    ("vote", ("رأی", "رای")),
+    ("opinion", ("نظریه", "نظر مشورتی")),
+)
+
+
+def listing_query(law_type: Optional[str] = None, zone: Optional[str] = None) -> str:
+    """
+    Build the query-string suffix that restricts a listing page to a law type and a zone.
+
+    Args:
+        law_type (str): One of `LAW_TYPE_PARAMS`, or None for every type.
+        zone (str): The zone as the site names it, or None for every zone.
+
+    Returns:
+        str: The parameters to append to the listing URL, starting with `&`, or an empty string.
+    """
+    params = {}
+    if law_type is not None:
+        params[LAW_TYPE_PARAMS[law_type]] = "true"
+    if zone:
+        params["Zone"] = zone
+    return "&" + urlencode(params) if params else ""
+
+
+def infer_law_type(title: Optional[str]) -> Optional[str]:
+    """
+    Guess the type of a document from how its title starts.
+
+    Args:
+        title (str): The title of the TreeText page.
+
+    Returns:
+        str: `law`, `regulation`, `vote` or `opinion`, or None if the title does not tell.
+    """
+    if not title:
+        return None
+    title = title.strip().replace("ي", "ی").replace("ك", "ک")
+    for law_type, prefixes in _TITLE_PREFIXES:
+        if title.startswith(prefixes):
+            return law_type
+    return None
@@ -1,5 +1,6 @@
 import logging
-from scrapy.selector import Selector
+from .link_extractor import extract_listing_links
+from .tree_text import parse_tree_text
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -9,7 +10,7 @@ class HTMLLinkExtractor:
     """
     A class for extracting links from HTML content.
 
-    This class uses Scrapy's Selector to parse HTML and extract specific links.
+    This class parses only the result table of a listing page (see `extract_listing_links`).
     """
 
     def __init__(self):
@@ -23,14 +24,11 @@ class HTMLLinkExtractor:
             html_content (str): The HTML content to parse.
 
         Returns:
-            list: A list of extracted URLs.
+            list: The URLs extracted from this content; `get_urls` returns all URLs extracted so far.
         """
-        selector = Selector(text=html_content)
-        hrefs = selector.xpath(
-            '//div[@id="main"]//table[@class="border-list table table-striped table-hover"]//td['
-            '@class="text-justify"]/a/@href').getall()
+        hrefs = extract_listing_links(html_content)
         self.urls.extend(hrefs)
-        return self.urls
+        return hrefs
 
     def get_urls(self):
         """
@@ -65,6 +63,9 @@ class HTMLParserEachPage:
             str: The extracted text, joined with double newlines for Markdown compatibility.
         """
         try:
+            # Imported here so that link extraction does not load Scrapy
+            from scrapy.selector import Selector
+
             selector = Selector(text=html_content, type="html")
 
             logger.info("Extracting text from HTML content.")
@@ -85,6 +86,26 @@ class HTMLParserEachPage:
             logger.error(f"An error occurred: {e}")
             return ""
 
+    def extract_structure(self, html_content: object) -> dict:
+        """
+        Extract the law's title, approval date and article/note/clause records from the provided HTML content.
+
+        Unlike `extract_text`, the structure of the law is kept (see `parse_tree_text`), so it does
+        not have to be recovered from the flattened text with regexes.
+
+        Args:
+            html_content (object): The HTML content to parse.
+
+        Returns:
+            dict: The parsed page, or None if it has no <p> tags with class 'SecTex'.
+        """
+        structure = parse_tree_text(html_content)
+        if not structure["records"]:
+            logger.warning("No <p> tags with class 'SecTex' were found.")
+            return None
+        self.pages.append(structure["text"])
+        return structure
+
     def get_pages(self):
         """
         Get the list of extracted page contents.
@@ -92,4 +113,36 @@ class HTMLParserEachPage:
         Returns:
             list: The list of page contents extracted so far.
         """
-        return self.pages
\ No newline at end of file
+        return self.pages
+
+
+def extract_source_id(link: str) -> str:
+    """
+    Extract the qavanin law ID from a law link.
+
+    Args:
+        link (str): A law link such as `/Law/TreeText/?IDS=12345`.
+
+    Returns:
+        str: The value of the `IDS` parameter (the whole link if it has none).
+    """
+    return link.split("IDS=")[-1].split("&")[0]
+
+
+def dedupe_links(links: list) -> list:
+    """
+    Drop the links of laws already linked earlier, since a law can be listed on several listing pages.
+
+    Args:
+        links (list): Law links, in crawl order.
+
+    Returns:
+        list: The first link of each law ID, in the same order.
+    """
+    seen, unique_links = set(), []
+    for link in links:
+        source_id = extract_source_id(link)
+        if source_id not in seen:
+            seen.add(source_id)
+            unique_links.append(link)
+    return unique_links
@@ -0,0 +1,125 @@
+import json
+import zlib
+
+
+def parse_shard(shard: str) -> tuple:
+    """
+    Parse a `--shard i/N` value.
+
+    Args:
+        shard (str): The shard as `i/N`, with 0 <= i < N.
+
+    Returns:
+        tuple: The shard index and the number of shards.
+
+    Raises:
+        ValueError: If the value is not a valid shard.
+    """
+    try:
+        index, count = (int(part) for part in shard.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{shard}', expected i/N such as 0/4.")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard '{shard}', the index must be between 0 and {count - 1}.")
+    return index, count
+
+
+def in_shard(key, shard: tuple) -> bool:
+    """
+    Check whether a listing page or a law ID belongs to a shard.
+
+    Page numbers are assigned round-robin and law IDs by their CRC32, so every process or host
+    computes the same split without coordination, whatever order it reads the keys in.
+
+    Args:
+        key (int | str): A listing page number or a law ID.
+        shard (tuple): The shard index and the number of shards, as returned by `parse_shard`.
+
+    Returns:
+        bool: True if the key belongs to the shard.
+    """
+    index, count = shard
+    if isinstance(key, int):
+        return key % count == index
+    return zlib.crc32(str(key).encode("utf-8")) % count == index
+
+
+def select_shard(keys, shard: tuple = None) -> list:
+    """
+    Keep the keys that belong to a shard.
+
+    Args:
+        keys (iterable): Listing page numbers or law IDs.
+        shard (tuple): The shard, or None to keep every key.
+
+    Returns:
+        list: The keys of the shard, in their original order.
+    """
+    if shard is None:
+        return list(keys)
+    return [key for key in keys if in_shard(key, shard)]
+
+
+def shard_suffix(shard: tuple = None) -> str:
+    """The file name suffix of a shard's outputs, e.g. `-0-of-4` (empty when not sharded)."""
+    return f"-{shard[0]}-of-{shard[1]}" if shard else ""
+
+
+def write_manifest(path: str, kind: str, shard: tuple, completed: list, failed: list, links: list = None):
+    """
+    Write the manifest of a crawl: what it was asked to fetch, what it fetched and the links it found.
+
+    Args:
+        path (str): The manifest file.
+        kind (str): `pages` for listing pages or `laws` for TreeText pages.
+        shard (tuple): The shard that was crawled, or None.
+        completed (list): The pages or law IDs saved.
+        failed (list): The pages or law IDs that could not be fetched.
+        links (list): The law links found on listing pages.
+    """
+    manifest = {
+        "kind": kind,
+        "shard": f"{shard[0]}/{shard[1]}" if shard else None,
+        "completed": completed,
+        "failed": failed,
+        "links": links or [],
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+
+def merge_manifests(paths: list) -> dict:
+    """
+    Merge the manifests of several shards (or of a run and its retries) into one.
+
+    A key that failed in one manifest but was completed in another counts as completed,
+    and links are deduplicated keeping their first-seen order.
+
+    Args:
+        paths (list): The manifest files.
+
+    Returns:
+        dict: The merged manifest.
+
+    Raises:
+        ValueError: If the manifests are of different kinds.
+    """
+    kinds, shards = set(), []
+    completed, failed, links = {}, {}, {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        kinds.add(manifest["kind"])
+        shards.append(manifest["shard"])
+        completed.update(dict.fromkeys(manifest["completed"]))
+        failed.update(dict.fromkeys(manifest["failed"]))
+        links.update(dict.fromkeys(manifest["links"]))
+    if len(kinds) > 1:
+        raise ValueError(f"Cannot merge manifests of different kinds: {', '.join(sorted(kinds))}.")
+    return {
+        "kind": kinds.pop() if kinds else None,
+        "shards": shards,
+        "completed": list(completed),
+        "failed": [key for key in failed if key not in completed],
+        "links": list(links),
+    }
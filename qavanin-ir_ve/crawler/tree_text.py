@@ -0,0 +1,134 @@
+import re
+import lxml.html
+
+# Persian and Arabic-Indic digits, normalized to ASCII in record numbers and dates
+_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
+
+_SEPARATOR = r"\s*[-–—:.)]?\s*"
+_ARTICLE_REGEX = re.compile(r"^(ماده\s*(\d+|[۰-۹]+|واحده))" + _SEPARATOR)
+_NOTE_REGEX = re.compile(r"^(تبصره\s*(\d+|[۰-۹]+)?)" + _SEPARATOR)
+# Clause letters: "الف" or a single other letter (Persian or Arabic ک/ی), so words such as "در -" are not clauses
+_CLAUSE_LETTER = "الف|[بپتثجچحخدذرزژسشصضطظعغفقکگلمنوهیكي]"
+# "بند الف -", "بند (۲)" or a bare "الف -", "۲ -", "ب)" at the start of a paragraph
+_CLAUSE_REGEX = re.compile(r"^((?:بند\s*)?\(?(\d+|[۰-۹]+|" + _CLAUSE_LETTER + r")\)?)\s*[-–—)]\s*")
+_DATE_REGEX = re.compile(r"([0-9۰-۹]{4})/([0-9۰-۹]{1,2})/([0-9۰-۹]{1,2})")
+
+# Paragraphs are joined with the separator HTMLParserEachPage.extract_text uses, which Markdown needs
+PARAGRAPH_SEPARATOR = "\n\n"
+
+
+def _classes(element) -> set:
+    return set((element.get("class") or "").split())
+
+
+def _number(value):
+    return value.translate(_DIGITS) if value else None
+
+
+def _classify(text: str):
+    """Return the kind, label, number and body of a paragraph from how it starts."""
+    for kind, regex in (("article", _ARTICLE_REGEX), ("note", _NOTE_REGEX), ("clause", _CLAUSE_REGEX)):
+        match = regex.match(text)
+        if match and match.end() < len(text):
+            return kind, match.group(1), _number(match.group(2)), text[match.end():]
+    return "text", None, None, text
+
+
+def parse_tree_text(html_content) -> dict:
+    """
+    Parse a TreeText page into the law's title, approval date and a stream of paragraph records.
+
+    The page is walked once. Every `SecTex` paragraph becomes a record whose `kind` is
+    `article` (ماده), `note` (تبصره), `clause` (بند) or `text`, with the number of the
+    article, note and clause it belongs to: an article resets the note and clause, and a
+    note resets the clause, so a clause after a note belongs to that note. Paragraphs
+    before the first article are the preamble: they are `text` records that also give
+    the title (when the page has no `LawTitle`) and the approval date.
+    `start` and `end` are the offsets of each paragraph in `text`, the paragraphs joined
+    with `PARAGRAPH_SEPARATOR`.
+
+    Args:
+        html_content (str | bytes): The HTML content of the TreeText page.
+
+    Returns:
+        dict: The `title`, the `approval_date` as YYYY/MM/DD (or None), the `text` and
+              the `records`, each with `kind`, `label`, `article`, `note`, `clause`,
+              `text`, `body`, `start` and `end`.
+    """
+    structure = {"title": None, "approval_date": None, "text": "", "records": []}
+    if not html_content:
+        return structure
+    tree = lxml.html.fromstring(html_content)
+
+    paragraphs, page_title = [], None
+    article = note = clause = None
+    offset = 0
+    for element in tree.iter("title", "h1", "h2", "p"):
+        classes = _classes(element)
+        text = " ".join("".join(element.itertext()).split())
+        if not text:
+            continue
+        if element.tag == "title":
+            page_title = text
+            continue
+        if "LawTitle" in classes and structure["title"] is None:
+            structure["title"] = text
+            continue
+        if element.tag != "p" or "SecTex" not in classes:
+            continue
+
+        kind, label, number, body = _classify(text)
+        if article is None and kind != "article":
+            # Preamble: the title line and the approval date
+            if structure["approval_date"] is None and (date := _DATE_REGEX.search(text)):
+                year, month, day = (part.translate(_DIGITS) for part in date.groups())
+                structure["approval_date"] = f"{year}/{int(month):02d}/{int(day):02d}"
+            elif structure["title"] is None and structure["approval_date"] is None:
+                structure["title"] = text
+            kind, label, number, body = "text", None, None, text
+        elif kind == "article":
+            article, note, clause = number, None, None
+        elif kind == "note":
+            note, clause = number, None
+        elif kind == "clause":
+            clause = number
+
+        if paragraphs:
+            offset += len(PARAGRAPH_SEPARATOR)
+        paragraphs.append(text)
+        structure["records"].append({
+            "kind": kind, "label": label, "article": article, "note": note,
+            "clause": clause if kind == "clause" else None,
+            "text": text, "body": body, "start": offset, "end": offset + len(text),
+        })
+        offset += len(text)
+
+    structure["title"] = structure["title"] or page_title
+    structure["text"] = PARAGRAPH_SEPARATOR.join(paragraphs)
+    return structure
+
+
+def render_markdown(structure: dict) -> str:
+    """
+    Render a parsed TreeText page as Markdown, from its records rather than from regexes over the raw text.
+
+    Args:
+        structure (dict): The result of `parse_tree_text`.
+
+    Returns:
+        str: The law as Markdown: the title as a heading, articles as subsections, notes
+             in bold, clauses as list items and dates in bold.
+    """
+    blocks = []
+    if structure.get("title"):
+        blocks.append(f"# {structure['title']}")
+    for record in structure.get("records", []):
+        if record["kind"] == "article":
+            blocks.append(f"### {record['label']}\n\n{record['body']}")
+        elif record["kind"] == "note":
+            blocks.append(f"**{record['label']}** - {record['body']}")
+        elif record["kind"] == "clause":
+            blocks.append(f"- **{record['label']}** - {record['body']}")
+        elif record["text"] != structure.get("title"):
+            blocks.append(_DATE_REGEX.sub(r"**\g<0>**", record["text"]))
+    return PARAGRAPH_SEPARATOR.join(blocks)
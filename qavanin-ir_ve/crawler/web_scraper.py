@@ -9,7 +9,7 @@ from selenium.webdriver.common.by import By
 from selenium.common.exceptions import WebDriverException
 from webdriver_manager.chrome import ChromeDriverManager
 import time
-from .parser import HTMLLinkExtractor, HTMLParserEachPage
+from .parser import HTMLLinkExtractor, HTMLParserEachPage, dedupe_links
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -170,13 +170,13 @@ class Scraper:
             content_list (list): A list of page contents.
 
         Returns:
-            list: A list of extracted links.
+            list: The extracted links, without repeating a law listed on several pages.
         """
         all_links = []
         for content in content_list:
             links = self.link_parser.extract_links(content)
             all_links.extend(links)
-        return all_links
+        return dedupe_links(all_links)
 
     def scrape_pages(self, url_template: str, ids: list):
         """
@@ -188,14 +188,29 @@ class Scraper:
 
         returns: A list of page contents.
         """
+        return [parsed_content for _, parsed_content in self.scrape_pages_with_ids(url_template, ids)]
+
+    def scrape_pages_with_ids(self, url_template: str, ids: list, structured: bool = False):
+        """
+        Scrape individual pages using a list of IDs, keeping each page's ID.
+
+        :Args:
+            url_template (str): The URL template to use.
+            ids (list): A list of page IDs to scrape.
+            structured (bool): Return each page's parsed structure (see `HTMLParserEachPage.extract_structure`)
+                instead of its flattened text.
+
+        returns: A list of (ID, page content) tuples.
+        """
+        extract = self.page_parser.extract_structure if structured else self.page_parser.extract_text
         pages_html = []
         for _id in ids:
             url = url_template.format(_id)
             content = self.web_scraper.get_page_content(url)
             if content:
-                parsed_content = self.page_parser.extract_text(content)
+                parsed_content = extract(content)
                 if parsed_content:  # Only append if content was actually extracted
-                    pages_html.append(parsed_content)
+                    pages_html.append((_id, parsed_content))
             else:
                 logger.warning(f"Skipping page with ID {_id} due to error")
         return pages_html
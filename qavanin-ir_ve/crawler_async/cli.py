@@ -0,0 +1,103 @@
+import argparse
+import asyncio
+import logging
+import os
+import time
+from crawler.parser import extract_source_id
+from crawler.sharding import parse_shard, select_shard, shard_suffix, write_manifest, merge_manifests
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def crawl_pages(args):
+    """Crawl the listing pages of a shard and write their links and manifest."""
+    from .scripts.crawl_pages import main as crawl_listing_pages
+
+    shard = parse_shard(args.shard) if args.shard else None
+    pages = select_shard(range(args.start_page, args.last_page + 1), shard)
+    logger.info(f"Crawling {len(pages)} listing pages between {args.start_page} and {args.last_page}")
+    result = asyncio.run(crawl_listing_pages(chunk_size=args.concurrency, output_dir=args.output_dir, pages=pages))
+
+    suffix = shard_suffix(shard)
+    links_path = args.links_output or os.path.join(args.output_dir, f"links{suffix}.txt")
+    with open(links_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(result["links"]))
+    manifest_path = os.path.join(args.output_dir, f"manifest-pages{suffix}.json")
+    write_manifest(manifest_path, "pages", shard, result["completed"], result["failed"], result["links"])
+    logger.info(f"Found {len(result['links'])} links, {len(result['failed'])} pages failed; manifest: {manifest_path}")
+
+
+def crawl_laws(args):
+    """Crawl the TreeText pages of a shard of the law links and write its manifest."""
+    from .scripts.crawl_qavanin import QavaninPageCrawler
+
+    shard = parse_shard(args.shard) if args.shard else None
+    links_path = args.links or os.path.join(args.output_dir, "links.txt")
+    with open(links_path, encoding="utf-8") as f:
+        ids = list(dict.fromkeys(extract_source_id(line.strip()) for line in f if line.strip()))
+    ids = select_shard(ids, shard)
+    crawler = QavaninPageCrawler(chunk_size=args.concurrency, output_dir=args.output_dir, ids=ids)
+    logger.info(f"Crawling {len(crawler.pages)} laws ({len(ids) - len(crawler.pages)} already saved)")
+    asyncio.run(crawler.main())
+
+    manifest_path = os.path.join(args.output_dir, f"manifest-laws{shard_suffix(shard)}.json")
+    write_manifest(manifest_path, "laws", shard, crawler.completed, crawler.failed)
+    logger.info(f"Saved {len(crawler.completed)} laws, {len(crawler.failed)} failed; manifest: {manifest_path}")
+
+
+def merge(args):
+    """Merge the manifests of several shards, and write the merged links for a `pages` crawl."""
+    merged = merge_manifests(args.manifests)
+    write_manifest(args.output, merged["kind"], None, merged["completed"], merged["failed"], merged["links"])
+    if merged["kind"] == "pages" and args.links_output:
+        with open(args.links_output, "w", encoding="utf-8") as f:
+            f.write("\n".join(merged["links"]))
+    logger.info(f"Merged {len(args.manifests)} manifests: {len(merged['completed'])} completed, "
+                f"{len(merged['failed'])} failed, {len(merged['links'])} links")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Crawl qavanin.ir listing pages and laws, optionally split across processes or hosts.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    pages = subparsers.add_parser("pages", help="Crawl listing pages and collect the law links.")
+    pages.add_argument("--start-page", type=int, default=1, help="First listing page (default: 1).")
+    pages.add_argument("--last-page", type=int, required=True, help="Last listing page, included.")
+    pages.add_argument("--concurrency", type=int, default=50, help="Pages requested at once (default: 50).")
+    pages.add_argument("--output-dir", default="./files", help="Where pages and manifests are written.")
+    pages.add_argument("--links-output", help="Links file (default: <output-dir>/links[-i-of-N].txt).")
+    pages.add_argument("--shard", help="Only crawl shard i/N of the pages, e.g. 0/4.")
+    pages.set_defaults(func=crawl_pages)
+
+    laws = subparsers.add_parser("laws", help="Crawl the TreeText pages of the collected links.")
+    laws.add_argument("--links", help="Links file to crawl (default: <output-dir>/links.txt).")
+    laws.add_argument("--concurrency", type=int, default=50, help="Laws requested at once (default: 50).")
+    laws.add_argument("--output-dir", default="./files", help="Where laws and manifests are written.")
+    laws.add_argument("--shard", help="Only crawl shard i/N of the law IDs, e.g. 0/4.")
+    laws.set_defaults(func=crawl_laws)
+
+    merge_parser = subparsers.add_parser("merge", help="Merge the manifests of several shards.")
+    merge_parser.add_argument("manifests", nargs="+", help="Manifest files to merge.")
+    merge_parser.add_argument("--output", required=True, help="Merged manifest file.")
+    merge_parser.add_argument("--links-output", help="Also write the merged links of a pages crawl here.")
+    merge_parser.set_defaults(func=merge)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if getattr(args, "shard", None):
+        # Fail fast on a malformed shard before any request is sent
+        try:
+            parse_shard(args.shard)
+        except ValueError as e:
+            build_parser().error(str(e))
+    start = time.time()
+    args.func(args)
+    logger.info(f"Total time: {time.time() - start:.2f} seconds")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,11 @@ import pythonmonkey as pm
 import os
 import aiohttp
 
-BASE_URL: str = "https://qavanin.ir/"
-BASE_QAVANIN_URL: str = f"{BASE_URL}/Law/TreeText/?IDS="
+# QAVANIN_BASE_URL points the crawlers at another host, e.g. the mock in benchmarks/mock_qavanin.py
+BASE_URL: str = os.getenv("QAVANIN_BASE_URL", "https://qavanin.ir").rstrip("/") + "/"
+BASE_QAVANIN_URL: str = f"{BASE_URL}Law/TreeText/?IDS="
 URL_TEMPLATE: str = (
-    "https://qavanin.ir/?CAPTION=&Zone=&IsTitleSearch=true&IsTitleSearch=false&IsTextSearch=false&_isLaw=false&_isRegulation=false&_IsVote=false&_isOpenion=false&SeachTextType=3&fromApproveDate=&APPROVEDATE=&IsTitleSubject=False&IsMain=&COMMANDNO=&fromCommandDate=&COMMANDDATE=&NEWSPAPERNO=&fromNewspaperDate=&NEWSPAPERDATE=&SortColumn=APPROVEDATE&SortDesc=True&Report_ID=&PageNumber={page}&page={page}&size=1000&txtZone=&txtSubjects=&txtExecutors=&txtApprovers=&txtLawStatus=&txtLawTypes="
+    BASE_URL + "?CAPTION=&Zone=&IsTitleSearch=true&IsTitleSearch=false&IsTextSearch=false&_isLaw=false&_isRegulation=false&_IsVote=false&_isOpenion=false&SeachTextType=3&fromApproveDate=&APPROVEDATE=&IsTitleSubject=False&IsMain=&COMMANDNO=&fromCommandDate=&COMMANDDATE=&NEWSPAPERNO=&fromNewspaperDate=&NEWSPAPERDATE=&SortColumn=APPROVEDATE&SortDesc=True&Report_ID=&PageNumber={page}&page={page}&size=1000&txtZone=&txtSubjects=&txtExecutors=&txtApprovers=&txtLawStatus=&txtLawTypes="
 )
 CDN_REGEX: str = r"<\/script><script type=\"text\/javascript\">(var.+\n)"
 
@@ -1,5 +1,6 @@
 import logging
 import lxml.html
+from crawler.link_extractor import extract_listing_links
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -9,7 +10,7 @@ class HTMLLinkExtractor:
     """
     A class for extracting links from HTML content.
 
-    This class uses Scrapy's Selector to parse HTML and extract specific links.
+    This class parses only the result table of a listing page (see `extract_listing_links`).
     """
 
     def __init__(self):
@@ -23,14 +24,11 @@ class HTMLLinkExtractor:
             html_content (str): The HTML content to parse.
 
         Returns:
-            list: A list of extracted URLs.
+            list: The URLs extracted from this content; `get_urls` returns all URLs extracted so far.
         """
-        tree = lxml.html.fromstring(html_content)
-        hrefs = tree.xpath(
-            '//div[@id="main"]//table[@class="border-list table table-striped table-hover"]//td[@class="text-justify"]/a/@href'
-        )
+        hrefs = extract_listing_links(html_content)
         self.urls.extend(hrefs)
-        return self.urls
+        return hrefs
 
     def get_urls(self):
         """
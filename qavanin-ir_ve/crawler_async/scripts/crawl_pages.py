@@ -1,9 +1,10 @@
 import asyncio
+import os
 from crawler_async.core import URL_TEMPLATE, get_hash, get_page_async
+from crawler.link_extractor import extract_listing_links
+from crawler.parser import dedupe_links
 from tqdm import tqdm
-import lxml.html
 import logging
-import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -21,44 +22,42 @@ async def handle_page(url, headers={}):
     return content
 
 
-async def main(start_page=1, last_page=2):
-    links = []
-    pages = range(start_page, last_page + 1)
-    chunked_pages = [pages[i : i + 50] for i in range(0, len(pages), 50)]
+async def main(start_page=1, last_page=2, chunk_size=50, output_dir="./files", pages=None) -> dict:
+    """
+    Crawl listing pages, save them to `<output_dir>/pages` and collect the law links they list.
+
+    Args:
+        start_page (int): The first listing page (default: 1).
+        last_page (int): The last listing page, included (default: 2).
+        chunk_size (int): The number of pages requested concurrently (default: 50).
+        output_dir (str): The directory the pages are saved under (default: ./files).
+        pages (list): The listing pages to crawl instead of start_page..last_page, e.g. one shard of them.
+
+    Returns:
+        dict: The `links` found (one per law), and the `completed` and `failed` page numbers.
+    """
+    links, completed, failed = [], [], []
+    pages = list(pages) if pages is not None else list(range(start_page, last_page + 1))
+    os.makedirs(os.path.join(output_dir, "pages"), exist_ok=True)
+    chunked_pages = [pages[i : i + chunk_size] for i in range(0, len(pages), chunk_size)]
     for chunk in chunked_pages:
         tasks = [handle_page(URL_TEMPLATE.format(page=page)) for page in chunk]
         responses = await asyncio.gather(*tasks)
 
         for page, response in tqdm(zip(chunk, responses)):
             if response is None:
-                logger.error("Error")
+                logger.error(f"Error crawling listing page {page}")
+                failed.append(page)
                 continue
-            tree = lxml.html.fromstring(response)
-            urls = tree.xpath(
-                '//div[@id="main"]//table[@class="border-list table table-striped table-hover"]//td[@class="text-justify"]/a/@href'
-            )
-            links.extend(urls)
-            with open(f"./files/pages/{page}.html", "w", encoding="utf-8") as f:
+            links.extend(extract_listing_links(response))
+            completed.append(page)
+            with open(os.path.join(output_dir, "pages", f"{page}.html"), "w", encoding="utf-8") as f:
                 f.write(response)
-    with open("./files/links.txt", "w", encoding="utf-8") as f:
-        # for link in links:
-        #     f.write(f"{link}\n")
-        f.write("\n".join(links))
+    # A law can be listed on several pages; keep its first link only
+    return {"links": dedupe_links(links), "completed": completed, "failed": failed}
 
 
 if __name__ == "__main__":
-    
-    logger.info("Start Crawling")
-    start = time.time()
-    start_page = 1
-    last_page = 161
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    try:
-        loop.run_until_complete(main(start_page, last_page))
-    except KeyboardInterrupt:
-        pass
+    from crawler_async.cli import main as cli_main
 
-    end = time.time()
-    total_time = end - start
-    logger.info(f"Total time: {total_time:.2f} seconds")
+    cli_main(["pages", "--start-page", "1", "--last-page", "161"])
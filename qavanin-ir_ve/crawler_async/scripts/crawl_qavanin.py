@@ -1,11 +1,9 @@
 import asyncio
 import aiohttp
+import os
 from crawler_async.core import BASE_QAVANIN_URL, get_hash
-import json
 import glob
-import time, random
 import logging
-import time
 from tqdm import tqdm
 
 logging.basicConfig(level=logging.INFO)
@@ -13,19 +11,31 @@ logger = logging.getLogger(__name__)
 
 
 class QavaninPageCrawler:
-    def __init__(self, chunk_size: int = 50):
+    def __init__(self, chunk_size: int = 50, output_dir: str = "./files", links_path: str = None,
+                 ids: list = None):
+        """
+        Initialize the QavaninPageCrawler.
+
+        Args:
+            chunk_size (int): The number of laws requested concurrently (default: 50).
+            output_dir (str): The directory the laws are saved under (default: ./files).
+            links_path (str): The file of law links to crawl (default: <output_dir>/links.txt).
+            ids (list): The law IDs to crawl instead of those of `links_path`, e.g. one shard of them.
+        """
         self.chunk_size = chunk_size
-        self.files: list[str] = glob.glob("./files/qavanin/*.html")
+        self.output_dir = output_dir
+        os.makedirs(os.path.join(output_dir, "qavanin"), exist_ok=True)
+        self.files: list[str] = glob.glob(os.path.join(output_dir, "qavanin", "*.html"))
         self.exists: set[str] = set(
-            [file.split("\\")[-1].split(".html")[0] for file in self.files]
+            [os.path.basename(file).split(".html")[0] for file in self.files]
         )
-        with open("./files/links.txt", "r", encoding="utf-8") as f:
-            self.data: list[dict] = [x.strip() for x in f.readlines()]
-        self.pages: list[str] = [
-            x.split("IDS=")[-1]
-            for x in self.data
-            if x.split("IDS=")[-1] not in self.exists
-        ]
+        if ids is None:
+            with open(links_path or os.path.join(output_dir, "links.txt"), "r", encoding="utf-8") as f:
+                self.data: list[str] = [x.strip() for x in f.readlines() if x.strip()]
+            ids = [x.split("IDS=")[-1] for x in self.data]
+        self.pages: list[str] = [x for x in ids if x not in self.exists]
+        self.completed: list[str] = []
+        self.failed: list[str] = []
 
         self.chunked_pages: list[list[str]] = [
             self.pages[i : i + self.chunk_size]
@@ -58,8 +68,7 @@ class QavaninPageCrawler:
         return content
 
     async def main(self) -> None:
-        # for chunk in self.chunked_pages:
-        for chunk in self.chunked_pages:  # todo: remove in production
+        for chunk in self.chunked_pages:
             errors = []
             tasks = [self.handle_page(BASE_QAVANIN_URL + page) for page in chunk]
             responses = await asyncio.gather(*tasks)
@@ -68,16 +77,18 @@ class QavaninPageCrawler:
 
                 if response and "treeText" in response:
                     with open(
-                        f"./files/qavanin/{page}.html", "w", encoding="utf-8"
+                        os.path.join(self.output_dir, "qavanin", f"{page}.html"), "w", encoding="utf-8"
                     ) as f:
                         f.write(response)
+                    self.completed.append(page)
                     continue
                 else:
                     errors.append(page)
                     continue
             print("Errors count:", len(errors))
+            self.failed.extend(errors)
             with open(
-                f"./files/errors_{self.chunk_size}.txt", "a", encoding="utf-8"
+                os.path.join(self.output_dir, f"errors_{self.chunk_size}.txt"), "a", encoding="utf-8"
             ) as f:
                 f.write(",".join(errors) + "\n")
 
@@ -91,13 +102,6 @@ class QavaninPageCrawler:
 
 
 if __name__ == "__main__":
+    from crawler_async.cli import main as cli_main
 
-    logger.info("Start Crawling Qavanin")
-    start = time.time()
-
-    crawler = QavaninPageCrawler(chunk_size=300)
-    print("total qavanin:", len(crawler.pages))
-    crawler.run()
-    end = time.time()
-    total_time = end - start
-    logger.info(f"Total time: {total_time:.2f} seconds")
+    cli_main(["laws", "--concurrency", "300"])
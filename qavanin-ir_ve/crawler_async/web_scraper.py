@@ -1,6 +1,7 @@
 import logging
 from .parser import HTMLLinkExtractor, HTMLParserEachPage
 from .core import get_page, get_hash
+from crawler.parser import dedupe_links
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -91,13 +92,13 @@ class Scraper:
             content_list (list): A list of page contents.
 
         Returns:
-            list: A list of extracted links.
+            list: The extracted links, without repeating a law listed on several pages.
         """
         all_links = []
         for content in content_list:
             links = self.link_parser.extract_links(content)
             all_links.extend(links)
-        return all_links
+        return dedupe_links(all_links)
 
     def scrape_pages(self, url_template: str, ids: list):
         """
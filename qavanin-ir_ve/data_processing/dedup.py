@@ -0,0 +1,243 @@
+import hashlib
+import re
+import zlib
+from typing import Optional
+import numpy as np
+
+_WORD_REGEX = re.compile(r"\w+")
+# Arabic code points that Persian texts use interchangeably with their Persian forms
+_PERSIAN_CHARS = str.maketrans({"ي": "ی", "ى": "ی", "ك": "ک", "ة": "ه", "‌": " "})
+
+# Universal hashing of shingles (a * x + b) mod p, with a prime above 2^32 so every 32-bit hash maps
+# to a distinct value; a, b and x are below 2^32, so a * x + b never overflows uint64
+_PRIME = np.uint64(4294967311)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+# Why a document is skipped
+SAME_SOURCE_ID = "source_id"
+UNCHANGED = "unchanged"
+NEAR_DUPLICATE = "near_duplicate"
+
+
+def content_hash(content: str) -> str:
+    """
+    Hash a document's content for exact duplicate detection.
+
+    Args:
+        content (str): The stored content of the document.
+
+    Returns:
+        str: The hex SHA-256 of the UTF-8 content, as stored in `law_documents.content_hash`.
+    """
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def shingles(content: str, size: int = 5) -> set:
+    """
+    Split a text into overlapping word n-grams, after normalizing Arabic letters to their Persian forms.
+
+    Args:
+        content (str): The text.
+        size (int): The number of words per shingle (default: 5).
+
+    Returns:
+        set: The distinct shingles; a text shorter than `size` words is a single shingle.
+    """
+    words = _WORD_REGEX.findall(content.translate(_PERSIAN_CHARS).lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHashLSH:
+    """
+    MinHash signatures of word shingles, indexed with locality-sensitive hashing.
+
+    Two documents land in the same bucket of at least one band with high probability when the
+    Jaccard similarity of their shingles is above about (1 / bands) ** (1 / rows); the candidates
+    are then checked with the similarity estimated from their full signatures.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 16, shingle_size: int = 5, seed: int = 1):
+        """
+        Initialize an empty index.
+
+        Args:
+            num_perm (int): The number of hash functions per signature (default: 128).
+            bands (int): The number of LSH bands; must divide `num_perm` (default: 16).
+            shingle_size (int): The number of words per shingle (default: 5).
+            seed (int): The seed of the hash functions, so signatures are reproducible (default: 1).
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands.")
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2 ** 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 2 ** 32, size=num_perm, dtype=np.uint64)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self._buckets = [{} for _ in range(bands)]
+        self._signatures = {}
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def signature(self, content: str) -> Optional[np.ndarray]:
+        """
+        Compute the MinHash signature of a text.
+
+        Args:
+            content (str): The text.
+
+        Returns:
+            np.ndarray: The signature, or None if the text has no words.
+        """
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles(content, self.shingle_size)),
+                             dtype=np.uint64)
+        if not len(hashes):
+            return None
+        return ((np.outer(hashes, self._a) + self._b) % _PRIME & _MAX_HASH).min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray):
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def query(self, signature: np.ndarray, threshold: float):
+        """
+        Find the indexed document most similar to a signature.
+
+        Args:
+            signature (np.ndarray): The signature of the document.
+            threshold (float): The minimum estimated Jaccard similarity.
+
+        Returns:
+            tuple: The key of the most similar indexed document and its similarity, or (None, 0.0).
+        """
+        candidates = set()
+        for bucket, band_key in zip(self._buckets, self._band_keys(signature)):
+            candidates.update(bucket.get(band_key, ()))
+        best_key, best_similarity = None, 0.0
+        for key in candidates:
+            similarity = float(np.mean(self._signatures[key] == signature))
+            if similarity >= threshold and similarity > best_similarity:
+                best_key, best_similarity = key, similarity
+        return best_key, best_similarity
+
+    def add(self, key, signature: np.ndarray):
+        """
+        Index a document's signature.
+
+        Args:
+            key: The key returned by `query` for this document.
+            signature (np.ndarray): The signature of the document.
+        """
+        self._signatures[key] = signature
+        for bucket, band_key in zip(self._buckets, self._band_keys(signature)):
+            bucket.setdefault(band_key, []).append(key)
+
+
+class Deduplicator:
+    """
+    Ingestion filter that drops documents already written or already seen, before they are embedded.
+
+    A document is skipped when its law ID was already seen in this run, when the stored copy of
+    the same law has the same content (nothing to re-embed), or, when near-duplicate detection is
+    enabled, when its shingles are near-duplicates of a document kept earlier in this run. Laws with
+    another law ID are always kept, even when their text is the same; `embed_distinct` then embeds
+    each text only once.
+    """
+
+    def __init__(self, near_duplicate_threshold: float = 0.0, known_hashes: dict = None, **minhash_options):
+        """
+        Initialize the filter.
+
+        Args:
+            near_duplicate_threshold (float): The estimated Jaccard similarity from which a document is a
+                                              near-duplicate, or 0 to disable near-duplicate detection (default: 0).
+            known_hashes (dict): Content hashes of the stored documents, mapped to the list of their law IDs.
+            **minhash_options: Options of the `MinHashLSH` index (num_perm, bands, shingle_size).
+        """
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self._known_hashes = {digest: set(source_ids) for digest, source_ids in (known_hashes or {}).items()}
+        self._source_ids = set()
+        self._lsh = MinHashLSH(**minhash_options) if near_duplicate_threshold > 0 else None
+
+    def check(self, source_id: str, content: str) -> Optional[dict]:
+        """
+        Check a document, and remember it if it is kept.
+
+        Args:
+            source_id (str): The qavanin law ID of the document.
+            content (str): The content that would be stored.
+
+        Returns:
+            dict: None if the document should be written; otherwise the `reason` it is skipped, the law ID it
+                  duplicates as `duplicate_of`, and the `similarity` for near-duplicates.
+        """
+        source_id = str(source_id)
+        if source_id in self._source_ids:
+            return {"reason": SAME_SOURCE_ID, "duplicate_of": source_id}
+        if source_id in self._known_hashes.get(content_hash(content), ()):
+            return {"reason": UNCHANGED, "duplicate_of": source_id}
+
+        signature = None
+        if self._lsh is not None:
+            signature = self._lsh.signature(content)
+            if signature is not None:
+                similar_source_id, similarity = self._lsh.query(signature, self.near_duplicate_threshold)
+                if similar_source_id is not None:
+                    return {"reason": NEAR_DUPLICATE, "duplicate_of": similar_source_id,
+                            "similarity": round(similarity, 3)}
+
+        self._source_ids.add(source_id)
+        if signature is not None:
+            self._lsh.add(source_id, signature)
+        return None
+
+
+def deduplicate(documents: list, near_duplicate_threshold: float = 0.0, known_hashes: dict = None) -> tuple:
+    """
+    Split documents into the ones to write and the duplicates to skip, keeping the first of each group.
+
+    Args:
+        documents (list): Dictionaries with at least the `source_id` and `content` of each document.
+        near_duplicate_threshold (float): See `Deduplicator` (default: 0, disabled).
+        known_hashes (dict): Content hashes of the stored documents, mapped to the list of their law IDs.
+
+    Returns:
+        tuple: The documents to write, and the skipped ones as dictionaries with their `source_id`,
+               the `reason` and the law ID they duplicate (`duplicate_of`).
+    """
+    deduplicator = Deduplicator(near_duplicate_threshold, known_hashes)
+    kept, skipped = [], []
+    for document in documents:
+        duplicate = deduplicator.check(document["source_id"], document["content"])
+        if duplicate is None:
+            kept.append(document)
+        else:
+            skipped.append({"source_id": str(document["source_id"]), **duplicate})
+    return kept, skipped
+
+
+def embed_distinct(documents: list, embed, stored_embeddings: dict = None) -> list:
+    """
+    Embed documents, computing each distinct text only once.
+
+    Laws published under several law IDs share their text; they are all written, with the embedding
+    already stored for their content hash, or computed once for the whole batch.
+
+    Args:
+        documents (list): Dictionaries with the `text` that is embedded and the stored `content`.
+        embed (Callable): Embeds a list of texts, e.g. `generate_embeddings_batch`.
+        stored_embeddings (dict): The stored embedding of content hashes, see
+                                  `database.db_oprations.get_embeddings_by_content_hash`.
+
+    Returns:
+        list: The embedding of each document, in order.
+    """
+    stored_embeddings = stored_embeddings or {}
+    hashes = [content_hash(document["content"]) for document in documents]
+    texts = list(dict.fromkeys(document["text"] for document, digest in zip(documents, hashes)
+                               if digest not in stored_embeddings))
+    computed = dict(zip(texts, embed(texts))) if texts else {}
+    return [stored_embeddings[digest] if digest in stored_embeddings else computed[document["text"]]
+            for document, digest in zip(documents, hashes)]
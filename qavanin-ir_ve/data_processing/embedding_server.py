@@ -0,0 +1,305 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Environment variable holding the Unix socket path of the embedding sidecar
+EMBEDDING_SOCKET_ENV = "EMBEDDING_SOCKET"
+DEFAULT_SOCKET_PATH = "/tmp/qavanin-embeddings.sock"
+
+# Request: 4-byte big-endian length followed by a JSON list of strings.
+# Response: rows and dimension as two 4-byte big-endian integers followed by float32 data,
+# or rows = 0 and a 4-byte length followed by a UTF-8 error message.
+_HEADER = struct.Struct(">I")
+_SHAPE = struct.Struct(">II")
+# Largest request the sidecar reads; a longer frame is answered with an error and the connection closed
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+
+
+class EmbeddingServiceError(Exception):
+    """Custom exception for errors reported by the embedding sidecar."""
+    pass
+
+
+def get_embedding_socket():
+    """
+    Return the socket path of the embedding sidecar, or None if embeddings are computed in process.
+
+    Returns:
+        str: The configured Unix socket path, or None.
+    """
+    return os.getenv(EMBEDDING_SOCKET_ENV) or None
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            raise ConnectionError("Embedding sidecar closed the connection")
+        buffer.extend(chunk)
+    return bytes(buffer)
+
+
+class EmbeddingClient:
+    """
+    Client for the embedding sidecar.
+
+    Each thread keeps its own connection open so the socket setup cost is paid once per worker thread.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 30.0):
+        """
+        Initialize the EmbeddingClient.
+
+        Args:
+            socket_path (str): The Unix socket path of the sidecar.
+            timeout (float): Socket timeout in seconds (default: 30).
+        """
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def encode(self, sentences: list[str]) -> np.ndarray:
+        """
+        Encode sentences through the sidecar.
+
+        Args:
+            sentences (list[str]): The sentences to encode.
+
+        Returns:
+            np.ndarray: A float32 matrix with one row per sentence.
+
+        Raises:
+            EmbeddingServiceError: If the sidecar reports an error.
+        """
+        payload = json.dumps(sentences).encode("utf-8")
+        # Retry once on a stale connection (e.g. after the sidecar was restarted)
+        for attempt in range(2):
+            try:
+                sock = self._connect()
+                sock.sendall(_HEADER.pack(len(payload)) + payload)
+                rows, dim = _SHAPE.unpack(_recv_exactly(sock, _SHAPE.size))
+                if rows == 0 and dim:
+                    message = _recv_exactly(sock, dim).decode("utf-8")
+                    raise EmbeddingServiceError(message)
+                data = _recv_exactly(sock, rows * dim * 4)
+                return np.frombuffer(data, dtype=np.float32).reshape(rows, dim)
+            except socket.timeout:
+                # The sidecar may still be encoding this request; sending it again would only add to its load
+                self._close()
+                raise
+            except (ConnectionError, BrokenPipeError):
+                self._close()
+                if attempt == 1:
+                    raise
+        return np.empty((0, 0), dtype=np.float32)
+
+
+class EmbeddingBatcher:
+    """
+    Queue of encode requests served by one model call per batch.
+
+    Requests arriving while the model is busy, or within `max_wait_ms` of each other, are encoded
+    together, so concurrent workers share one forward pass instead of waiting for each other. Only
+    one batch runs at a time: torch already spreads a batch over all cores.
+    """
+
+    def __init__(self, model, max_batch_size: int = 64, max_wait_ms: float = 2.0):
+        """
+        Initialize the batcher.
+
+        Args:
+            model: The sentence-transformers model.
+            max_batch_size (int): The number of sentences from which no more requests join a batch (default: 64).
+            max_wait_ms (float): How long a batch waits for more requests after the first one (default: 2).
+        """
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        """Start serving the queue on the running event loop."""
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop serving the queue."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def encode(self, sentences: list) -> np.ndarray:
+        """
+        Encode sentences in the next batch.
+
+        Args:
+            sentences (list): The sentences to encode.
+
+        Returns:
+            np.ndarray: A float32 matrix with one row per sentence.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((sentences, future))
+        return await future
+
+    async def _next_batch(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        size = len(batch[0][0])
+        deadline = loop.time() + self.max_wait
+        # Requests already queued (they arrived during the previous batch) join without waiting
+        while size < self.max_batch_size:
+            timeout = deadline - loop.time()
+            try:
+                request = await asyncio.wait_for(self._queue.get(), timeout) if timeout > 0 else \
+                    self._queue.get_nowait()
+            except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                break
+            batch.append(request)
+            size += len(request[0])
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            sentences = [sentence for request, _ in batch for sentence in request]
+            try:
+                embeddings = await asyncio.to_thread(self.model.encode, sentences) if sentences else []
+                embeddings = np.ascontiguousarray(embeddings, dtype=np.float32).reshape(len(sentences), -1)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            start = 0
+            for request, future in batch:
+                if not future.done():
+                    future.set_result(embeddings[start:start + len(request)])
+                start += len(request)
+
+
+async def _handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, batcher: EmbeddingBatcher,
+                             max_request_bytes: int = MAX_REQUEST_BYTES):
+    try:
+        while True:
+            try:
+                header = await reader.readexactly(_HEADER.size)
+            except asyncio.IncompleteReadError:
+                break
+            (length,) = _HEADER.unpack(header)
+            if length > max_request_bytes:
+                # The rest of the frame is not read, so the connection cannot be reused
+                message = f"Request of {length} bytes exceeds the limit of {max_request_bytes} bytes".encode("utf-8")
+                logger.error(message.decode("utf-8"))
+                writer.write(_SHAPE.pack(0, len(message)) + message)
+                await writer.drain()
+                break
+            payload = await reader.readexactly(length)
+            try:
+                sentences = json.loads(payload.decode("utf-8"))
+                if not isinstance(sentences, list) or not all(isinstance(s, str) for s in sentences):
+                    raise ValueError("Request must be a JSON list of strings")
+                embeddings = await batcher.encode(sentences)
+                writer.write(_SHAPE.pack(*embeddings.shape) + embeddings.tobytes())
+            except Exception as e:
+                message = str(e).encode("utf-8")
+                logger.error(f"Error encoding request: {e}")
+                writer.write(_SHAPE.pack(0, len(message)) + message)
+            await writer.drain()
+    finally:
+        writer.close()
+
+
+async def start_server(socket_path: str, model, max_batch_size: int = 64, max_wait_ms: float = 2.0,
+                       max_request_bytes: int = MAX_REQUEST_BYTES):
+    """
+    Start serving embeddings of a loaded model over a Unix socket.
+
+    Args:
+        socket_path (str): The Unix socket path to listen on.
+        model: The sentence-transformers model.
+        max_batch_size (int): See `EmbeddingBatcher` (default: 64).
+        max_wait_ms (float): See `EmbeddingBatcher` (default: 2).
+        max_request_bytes (int): The largest request read (default: MAX_REQUEST_BYTES).
+
+    Returns:
+        tuple: The asyncio server and its `EmbeddingBatcher`, to stop once the server is closed.
+    """
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    batcher = EmbeddingBatcher(model, max_batch_size, max_wait_ms)
+    batcher.start()
+    server = await asyncio.start_unix_server(
+        lambda reader, writer: _handle_connection(reader, writer, batcher, max_request_bytes),
+        path=socket_path,
+    )
+    os.chmod(socket_path, 0o660)
+    return server, batcher
+
+
+async def serve(socket_path: str, max_batch_size: int = 64, max_wait_ms: float = 2.0,
+                max_request_bytes: int = MAX_REQUEST_BYTES):
+    """
+    Load the model once and serve embeddings over a Unix socket.
+
+    Args:
+        socket_path (str): The Unix socket path to listen on.
+        max_batch_size (int): See `EmbeddingBatcher` (default: 64).
+        max_wait_ms (float): See `EmbeddingBatcher` (default: 2).
+        max_request_bytes (int): The largest request read (default: MAX_REQUEST_BYTES).
+    """
+    from .vectorizer import load_local_model
+
+    model = load_local_model()
+    model.encode(["warmup"])
+    server, batcher = await start_server(socket_path, model, max_batch_size, max_wait_ms, max_request_bytes)
+    logger.info(f"Embedding sidecar listening on {socket_path}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await batcher.stop()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Serve sentence embeddings to API workers over a Unix socket.")
+    parser.add_argument("--socket", default=get_embedding_socket() or DEFAULT_SOCKET_PATH)
+    parser.add_argument("--max-batch-size", type=int, default=64,
+                        help="Sentences from which no more requests join a model call (default: 64).")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0,
+                        help="How long a model call waits for more requests (default: 2).")
+    parser.add_argument("--max-request-bytes", type=int, default=MAX_REQUEST_BYTES,
+                        help=f"Largest request accepted (default: {MAX_REQUEST_BYTES}).")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.socket, args.max_batch_size, args.max_wait_ms, args.max_request_bytes))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,146 @@
+import logging
+import os
+import threading
+import time
+from .snippets import extract_snippet
+from monitoring.metrics import track_stage, RERANK_SKIPPED
+
+logger = logging.getLogger(__name__)
+
+# Environment variables configuring the re-ranking stage
+RERANKER_MODEL_ENV = "RERANKER_MODEL"
+RERANK_CANDIDATES_ENV = "RERANK_CANDIDATES"
+RERANK_BUDGET_ENV = "RERANK_BUDGET_MS"
+
+# Characters of each law scored by the cross-encoder: the passage that best matches the query,
+# long enough to fill the model's input but short enough to keep a batch fast
+PASSAGE_WIDTH = 1000
+# Weight of the latest batch in the running estimate of the time per scored pair
+_COST_SMOOTHING = 0.2
+
+# The model is loaded by the API lifespan when re-ranking is enabled, never on the request path
+_model = None
+_model_lock = threading.Lock()
+# Only one batch is scored at a time; a request that finds the model busy skips re-ranking rather than
+# holding a thread of the EMBED pool while it waits
+_score_lock = threading.Lock()
+# Running estimate of the seconds needed to score one (query, passage) pair, None until the first batch
+_seconds_per_pair = None
+
+
+def is_reranker_enabled() -> bool:
+    """
+    Check whether re-ranking is enabled, that is whether RERANKER_MODEL names a cross-encoder,
+    e.g. `cross-encoder/mmarco-mMiniLMv2-L12-H384-v1` (a small multilingual model that handles Persian).
+
+    Returns:
+        bool: True if the cross-encoder should be loaded at startup.
+    """
+    return bool(os.getenv(RERANKER_MODEL_ENV, "").strip())
+
+
+def get_rerank_candidates() -> int:
+    """
+    Return how many ANN candidates are fetched for re-ranking (RERANK_CANDIDATES, default 50).
+
+    Returns:
+        int: The number of candidates.
+    """
+    return int(os.getenv(RERANK_CANDIDATES_ENV, "50") or 50)
+
+
+def get_rerank_budget() -> float:
+    """
+    Return the default time budget of a re-ranked search (RERANK_BUDGET_MS, default 300 ms).
+
+    Returns:
+        float: The budget in seconds.
+    """
+    return float(os.getenv(RERANK_BUDGET_ENV, "300") or 300) / 1000
+
+
+def load_reranker():
+    """
+    Load the cross-encoder if it is not loaded yet. Safe to call from several threads.
+
+    Returns:
+        CrossEncoder: The loaded model.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import CrossEncoder
+
+                model_name = os.getenv(RERANKER_MODEL_ENV).strip()
+                logger.info(f"Loading cross-encoder {model_name}...")
+                _model = CrossEncoder(model_name, device="cpu")
+                logger.info("Cross-encoder loaded.")
+    return _model
+
+
+def warmup_reranker():
+    """Score a dummy pair so the first re-ranked search does not pay for lazy initialization."""
+    score_pairs("warmup", ["warmup"])
+
+
+def score_pairs(query: str, passages: list) -> list:
+    """
+    Score (query, passage) pairs with the cross-encoder in one batch.
+
+    Args:
+        query (str): The query text.
+        passages (list): The passages to score.
+
+    Returns:
+        list: One relevance score per passage, higher is more relevant.
+    """
+    return load_reranker().predict([(query, passage) for passage in passages], batch_size=len(passages)).tolist()
+
+
+def rerank(query: str, documents: list, deadline: float) -> tuple:
+    """
+    Re-order search candidates by cross-encoder relevance, if it fits in the time left.
+
+    Each candidate is scored on its passage that best matches the query (see `extract_snippet`).
+    Re-ranking is skipped, and the candidates returned in their ANN order, when the cross-encoder
+    is not loaded, when the estimated scoring time does not fit before the deadline, when
+    another request is scoring (that is, under load), or when scoring fails.
+
+    Args:
+        query (str): The query text.
+        documents (list): The candidates, with their `id` and `content`, in ANN order.
+        deadline (float): The `time.monotonic()` by which the search must be answered.
+
+    Returns:
+        tuple: The documents (re-ordered or not) and whether they were re-ranked.
+    """
+    global _seconds_per_pair
+    if len(documents) < 2:
+        return documents, False
+    if _model is None:
+        RERANK_SKIPPED.labels("disabled").inc()
+        return documents, False
+    remaining = deadline - time.monotonic()
+    if remaining <= 0 or (_seconds_per_pair is not None and _seconds_per_pair * len(documents) > remaining):
+        RERANK_SKIPPED.labels("budget").inc()
+        return documents, False
+    if not _score_lock.acquire(blocking=False):
+        RERANK_SKIPPED.labels("busy").inc()
+        return documents, False
+    try:
+        with track_stage("rerank"):
+            passages = [extract_snippet(document["content"], query, PASSAGE_WIDTH)["text"] for document in documents]
+            start = time.perf_counter()
+            scores = score_pairs(query, passages)
+            cost = (time.perf_counter() - start) / len(documents)
+        _seconds_per_pair = cost if _seconds_per_pair is None else \
+            (1 - _COST_SMOOTHING) * _seconds_per_pair + _COST_SMOOTHING * cost
+    except Exception as e:
+        logger.error(f"Error re-ranking the candidates: {str(e)}")
+        RERANK_SKIPPED.labels("error").inc()
+        return documents, False
+    finally:
+        _score_lock.release()
+    order = sorted(range(len(documents)), key=lambda i: scores[i], reverse=True)
+    return [documents[i] for i in order], True
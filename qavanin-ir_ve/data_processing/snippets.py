@@ -0,0 +1,64 @@
+import re
+
+# Words shorter than this are ignored when looking for the matching passage
+_MIN_TERM_LENGTH = 2
+_WORD_REGEX = re.compile(r"\w+")
+
+
+def extract_snippet(content: str, query: str, width: int = 300) -> dict:
+    """
+    Extract the passage of a document that best matches a query.
+
+    The passage is the window of `width` characters containing the most distinct query
+    terms (ties go to the window with more term occurrences). If no query term occurs in
+    the document, the beginning of the document is returned; a term longer than `width` is
+    clipped to it.
+
+    Args:
+        content (str): The full text of the document.
+        query (str): The query text.
+        width (int): The length of the passage in characters (default: 300).
+
+    Returns:
+        dict: The passage as `text`, its `start` offset in the document, and the
+              `highlights` as [start, end] offsets of the query terms within the passage.
+    """
+    width = max(0, width)
+    terms = {term.lower() for term in _WORD_REGEX.findall(query) if len(term) >= _MIN_TERM_LENGTH}
+    matches = []
+    if terms:
+        pattern = re.compile("|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+        matches = [(m.start(), m.end(), m.group(0).lower()) for m in pattern.finditer(content)]
+
+    if not matches:
+        return {"text": content[:width], "start": 0, "highlights": []}
+
+    # Slide a window over the matches and keep the one covering the most distinct terms
+    best_start, best_score = matches[0][0], (0, 0)
+    right = 0
+    counts = {}
+    for left in range(len(matches)):
+        # A match wider than the window still counts on its own; its passage is clipped
+        while right < len(matches) and (right == left or matches[right][1] - matches[left][0] <= width):
+            counts[matches[right][2]] = counts.get(matches[right][2], 0) + 1
+            right += 1
+        score = (len(counts), right - left)
+        if score > best_score:
+            best_start, best_score = matches[left][0], score
+        term = matches[left][2]
+        counts[term] -= 1
+        if not counts[term]:
+            del counts[term]
+
+    # Center the matched passage in the window and avoid cutting words at the edges
+    start = max(0, best_start - width // 4)
+    while 0 < start < best_start and not content[start - 1].isspace():
+        start -= 1
+    end = min(len(content), start + width)
+    while start < end < len(content) and not content[end].isspace():
+        end -= 1
+    if end <= best_start:
+        end = min(len(content), start + width)
+
+    highlights = [[m_start - start, m_end - start] for m_start, m_end, _ in matches if m_start >= start and m_end <= end]
+    return {"text": content[start:end], "start": start, "highlights": highlights}
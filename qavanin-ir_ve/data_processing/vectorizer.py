@@ -1,11 +1,109 @@
-from sentence_transformers import SentenceTransformer
+import logging
+import threading
 import numpy as np
+from .embedding_server import EmbeddingClient, get_embedding_socket
+from monitoring.metrics import track_stage, observe_batch_size
 
-# Load the SentenceTransformer model
-model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+logger = logging.getLogger(__name__)
 
+# Name of the SentenceTransformer model used for all embeddings
+MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
 
-def generate_embeddings(sentences: str) -> list[float]:
+# The model is loaded on first use (or explicitly from the API lifespan) so that
+# importing this module does not pull in torch and the model weights.
+_model = None
+_model_lock = threading.Lock()
+# Client for the shared embedding sidecar, used when EMBEDDING_SOCKET is set
+_client = None
+
+
+def load_model():
+    """
+    Load the SentenceTransformer model if it is not loaded yet.
+
+    Safe to call from several threads; the model is only loaded once. When the
+    embedding sidecar is configured the model lives in the sidecar and nothing is loaded here.
+
+    Returns:
+        SentenceTransformer: The loaded model, or None when the sidecar is used.
+    """
+    if get_embedding_socket():
+        return None
+    return load_local_model()
+
+
+def load_local_model():
+    """
+    Load the SentenceTransformer model into this process, regardless of the sidecar configuration.
+
+    Returns:
+        SentenceTransformer: The loaded model.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+
+                logger.info(f"Loading SentenceTransformer model {MODEL_NAME}...")
+                _model = SentenceTransformer(MODEL_NAME)
+                logger.info("SentenceTransformer model loaded.")
+    return _model
+
+
+def is_model_loaded() -> bool:
+    """
+    Check whether the SentenceTransformer model has been loaded.
+
+    Returns:
+        bool: True if the model is loaded, False otherwise.
+    """
+    return _model is not None
+
+
+def get_client():
+    """
+    Return the client for the embedding sidecar, or None if embeddings are computed in process.
+
+    Returns:
+        EmbeddingClient: The sidecar client, or None.
+    """
+    global _client
+    socket_path = get_embedding_socket()
+    if not socket_path:
+        return None
+    if _client is None or _client.socket_path != socket_path:
+        _client = EmbeddingClient(socket_path)
+    return _client
+
+
+def encode(sentences: list[str]) -> np.ndarray:
+    """
+    Encode sentences with the sidecar if configured, otherwise with the in-process model.
+
+    Args:
+        sentences (list[str]): The sentences to encode.
+
+    Returns:
+        np.ndarray: A matrix with one embedding row per sentence.
+    """
+    observe_batch_size(len(sentences))
+    with track_stage("embed"):
+        client = get_client()
+        if client is not None:
+            return client.encode(sentences)
+        return load_local_model().encode(sentences)
+
+
+def warmup_model():
+    """
+    Run a dummy encode so the first real request does not pay for lazy initialization
+    inside torch and the tokenizer (or for connecting to the sidecar).
+    """
+    encode(["warmup"])
+
+
+def generate_embeddings(sentences: str) -> np.ndarray:
     """
     Generate vector embeddings for the given text using a pre-trained Sentence Transformer model.
 
@@ -13,7 +111,7 @@ def generate_embeddings(sentences: str) -> list[float]:
         sentences (str): A string or list of strings to generate embeddings for.
 
     Returns:
-        list[float]: A 1-dimensional list of floats representing the text embeddings.
+        np.ndarray: A 1-dimensional contiguous float32 array with the text embeddings.
 
     Raises:
         ValueError: If the generated embeddings are not in the expected format.
@@ -22,16 +120,34 @@ def generate_embeddings(sentences: str) -> list[float]:
         sentences = [sentences]
 
     # Generate embeddings
-    embeddings = model.encode(sentences)
-    if not isinstance(embeddings, np.ndarray):
-        embeddings = np.array(embeddings)
+    embeddings = np.ascontiguousarray(encode(sentences), dtype=np.float32)
 
     if len(embeddings.shape) == 2 and embeddings.shape[0] == 1:
-        embeddings = embeddings.flatten()
+        embeddings = embeddings.reshape(-1)
+
+    # Checked once for the whole array instead of element by element
+    if embeddings.ndim != 1 or not np.isfinite(embeddings).all():
+        raise ValueError("Embeddings must be a 1-dimensional vector of finite floats.")
+
+    return embeddings
+
 
-    embeddings_list = embeddings.tolist()
+def generate_embeddings_batch(sentences: list[str]) -> np.ndarray:
+    """
+    Generate vector embeddings for many texts with a single model call.
+
+    Args:
+        sentences (list[str]): The texts to generate embeddings for.
+
+    Returns:
+        np.ndarray: A contiguous float32 matrix with one embedding row per text, in the same order.
+
+    Raises:
+        ValueError: If the generated embeddings are not in the expected format.
+    """
+    embeddings = np.ascontiguousarray(encode(list(sentences)), dtype=np.float32)
 
-    if not isinstance(embeddings_list, list) or not all(isinstance(x, float) for x in embeddings_list):
-        raise ValueError("Embeddings must be a 1-dimensional list of floats.")
+    if embeddings.ndim != 2 or embeddings.shape[0] != len(sentences):
+        raise ValueError("Embeddings must be a 2-dimensional array with one row per text.")
 
-    return embeddings_list
+    return embeddings
@@ -0,0 +1,406 @@
+import logging
+from abc import ABC, abstractmethod
+from typing import List
+import numpy as np
+from sqlalchemy import text, bindparam, inspect, select, Integer
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.schema import DDL
+from sqlalchemy.orm import Session
+from .models import Base, LawDocument as law_documents, LawDocumentVector as law_document_vectors
+from .vector_type import Float32Vector
+from .filters import filter_conditions
+from .migrations import run_migrations, missing_concurrent_indexes, create_concurrent_indexes, upgrade_sqlite_schema
+from .vector_storage import INLINE, get_vector_storage, get_vector_source, uses_split_storage, \
+    has_inline_vector_index
+
+logger = logging.getLogger(__name__)
+
+
+class VectorSearchBackend(ABC):
+    """
+    The database-specific part of the storage: creating the schema and nearest-neighbour search.
+
+    Everything else in `db_oprations` is portable SQLAlchemy and runs unchanged on every backend.
+    """
+
+    # Whether searches need the in-process vector index (see database/vector_index.py) to be fast
+    needs_vector_index = False
+
+    @abstractmethod
+    def init_schema(self, engine):
+        """
+        Create the tables and indexes of a new database and migrate an existing one.
+
+        Args:
+            engine (Engine): The engine of the database.
+        """
+
+    @abstractmethod
+    def closest(self, session: Session, query_embedding: List[float], limit: int, offset: int = 0,
+                include_content: bool = True, filters: dict = None) -> List[dict]:
+        """
+        Find the documents closest to a query embedding by L2 distance.
+
+        Args:
+            session (Session): The session to query with.
+            query_embedding (List[float]): The embedding vector of the query.
+            limit (int): The maximum number of documents to return.
+            offset (int): The number of closest documents to skip (default: 0).
+            include_content (bool): Whether to return the content of the documents (default: True).
+            filters (dict): Metadata filters built by `database.filters.build_search_filters`; they are
+                            part of the search itself, so `limit` documents are returned when that many match.
+
+        Returns:
+            List[dict]: The id (and content, if requested) of each document, closest first.
+        """
+
+    def prewarm(self, engine) -> dict:
+        """
+        Load the table and indexes searches read into the database's cache, after a restart.
+
+        Args:
+            engine (Engine): The engine of the database to warm up.
+
+        Returns:
+            dict: The number of blocks loaded per relation; empty when there is nothing to load.
+        """
+        return {}
+
+    @abstractmethod
+    def closest_batch(self, session: Session, query_embeddings: List[List[float]], limit: int) -> List[List[dict]]:
+        """
+        Find the closest documents of several query embeddings.
+
+        Args:
+            session (Session): The session to query with.
+            query_embeddings (List[List[float]]): The embedding vectors of the queries.
+            limit (int): The maximum number of documents to return per query.
+
+        Returns:
+            List[List[dict]]: For each query, the id and content of its closest documents, closest first.
+        """
+
+
+class PostgresBackend(VectorSearchBackend):
+    """PostgreSQL with pgvector: the search runs in the database on its ANN index."""
+
+    # pgvector version from which an index scan keeps walking until enough rows pass the filters
+    _ITERATIVE_SCAN_VERSION = (0, 8, 0)
+    # pgvector's default and maximum `hnsw.ef_search`; an HNSW scan returns at most ef_search rows
+    _DEFAULT_EF_SEARCH = 40
+    _MAX_EF_SEARCH = 1000
+
+    def __init__(self):
+        # Whether each database's pgvector supports iterative index scans, checked once per engine
+        self._iterative_scan = {}
+
+    def init_schema(self, engine):
+        with engine.connect() as connection:
+            logger.info("Attempting to create pgvector extension...")
+            connection.execute(DDL('CREATE EXTENSION IF NOT EXISTS vector'))
+            connection.commit()
+            logger.info("pgvector extension created or already exists.")
+
+            inspector = inspect(engine)
+            created = 'law_documents' not in inspector.get_table_names()
+            if created:
+                logger.info("Table 'law_documents' does not exist. Creating it...")
+                Base.metadata.create_all(engine)
+                logger.info("Table 'law_documents' created successfully.")
+            else:
+                logger.info("Table 'law_documents' already exists.")
+
+        # Bring existing tables up to the current schema
+        with engine.begin() as connection:
+            applied = run_migrations(connection)
+            if applied:
+                logger.info(f"Applied migrations: {', '.join(applied)}")
+            if get_vector_storage() != INLINE and has_inline_vector_index(connection):
+                logger.warning("VECTOR_STORAGE is split but the embeddings are still in law_documents; "
+                               "run `python -m database.vector_storage --split` once to move them.")
+
+        # The partial ANN indexes are only built here on a new, empty table; on an existing one the
+        # build takes long enough that it is left to an explicit, non-blocking step
+        if get_vector_storage() == INLINE:
+            if created:
+                create_concurrent_indexes(engine)
+            else:
+                with engine.connect() as connection:
+                    missing = missing_concurrent_indexes(connection)
+                if missing:
+                    logger.warning(f"Indexes {', '.join(missing)} are missing; build them without blocking writes "
+                                   f"with `python -m database.migrations --concurrent-indexes`.")
+
+        with engine.connect() as connection:
+            result = connection.execute(text("SELECT extname FROM pg_extension WHERE extname = 'vector';"))
+            if result.scalar():
+                logger.info("pgvector extension is properly installed.")
+            else:
+                raise RuntimeError("pgvector extension is not installed. Please install it to use the vector type.")
+
+    def closest(self, session, query_embedding, limit, offset=0, include_content=True, filters=None):
+        if filters:
+            rows = self._filtered_closest(session, query_embedding, limit, offset, include_content, filters)
+            if not include_content:
+                return [{"id": row.id} for row in rows]
+            return [{"id": row.id, "content": row.content} for row in rows]
+
+        storage = get_vector_storage()
+        if storage == INLINE:
+            columns = [law_documents.id, law_documents.content] if include_content else [law_documents.id]
+            rows = session.query(*columns).order_by(
+                law_documents.embedding.l2_distance(query_embedding)
+            ).offset(offset).limit(limit).all()
+        else:
+            self._set_ef_search(session, offset + limit)
+            rows = session.execute(
+                self._split_closest_statement(storage, include_content),
+                {"q": query_embedding, "offset": offset, "limit": limit},
+            ).all()
+        if not include_content:
+            return [{"id": row.id} for row in rows]
+        return [{"id": row.id, "content": row.content} for row in rows]
+
+    def prewarm(self, engine) -> dict:
+        # The searched table, its ANN indexes (including the partial ones of the filters) and the
+        # primary key used to fetch the law texts of the nearest ids. Loading a large relation takes
+        # longer than the statement_timeout of the replica engines, so it is lifted for this
+        # transaction, and each relation is loaded in its own savepoint so one failure (a dropped
+        # index, a cancelled read) does not abort the others.
+        table, _, _ = get_vector_source()
+        with engine.begin() as connection:
+            if not connection.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_prewarm'")).scalar():
+                logger.warning("pg_prewarm is not installed, the database cache is not warmed up.")
+                return {}
+            connection.execute(text("SELECT set_config('statement_timeout', '0', true)"))
+            relations = [table] + connection.execute(text(
+                "SELECT indexname FROM pg_indexes WHERE tablename = :table "
+                "AND (indexdef LIKE '%USING hnsw%' OR indexdef LIKE '%USING ivfflat%')"
+            ), {"table": table}).scalars().all() + [f"{law_documents.__tablename__}_pkey"]
+            loaded = {}
+            for relation in relations:
+                try:
+                    with connection.begin_nested():
+                        loaded[relation] = connection.execute(
+                            text("SELECT pg_prewarm(CAST(:relation AS regclass))"), {"relation": relation}).scalar()
+                except SQLAlchemyError as e:
+                    logger.error(f"Error prewarming {relation}: {str(e)}")
+            return loaded
+
+    def _filtered_closest(self, session, query_embedding, limit, offset, include_content, filters):
+        """
+        Nearest-neighbour query with the filters in its WHERE clause.
+
+        The filtered columns live in law_documents; with the split storage the query joins them
+        to law_document_vectors and walks its HNSW index, since the partial index of each law type
+        only exists for the inline storage. Without iterative scans (pgvector before 0.8) an ANN
+        index scan stops after `hnsw.ef_search` candidates, so searches with a zone or date filter
+        can return fewer rows than asked for.
+        """
+        self._enable_iterative_scan(session)
+        self._set_ef_search(session, offset + limit)
+        if uses_split_storage(session):
+            distance = law_document_vectors.embedding.l2_distance(query_embedding)
+            nearest = select(law_documents.id, distance.label("distance")).select_from(law_documents).join(
+                law_document_vectors, law_document_vectors.document_id == law_documents.id)
+        else:
+            distance = law_documents.embedding.l2_distance(query_embedding)
+            nearest = select(law_documents.id, distance.label("distance"))
+        nearest = nearest.where(*filter_conditions(filters)).order_by(distance).limit(offset + limit).subquery()
+        columns = [nearest.c.id, law_documents.content] if include_content else [nearest.c.id]
+        statement = select(*columns)
+        if include_content:
+            statement = statement.join(law_documents, law_documents.id == nearest.c.id)
+        # ivfflat's iterative scan only returns rows in approximately increasing distance
+        statement = statement.order_by(nearest.c.distance).offset(offset).limit(limit)
+        return session.execute(statement).all()
+
+    def _enable_iterative_scan(self, session) -> bool:
+        """Turn on pgvector's iterative index scans for the current transaction, if the server supports them."""
+        bind = session.get_bind()
+        engine = getattr(bind, "engine", bind)
+        supported = self._iterative_scan.get(engine)
+        if supported is None:
+            version = session.execute(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")).scalar()
+            try:
+                supported = tuple(int(part) for part in (version or "0").split(".")[:3]) >= self._ITERATIVE_SCAN_VERSION
+            except ValueError:
+                supported = False
+            self._iterative_scan[engine] = supported
+        if supported:
+            session.execute(text("SET LOCAL hnsw.iterative_scan = strict_order"))
+            session.execute(text("SET LOCAL ivfflat.iterative_scan = relaxed_order"))
+        return supported
+
+    def _set_ef_search(self, session, k: int):
+        """
+        Let HNSW scans in the current transaction return at least `k` rows (up to pgvector's maximum).
+
+        With the default `hnsw.ef_search` of 40 a search for a deep cursor page, for the re-ranking
+        candidates or with a limit above 40 would come back short.
+        """
+        if k > self._DEFAULT_EF_SEARCH:
+            session.execute(text("SELECT set_config('hnsw.ef_search', :value, true)"),
+                            {"value": str(min(k, self._MAX_EF_SEARCH))})
+
+    @staticmethod
+    def _split_closest_statement(storage: str, include_content: bool):
+        """Builds the nearest-neighbour query over the narrow law_document_vectors table."""
+        table, key, vector_type = get_vector_source(storage)
+        dim = law_documents.embedding.type.dim
+        if include_content:
+            statement = text(
+                f"SELECT d.id, d.content FROM ("
+                f"  SELECT {key} AS id, embedding <-> CAST(:q AS {vector_type}) AS distance "
+                f"  FROM {table} "
+                f"  ORDER BY distance OFFSET :offset LIMIT :limit"
+                f") AS n "
+                f"JOIN {law_documents.__tablename__} AS d ON d.id = n.id "
+                f"ORDER BY n.distance"
+            )
+        else:
+            statement = text(
+                f"SELECT {key} AS id FROM {table} "
+                f"ORDER BY embedding <-> CAST(:q AS {vector_type}) OFFSET :offset LIMIT :limit"
+            )
+        return statement.bindparams(
+            bindparam("q", type_=Float32Vector(dim)),
+            bindparam("offset", type_=Integer),
+            bindparam("limit", type_=Integer),
+        )
+
+    def closest_batch(self, session, query_embeddings, limit):
+        # The queries are sent as a VALUES list and each one is matched with a LATERAL
+        # subquery, so the ANN index is used once per query inside a single SQL statement
+        dim = law_documents.embedding.type.dim
+        table, key, vector_type = get_vector_source()
+        self._set_ef_search(session, limit)
+        values = ", ".join(f"({i}, CAST(:q_{i} AS {vector_type}))" for i in range(len(query_embeddings)))
+        # The LATERAL subquery only reads the vectors; the law texts are joined for the final rows
+        statement = text(
+            f"SELECT q.idx, d.id, d.content "
+            f"FROM (VALUES {values}) AS q(idx, embedding) "
+            f"CROSS JOIN LATERAL ("
+            f"  SELECT {key} AS id, embedding <-> q.embedding AS distance "
+            f"  FROM {table} "
+            f"  ORDER BY embedding <-> q.embedding "
+            f"  LIMIT :limit"
+            f") AS n "
+            f"JOIN {law_documents.__tablename__} AS d ON d.id = n.id "
+            f"ORDER BY q.idx, n.distance"
+        ).bindparams(
+            bindparam("limit", type_=Integer),
+            *(bindparam(f"q_{i}", type_=Float32Vector(dim)) for i in range(len(query_embeddings))),
+        )
+        params = {f"q_{i}": embedding for i, embedding in enumerate(query_embeddings)}
+        params["limit"] = limit
+
+        results = [[] for _ in query_embeddings]
+        for row in session.execute(statement, params):
+            results[row.idx].append({"id": row.id, "content": row.content})
+        return results
+
+
+class SQLiteBackend(VectorSearchBackend):
+    """
+    Embedded SQLite for single-node and test deployments, with no server and no extension.
+
+    SQLite cannot search vectors, so searches are served by the in-process NumPy index,
+    which `db_oprations` builds from the table on first use and keeps in step with writes.
+    `closest` itself is an exact scan that streams the embeddings through NumPy; it is only
+    used until the index exists or if the index fails.
+    """
+
+    needs_vector_index = True
+
+    # Rows scored per NumPy matrix product during a scan
+    scan_batch_size = 4096
+
+    def init_schema(self, engine):
+        # The pgvector columns are stored as text and the PostgreSQL-only indexes are skipped
+        with engine.begin() as connection:
+            added = upgrade_sqlite_schema(connection)
+            if added:
+                logger.info(f"Added to the existing tables: {', '.join(added)}")
+        Base.metadata.create_all(engine)
+
+    def _scan(self, session, query_embeddings, k: int, filters: dict = None) -> List[List[int]]:
+        """Exact top-k ids per query among the matching rows, merging each streamed batch into the best k so far."""
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        best_distances = np.empty((len(queries), 0), dtype=np.float32)
+        best_ids = np.empty((len(queries), 0), dtype=np.int64)
+        ids, vectors = [], []
+
+        def merge(best_distances, best_ids):
+            matrix = np.asarray(vectors, dtype=np.float32)
+            # ||x - q||^2 = ||x||^2 - 2 x.q + ||q||^2; the last term does not change the ranking
+            distances = np.einsum("ij,ij->i", matrix, matrix)[None, :] - 2.0 * (queries @ matrix.T)
+            distances = np.concatenate([best_distances, distances], axis=1)
+            batch_ids = np.broadcast_to(np.asarray(ids, dtype=np.int64), (len(queries), len(ids)))
+            candidates = np.concatenate([best_ids, batch_ids], axis=1)
+            if distances.shape[1] > k:
+                top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+                distances = np.take_along_axis(distances, top, axis=1)
+                candidates = np.take_along_axis(candidates, top, axis=1)
+            return distances, candidates
+
+        rows = session.query(law_documents.id, law_documents.embedding).filter(*filter_conditions(filters))
+        for row in rows.yield_per(self.scan_batch_size):
+            ids.append(row.id)
+            vectors.append(row.embedding)
+            if len(ids) == self.scan_batch_size:
+                best_distances, best_ids = merge(best_distances, best_ids)
+                ids, vectors = [], []
+        if ids:
+            best_distances, best_ids = merge(best_distances, best_ids)
+        order = np.argsort(best_distances, axis=1, kind="stable")
+        return np.take_along_axis(best_ids, order, axis=1).tolist()
+
+    @staticmethod
+    def _contents(session, document_ids) -> dict:
+        rows = session.query(law_documents.id, law_documents.content).filter(law_documents.id.in_(document_ids))
+        return {row.id: row.content for row in rows}
+
+    def closest(self, session, query_embedding, limit, offset=0, include_content=True, filters=None):
+        if limit <= 0:
+            return []
+        document_ids = self._scan(session, [query_embedding], offset + limit, filters)[0][offset:]
+        if not include_content:
+            return [{"id": document_id} for document_id in document_ids]
+        contents = self._contents(session, document_ids)
+        return [{"id": document_id, "content": contents[document_id]} for document_id in document_ids]
+
+    def closest_batch(self, session, query_embeddings, limit):
+        if limit <= 0:
+            return [[] for _ in query_embeddings]
+        ids_per_query = self._scan(session, query_embeddings, limit)
+        contents = self._contents(session, {document_id for ids in ids_per_query for document_id in ids})
+        return [[{"id": document_id, "content": contents[document_id]} for document_id in ids]
+                for ids in ids_per_query]
+
+
+_BACKENDS = {
+    "postgresql": PostgresBackend(),
+    "sqlite": SQLiteBackend(),
+}
+
+
+def get_backend(bind) -> VectorSearchBackend:
+    """
+    Get the backend for the database behind an engine, connection or session.
+
+    Args:
+        bind (Engine | Connection | Session): What the backend is chosen for, by its SQL dialect.
+
+    Returns:
+        VectorSearchBackend: The backend of the dialect.
+
+    Raises:
+        ValueError: If the database is neither PostgreSQL nor SQLite.
+    """
+    if isinstance(bind, Session):
+        bind = bind.get_bind()
+    dialect = bind.dialect.name
+    if dialect not in _BACKENDS:
+        raise ValueError(f"Unsupported database '{dialect}', expected one of: {', '.join(_BACKENDS)}")
+    return _BACKENDS[dialect]
@@ -1,30 +1,66 @@
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import joinedload
+from sqlalchemy.exc import SQLAlchemyError, DBAPIError
+from sqlalchemy import func, select, insert, update, delete, bindparam, or_, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from typing import List, Optional
+from datetime import datetime, timedelta
 import numpy as np
 import logging
-from .models import LawDocument as law_documents, engine
+import threading
+from .models import LawDocument as law_documents, DocumentJob as document_jobs, get_engine, get_role_engines, mark_replica_unavailable, PRIMARY, \
+    REPLICA, INGEST
+from .vector_index import VectorIndex, get_vector_index, set_vector_index, get_vector_index_path, \
+    get_vector_index_refresh_overlap
+from .backends import get_backend
+from .vector_type import to_float32_vector
+from .vector_storage import uses_split_storage, select_embeddings, write_split_embeddings
+from .filters import normalize_law_type, normalize_approve_date
+from .result_cache import invalidate_result_cache
+from monitoring.metrics import track_stage
+from data_processing.dedup import content_hash
 from contextlib import contextmanager
 
 logger = logging.getLogger(__name__)
 
+# Dimension every stored embedding must have
+EMBEDDING_DIM = law_documents.embedding.type.dim
+
+# Serializes building the in-process index on first use, so concurrent searches build it once
+_index_build_lock = threading.Lock()
+
 
 @contextmanager
-def get_db_session():
+def get_db_session(role: str = PRIMARY):
     """
     Context manager for handling database sessions.
 
     This function creates a new database session, yields it, and ensures proper
     commit, rollback, and closure of the session.
 
+    Args:
+        role (str): The connection role (see `database.models`): `PRIMARY` for writes (default),
+                    `REPLICA` for search reads or `INGEST` for bulk loads. A replica that refuses
+                    the connection is skipped for a while and the read goes to the primary; a
+                    replica failing during the read is handled by `_read_replica`.
+
     Yields:
         Session: An active SQLAlchemy database session.
 
     Raises:
         SQLAlchemyError: If any database-related error occurs during the session.
     """
-    session = Session(bind=engine)
+    bind = get_engine(role)
+    connection = None
+    if role == REPLICA and bind is not get_engine():
+        try:
+            connection = bind.connect()
+            bind = connection
+        except DBAPIError as e:
+            logger.warning(f"Replica unavailable, reading from the primary: {str(e)}")
+            mark_replica_unavailable(bind)
+            bind = get_engine()
+    session = Session(bind=bind)
     try:
         yield session
         session.commit()
@@ -34,40 +70,160 @@ def get_db_session():
         raise
     finally:
         session.close()
+        if connection is not None:
+            connection.close()
 
 
-def get_closest_document(query_embedding: List[float], limit: int) -> List[dict]:
+def _read_replica(read):
+    """
+    Runs a read on a replica, and again on the primary if the replica's connection breaks during it.
+
+    `get_db_session(REPLICA)` only falls back to the primary when the replica refuses the connection;
+    a replica that restarts or fails over mid-query invalidates the connection instead. The replica is
+    then skipped for a while like a refused one. Other errors, such as a statement timeout, are raised.
+
+    Args:
+        read (Callable): Runs the read with the session it is given and returns its result.
+
+    Returns:
+        The result of `read`.
+
+    Raises:
+        SQLAlchemyError: If the read fails for another reason, or on the primary too.
+    """
+    replica = None
+    try:
+        with get_db_session(REPLICA) as session:
+            bind = session.get_bind()
+            replica = getattr(bind, "engine", bind)
+            return read(session)
+    except DBAPIError as e:
+        if not e.connection_invalidated or replica is None or replica is get_engine():
+            raise
+        logger.warning(f"Replica connection lost during a read, reading from the primary: {str(e)}")
+        mark_replica_unavailable(replica)
+    with get_db_session() as session:
+        return read(session)
+
+
+def get_closest_document(query_embedding: np.ndarray, limit: int, offset: int = 0,
+                         include_content: bool = True, filters: Optional[dict] = None) -> List[dict]:
     """
     Retrieves the closest documents to a given query embedding.
 
     Args:
-        query_embedding (List[float]): The embedding vector of the query.
+        query_embedding (np.ndarray): The embedding vector of the query (a list of floats is accepted too).
         limit (int): The maximum number of documents to retrieve.
+        offset (int): The number of closest documents to skip, for pagination (default: 0).
+        include_content (bool): Whether to fetch the content of the documents (default: True).
+        filters (dict): Metadata filters built by `database.filters.build_search_filters`, or None.
 
     Returns:
-        List[dict]: A list of dictionaries containing the id and content of the closest documents.
+        List[dict]: A list of dictionaries containing the id (and content, if requested) of the closest documents.
 
     Note:
-        This function uses L2 distance to measure similarity between embeddings.
+        This function uses L2 distance to measure similarity between embeddings. When the
+        in-process vector index is built, the nearest ids come from the index and only their
+        content is fetched from the database; otherwise the search is run by the database's
+        backend (see database/backends.py). Filtered searches always run in the database, with
+        the filters inside the nearest-neighbour query, because the index holds no metadata.
     """
-    with get_db_session() as session:
+    index = _get_search_index() if not filters else None
+    if index is not None:
         try:
-            closest_documents = session.query(law_documents.id, law_documents.content).order_by(
-                law_documents.embedding.l2_distance(query_embedding)
-            ).limit(limit).all()
+            with track_stage("ann_index"):
+                document_ids = index.search(query_embedding, offset + limit)[offset:]
+            if not include_content:
+                return [{"id": doc_id} for doc_id in document_ids]
+            return get_documents_by_ids(document_ids)
+        except Exception as e:
+            logger.error(f"In-process index search failed, falling back to the database: {str(e)}")
+
+    def read(session):
+        with track_stage("ann_query"):
+            return get_backend(session).closest(
+                session, query_embedding, limit, offset=offset, include_content=include_content, filters=filters)
 
-            logger.debug(f"Closest documents fetched: {closest_documents}")
+    try:
+        closest_documents = _read_replica(read)
+        logger.debug(f"Closest documents fetched: {closest_documents}")
 
-            if not closest_documents:
-                logger.warning(f"No documents found within the limit of {limit}.")
+        if not closest_documents:
+            logger.warning(f"No documents found within the limit of {limit}.")
+        return closest_documents
+    except SQLAlchemyError as e:
+        logger.error(f"Database error in get_closest_document: {str(e)}")
+        return []
+    except Exception as e:
+        logger.error(f"Unexpected error in get_closest_document: {str(e)}")
+        return []
 
-            return [{"id": doc.id, "content": doc.content} for doc in closest_documents]
-        except SQLAlchemyError as e:
-            logger.error(f"Database error in get_closest_document: {str(e)}")
-            return []
+
+def get_closest_documents_batch(query_embeddings: np.ndarray, limit: int) -> List[List[dict]]:
+    """
+    Retrieves the closest documents for several query embeddings in one round trip.
+
+    On PostgreSQL the queries are sent as a VALUES list and each one is matched with a
+    LATERAL subquery, so the ANN index is used once per query inside a single SQL statement.
+
+    Args:
+        query_embeddings (np.ndarray): The embedding vectors of the queries, one per row.
+        limit (int): The maximum number of documents to retrieve per query.
+
+    Returns:
+        List[List[dict]]: For each query, a list of dictionaries containing the id and
+                          content of the closest documents.
+    """
+    if len(query_embeddings) == 0:
+        return []
+
+    index = _get_search_index()
+    if index is not None:
+        try:
+            with track_stage("ann_index"):
+                ids_per_query = index.search_batch(query_embeddings, limit)
+            unique_ids = list(dict.fromkeys(doc_id for ids in ids_per_query for doc_id in ids))
+            by_id = {doc["id"]: doc for doc in get_documents_by_ids(unique_ids)}
+            return [[by_id[doc_id] for doc_id in ids if doc_id in by_id] for ids in ids_per_query]
         except Exception as e:
-            logger.error(f"Unexpected error in get_closest_document: {str(e)}")
-            return []
+            logger.error(f"In-process index batch search failed, falling back to the database: {str(e)}")
+
+    def read(session):
+        with track_stage("ann_query"):
+            return get_backend(session).closest_batch(session, query_embeddings, limit)
+
+    try:
+        return _read_replica(read)
+    except SQLAlchemyError as e:
+        logger.error(f"Database error in get_closest_documents_batch: {str(e)}")
+        return [[] for _ in query_embeddings]
+
+
+def get_documents_by_ids(document_ids: List[int]) -> List[dict]:
+    """
+    Retrieves several documents with a single primary-key query.
+
+    Args:
+        document_ids (List[int]): The IDs of the documents to retrieve.
+
+    Returns:
+        List[dict]: A list of dictionaries containing the id and content of the documents,
+                    in the order of `document_ids`. Missing documents are skipped.
+    """
+    if not document_ids:
+        return []
+    def read(session):
+        with track_stage("fetch_documents"):
+            return session.query(law_documents.id, law_documents.content).filter(
+                law_documents.id.in_(document_ids)
+            ).all()
+
+    try:
+        by_id = {row.id: row.content for row in _read_replica(read)}
+        return [{"id": doc_id, "content": by_id[doc_id]} for doc_id in document_ids if doc_id in by_id]
+    except SQLAlchemyError as e:
+        logger.error(f"Database error in get_documents_by_ids: {str(e)}")
+        return []
 
 
 def insert_document(content, embeds):
@@ -76,21 +232,29 @@ def insert_document(content, embeds):
 
     Args:
         content (str): The content of the document.
-        embeds (List[float]): The embedding vector of the document.
+        embeds (np.ndarray): The embedding vector of the document.
 
-    Note:
-        This function converts the embedding to a list of floats before insertion.
+    Returns:
+        int: The ID of the inserted document, or None if the insert failed.
+
+    Raises:
+        ValueError: If the embedding is not a vector of finite floats of the column's dimension.
     """
-    embeds_list = [float(x) for x in embeds]
+    embedding = to_float32_vector(embeds, EMBEDDING_DIM)
     with get_db_session() as session:
         try:
-            document = law_documents(
-                content=content,
-                embedding=embeds_list,
-                updated_at=None
-            )
-            session.add(document)
+            split = uses_split_storage(session)
+            values = {"content": content, "content_hash": content_hash(content)}
+            if not split:
+                values["embedding"] = embedding
+            document_id = session.execute(
+                insert(law_documents).values(**values).returning(law_documents.id)
+            ).scalar_one()
+            if split:
+                write_split_embeddings(session, {document_id: embedding})
             session.commit()
+            _on_document_written(document_id, embedding)
+            return document_id
         except SQLAlchemyError as e:
             session.rollback()
             logger.error(f"Database error inserting document: {e}")
@@ -99,84 +263,354 @@ def insert_document(content, embeds):
             logger.error(f"Unexpected error inserting document: {e}")
 
 
+def upsert_documents(documents: List[dict], batch_size: int = 500) -> List[dict]:
+    """
+    Inserts or updates many documents keyed on their qavanin law ID, in one transaction.
+
+    Each batch is written with a single INSERT ... ON CONFLICT (source_id) DO UPDATE statement.
+    When the same source_id appears more than once, the last occurrence wins.
+
+    Args:
+        documents (List[dict]): Dictionaries with the `source_id`, `content` and `embedding` of each document,
+                                and optionally its `law_type`, `zone` and `approve_date`. Metadata that is
+                                missing or None keeps its stored value.
+        batch_size (int): The number of rows written per statement (default: 500).
+
+    Returns:
+        List[dict]: For each distinct source_id, in order of first appearance, a dictionary with the
+                    document `id`, its `source_id` and whether it was `inserted` (True) or updated (False).
+
+    Raises:
+        SQLAlchemyError: If the transaction fails; nothing is written in that case.
+        ValueError: If an embedding is not a vector of finite floats of the column's dimension, or a law type
+                    or approval date is invalid.
+    """
+    rows = {}
+    for document in documents:
+        rows[str(document["source_id"])] = {
+            "source_id": str(document["source_id"]),
+            "content": document["content"],
+            "content_hash": content_hash(document["content"]),
+            "embedding": to_float32_vector(document["embedding"], EMBEDDING_DIM),
+            "law_type": normalize_law_type(document.get("law_type")),
+            "zone": document.get("zone"),
+            "approve_date": normalize_approve_date(document.get("approve_date")),
+        }
+    rows = list(rows.values())
+    if not rows:
+        return []
+
+    embeddings = {row["source_id"]: row["embedding"] for row in rows}
+    results = []
+    with get_db_session(INGEST) as session:
+        dialect_insert = _dialect_insert(session)
+        sqlite = session.get_bind().dialect.name == "sqlite"
+        split = uses_split_storage(session)
+        if split:
+            rows = [{name: value for name, value in row.items() if name != "embedding"} for row in rows]
+        for start in range(0, len(rows), batch_size):
+            statement = dialect_insert(law_documents).values(rows[start:start + batch_size])
+            set_ = {
+                "content": statement.excluded.content,
+                "content_hash": statement.excluded.content_hash,
+                **{column: func.coalesce(getattr(statement.excluded, column), getattr(law_documents, column))
+                   for column in ("law_type", "zone", "approve_date")},
+                "updated_at": func.now(),
+            }
+            if not split:
+                set_["embedding"] = statement.excluded.embedding
+            statement = statement.on_conflict_do_update(
+                index_elements=[law_documents.source_id], set_=set_,
+            ).returning(law_documents.id, law_documents.source_id,
+                        law_documents.updated_at if sqlite else literal_column("xmax = 0").label("inserted"))
+            # A row inserted by this statement has no deleting transaction id (xmax), an updated one has.
+            # SQLite has none; there updated_at is only set on the conflict path, so NULL means inserted
+            batch_results = [
+                {"id": row.id, "source_id": row.source_id,
+                 "inserted": row.updated_at is None if sqlite else row.inserted}
+                for row in session.execute(statement)
+            ]
+            if split:
+                write_split_embeddings(session, {result["id"]: embeddings[result["source_id"]]
+                                                 for result in batch_results})
+            results.extend(batch_results)
+        session.commit()
+
+    # RETURNING does not guarantee the order of the VALUES, so the results are put back in input order
+    by_source_id = {result["source_id"]: result for result in results}
+    results = [by_source_id[source_id] for source_id in embeddings]
+    index = get_vector_index()
+    if index is not None:
+        index.add_many([result["id"] for result in results], [embeddings[result["source_id"]] for result in results])
+    invalidate_result_cache()
+    return results
+
+
+def update_document_metadata(documents: List[dict]) -> int:
+    """
+    Fills in the law type, zone and approval date of stored documents, keyed on their qavanin law ID,
+    without touching their content or embedding.
+
+    Ingestion skips laws whose text is unchanged before embedding them, so this is how a recrawl
+    backfills the metadata of documents stored before it was collected.
+
+    Args:
+        documents (List[dict]): Dictionaries with the `source_id` and optionally the `law_type`, `zone` and
+                                `approve_date` of each document. Metadata that is missing or None keeps its
+                                stored value.
+
+    Returns:
+        int: The number of documents whose metadata changed.
+
+    Raises:
+        SQLAlchemyError: If the transaction fails; nothing is written in that case.
+        ValueError: If a law type or approval date is invalid.
+    """
+    rows = [
+        {"b_source_id": str(document["source_id"]),
+         "b_law_type": normalize_law_type(document.get("law_type")),
+         "b_zone": document.get("zone"),
+         "b_approve_date": normalize_approve_date(document.get("approve_date"))}
+        for document in documents
+    ]
+    rows = [row for row in rows if row["b_law_type"] or row["b_zone"] or row["b_approve_date"]]
+    if not rows:
+        return 0
+
+    table = law_documents.__table__
+    values = {column: func.coalesce(bindparam(f"b_{column}"), table.c[column])
+              for column in ("law_type", "zone", "approve_date")}
+    # Rows whose metadata is already stored are not rewritten
+    statement = update(table).where(table.c.source_id == bindparam("b_source_id")).where(
+        or_(*(table.c[column].is_distinct_from(value) for column, value in values.items()))).values(values)
+    with get_db_session(INGEST) as session:
+        updated = session.execute(statement, rows).rowcount
+        session.commit()
+    if updated:
+        invalidate_result_cache()
+    return updated
+
+
+def get_source_ids_by_content_hash(hashes: List[str]) -> dict:
+    """
+    Looks up which stored laws have the given content hashes, so ingestion can skip unchanged laws before embedding.
+
+    Args:
+        hashes (List[str]): Content hashes (see `data_processing.dedup.content_hash`).
+
+    Returns:
+        dict: The law IDs (source_id) of the stored documents of each hash found, or {} if the lookup fails.
+    """
+    if not hashes:
+        return {}
+    with get_db_session() as session:
+        try:
+            rows = session.execute(
+                select(law_documents.content_hash, law_documents.source_id)
+                .where(law_documents.content_hash.in_(set(hashes)))
+                .order_by(law_documents.id)
+            ).all()
+            known = {}
+            for row in rows:
+                known.setdefault(row.content_hash, []).append(row.source_id)
+            return known
+        except SQLAlchemyError as e:
+            logger.error(f"Database error in get_source_ids_by_content_hash: {str(e)}")
+            return {}
+
+
+def get_embeddings_by_content_hash(hashes: List[str]) -> dict:
+    """
+    Fetches the stored embedding of contents, so a law stored under another law ID is not embedded again.
+
+    Args:
+        hashes (List[str]): Content hashes (see `data_processing.dedup.content_hash`).
+
+    Returns:
+        dict: A float32 embedding for each hash found, or {} if the lookup fails.
+    """
+    if not hashes:
+        return {}
+    with get_db_session() as session:
+        try:
+            statement = select_embeddings(session, law_documents.content_hash).where(
+                law_documents.content_hash.in_(set(hashes))).order_by(law_documents.id)
+            embeddings = {}
+            for row in session.execute(statement):
+                if row.embedding is not None:
+                    embeddings.setdefault(row.content_hash, np.asarray(row.embedding, dtype=np.float32))
+            return embeddings
+        except SQLAlchemyError as e:
+            logger.error(f"Database error in get_embeddings_by_content_hash: {str(e)}")
+            return {}
+
+
 def get_document_by_id(document_id: int):
     """
     Retrieves a document from the database by its ID.
 
+    Only the returned columns are selected, so the embedding is never transferred.
+
     Args:
         document_id (int): The ID of the document to retrieve.
 
     Returns:
         dict: A dictionary containing the document's id and content, or None if not found.
     """
+    try:
+        document = _read_replica(lambda session: session.execute(
+            select(law_documents.id, law_documents.content).where(law_documents.id == document_id)
+        ).first())
+        if not document:
+            return None
+        return {
+            "id": document.id,
+            "content": document.content
+        }
+    except Exception as e:
+        logger.error(f"Error retrieving document: {str(e)}")
+        return None
+
+
+def get_document_length(document_id: int) -> Optional[int]:
+    """
+    Retrieves the length of a document's content without transferring it.
+
+    Args:
+        document_id (int): The ID of the document.
+
+    Returns:
+        int: The number of characters in the content, or None if the document does not exist.
+
+    Raises:
+        Exception: If the length cannot be read, so a database error is not reported as a missing document.
+    """
+    try:
+        return _read_replica(lambda session: session.query(func.length(law_documents.content)).filter(
+            law_documents.id == document_id
+        ).scalar())
+    except Exception as e:
+        logger.error(f"Error in get_document_length: {str(e)}")
+        raise
+
+
+def get_document_chunk(document_id: int, start: int, size: int) -> Optional[str]:
+    """
+    Retrieves a slice of a document's content, so large laws can be streamed without loading them whole.
+
+    Each call uses its own short session, so no connection is held while the slice is sent.
+
+    Args:
+        document_id (int): The ID of the document.
+        start (int): The 1-based position of the first character.
+        size (int): The number of characters.
+
+    Returns:
+        str: The slice, empty past the end of the content, or None if the document does not exist.
+    """
+    try:
+        return _read_replica(lambda session: session.query(func.substr(law_documents.content, start, size)).filter(
+            law_documents.id == document_id
+        ).scalar())
+    except SQLAlchemyError as e:
+        logger.error(f"Database error in get_document_chunk: {str(e)}")
+        raise
+
+
+def update_document(document_id: int, content: str, embedding: np.ndarray, expected_content_hash: str = None):
+    """
+    Updates an existing document in the database with a single UPDATE ... RETURNING statement.
+
+    Args:
+        document_id (int): The ID of the document to update.
+        content (str): The new content of the document.
+        embedding (np.ndarray): The new embedding vector of the document.
+        expected_content_hash (str): Only update the document if its stored content still has this hash,
+                                     so a background job never overwrites a newer write (default: None, always).
+
+    Returns:
+        dict: A dictionary containing the updated document's content and updated_at timestamp,
+              or None if the document does not exist (or no longer has the expected content) or the update fails.
+    """
+    try:
+        embedding = to_float32_vector(embedding, EMBEDDING_DIM)
+    except ValueError as e:
+        logger.error(f"Invalid embedding format: {e}")
+        return None
+
     with get_db_session() as session:
         try:
-            # Load all attributes eagerly
-            document = session.query(law_documents).options(joinedload('*')).filter_by(id=document_id).first()
-            if not document:
+            split = uses_split_storage(session)
+            values = {"content": content, "content_hash": content_hash(content)}
+            if not split:
+                values["embedding"] = embedding
+            statement = update(law_documents).where(law_documents.id == document_id)
+            if expected_content_hash is not None:
+                statement = statement.where(law_documents.content_hash == expected_content_hash)
+            updated_at = session.execute(
+                statement.values(**values).returning(law_documents.updated_at)
+            ).scalar_one_or_none()
+            if updated_at is None:
+                logger.warning(f"Document with ID {document_id} not found or changed meanwhile")
                 return None
-            document_data = {
-                "id": document.id,
-                "content": document.content
+            if split:
+                write_split_embeddings(session, {document_id: embedding})
+            session.commit()
+            _on_document_written(document_id, embedding)
+
+            return {
+                "content": content,
+                "updated_at": updated_at
             }
-            return document_data
+        except SQLAlchemyError as e:
+            session.rollback()
+            logger.error(f"Database error in update_document: {e}")
+            return None
         except Exception as e:
-            logger.error(f"Error retrieving document: {str(e)}")
+            session.rollback()
+            logger.error(f"Unexpected error in update_document: {e}")
             return None
 
 
-
-def update_document(document_id: int, content: str, embedding: list[float]):
+def update_document_content(document_id: int, content: str):
     """
-    Updates an existing document in the database.
+    Updates only the content of a document, leaving its embedding to be refreshed later.
 
     Args:
         document_id (int): The ID of the document to update.
         content (str): The new content of the document.
-        embedding (List[float]): The new embedding vector of the document.
 
     Returns:
         dict: A dictionary containing the updated document's content and updated_at timestamp,
-              or None if the update fails.
+              or None if the document does not exist or the update fails.
     """
-    try:
-        if not isinstance(embedding, list) or not all(isinstance(x, float) for x in embedding):
-            logger.error("Invalid embedding format")
-            return None
-
-        with get_db_session() as session:
-            document = session.query(law_documents).filter(law_documents.id == document_id).first()
-            if not document:
+    with get_db_session() as session:
+        try:
+            updated_at = session.execute(
+                update(law_documents)
+                .where(law_documents.id == document_id)
+                .values(content=content, content_hash=content_hash(content))
+                .returning(law_documents.updated_at)
+            ).scalar_one_or_none()
+            if updated_at is None:
                 logger.warning(f"Document with ID {document_id} not found")
                 return None
-
-            document.content = content
-            document.embedding = embedding
             session.commit()
+            invalidate_result_cache()
 
-            session.refresh(document)
-
-            updated_document = {
-                "content": document.content,
-                "updated_at": document.updated_at
+            return {
+                "content": content,
+                "updated_at": updated_at
             }
-            return updated_document
-
-    except Exception as e:
-        logger.error(f"Error updating document: {str(e)}")
-        return None
-    except SQLAlchemyError as e:
-        logger.error(f"Database error in update_document: {e}")
-        return None
-
-    except Exception as e:
-        logger.error(f"Unexpected error in update_document: {e}")
-        return None
+        except SQLAlchemyError as e:
+            session.rollback()
+            logger.error(f"Database error in update_document_content: {e}")
+            return None
 
 
 def delete_document(document_id: int) -> bool:
     """
-    Deletes a document from the database.
+    Deletes a document from the database with a single DELETE ... RETURNING statement.
 
     Args:
         document_id (int): The ID of the document to delete.
@@ -186,12 +620,14 @@ def delete_document(document_id: int) -> bool:
     """
     with get_db_session() as session:
         try:
-            document = session.query(law_documents).filter(law_documents.id == document_id).first()
-            if document:
-                session.delete(document)
-                session.commit()
-                return True
-            return False
+            deleted_id = session.execute(
+                delete(law_documents).where(law_documents.id == document_id).returning(law_documents.id)
+            ).scalar_one_or_none()
+            if deleted_id is None:
+                return False
+            session.commit()
+            _on_document_deleted(document_id)
+            return True
         except SQLAlchemyError as e:
             session.rollback()
             logger.error(f"Database error in delete_document: {e}")
@@ -209,12 +645,247 @@ def get_document_count() -> int:
     Returns:
         int: The total number of documents, or 0 if an error occurs.
     """
+    def read(session):
+        with track_stage("count_query"):
+            return session.execute(select(func.count(law_documents.id))).scalar_one()
+
+    try:
+        return _read_replica(read)
+    except SQLAlchemyError as e:
+        logger.error(f"Database error in get_document_count: {str(e)}")
+        return 0
+    except Exception as e:
+        logger.error(f"Unexpected error in get_document_count: {str(e)}")
+        return 0
+
+
+def insert_job(job: dict, forget_before: Optional[datetime] = None):
+    """
+    Records a new background job, and forgets the jobs that finished before a given time.
+
+    Args:
+        job (dict): The `job_id`, `document_id`, `status` and `created_at` of the job.
+        forget_before (datetime): Delete the jobs finished before this time, or None to keep them.
+
+    Raises:
+        SQLAlchemyError: If the job cannot be recorded.
+    """
+    with get_db_session() as session:
+        session.execute(insert(document_jobs).values(**job))
+        if forget_before is not None:
+            session.execute(delete(document_jobs).where(document_jobs.finished_at < forget_before))
+        session.commit()
+
+
+def update_job(job_id: str, **fields):
+    """
+    Updates the status of a background job.
+
+    Args:
+        job_id (str): The ID of the job.
+        **fields: The columns to set, e.g. `status`, `error` and `finished_at`.
+
+    Raises:
+        SQLAlchemyError: If the job cannot be updated.
+    """
+    with get_db_session() as session:
+        session.execute(update(document_jobs).where(document_jobs.job_id == job_id).values(**fields))
+        session.commit()
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    """
+    Retrieves the status of a background job.
+
+    The primary is read, so a job is found right after it was submitted.
+
+    Args:
+        job_id (str): The ID of the job.
+
+    Returns:
+        dict: The job's `job_id`, `document_id`, `status`, `created_at`, `finished_at` and `error`,
+              or None if the job is unknown.
+
+    Raises:
+        SQLAlchemyError: If the job cannot be read.
+    """
+    with get_db_session() as session:
+        row = session.execute(select(
+            document_jobs.job_id, document_jobs.document_id, document_jobs.status,
+            document_jobs.created_at, document_jobs.finished_at, document_jobs.error,
+        ).where(document_jobs.job_id == job_id)).first()
+        return dict(row._mapping) if row is not None else None
+
+
+def get_latest_job_id(document_id: int) -> Optional[str]:
+    """
+    Retrieves the ID of the most recently submitted background job of a document.
+
+    Args:
+        document_id (int): The ID of the document.
+
+    Returns:
+        str: The ID of the job, or None if the document has no job.
+
+    Raises:
+        SQLAlchemyError: If the jobs cannot be read.
+    """
     with get_db_session() as session:
+        return session.execute(
+            select(document_jobs.job_id).where(document_jobs.document_id == document_id)
+            .order_by(document_jobs.created_at.desc()).limit(1)
+        ).scalar()
+
+
+def _dialect_insert(session: Session):
+    """Returns the INSERT construct with ON CONFLICT support for the session's database."""
+    if session.get_bind().dialect.name == "sqlite":
+        return sqlite_insert
+    return pg_insert
+
+
+def _on_document_written(document_id: int, embedding):
+    """Keeps the in-process vector index and the result cache in step with an inserted or updated document."""
+    index = get_vector_index()
+    if index is not None:
+        index.add(document_id, embedding)
+    invalidate_result_cache()
+
+
+def _on_document_deleted(document_id: int):
+    """Keeps the in-process vector index and the result cache in step with a deleted document."""
+    index = get_vector_index()
+    if index is not None:
+        index.remove(document_id)
+    invalidate_result_cache()
+
+
+def _get_search_index():
+    """
+    Returns the in-process vector index, building it first if the database cannot search vectors itself.
+    """
+    index = get_vector_index()
+    if index is None and get_backend(get_engine()).needs_vector_index:
+        with _index_build_lock:
+            index = get_vector_index()
+            if index is None:
+                try:
+                    index = build_vector_index()
+                except Exception as e:
+                    logger.error(f"Error building the in-process vector index: {str(e)}")
+    return index
+
+
+def prewarm_database() -> dict:
+    """
+    Loads the table and indexes searches read into the cache of every database searches go to.
+
+    Returns:
+        dict: The number of blocks loaded per database URL (without password) and relation.
+    """
+    loaded = {}
+    for engine in get_role_engines(REPLICA):
         try:
-            return session.query(law_documents).count()
+            with track_stage("prewarm"):
+                loaded[engine.url.render_as_string(hide_password=True)] = get_backend(engine).prewarm(engine)
         except SQLAlchemyError as e:
-            logger.error(f"Database error in get_document_count: {str(e)}")
-            return 0
-        except Exception as e:
-            logger.error(f"Unexpected error in get_document_count: {str(e)}")
-            return 0
\ No newline at end of file
+            logger.error(f"Database error warming up {engine.url.host}: {str(e)}")
+    return loaded
+
+
+def _changed_at():
+    """SQL expression for the last time a row was written."""
+    return func.coalesce(law_documents.updated_at, law_documents.created_at)
+
+
+def _load_embeddings(index: VectorIndex, since: Optional[datetime] = None, overlap: float = 0,
+                     batch_size: int = 5000) -> tuple:
+    """
+    Streams embeddings from the database into an index.
+
+    Args:
+        index (VectorIndex): The index to fill.
+        since (datetime): Only load rows written after this time, or all rows if None.
+        overlap (float): Also reload the rows written this many seconds before `since`, which a
+                         transaction still open when `since` was recorded may have committed later.
+        batch_size (int): The number of rows fetched per round trip.
+
+    Returns:
+        tuple: The latest write time among the loaded rows (or `since` if nothing was loaded),
+               and the number of documents added or whose embedding changed.
+    """
+    watermark = since
+    changed = 0
+    with get_db_session() as session:
+        statement = select_embeddings(session, law_documents.id, _changed_at().label("changed_at"))
+        if since is not None:
+            statement = statement.where(_changed_at() > since - timedelta(seconds=overlap))
+        for row in session.execute(statement.execution_options(yield_per=batch_size)):
+            if row.embedding is None:
+                continue
+            changed += index.add(row.id, row.embedding)
+            if row.changed_at is not None and (watermark is None or row.changed_at > watermark):
+                watermark = row.changed_at
+    return watermark, changed
+
+
+def build_vector_index() -> VectorIndex:
+    """
+    Builds the in-process vector index and installs it for `get_closest_document`.
+
+    If VECTOR_INDEX_PATH points to a saved index, it is memory-mapped and only the rows
+    written since it was saved are loaded; otherwise every embedding is streamed from the
+    database and the result is saved to VECTOR_INDEX_PATH (when set) for other workers.
+
+    Returns:
+        VectorIndex: The built index.
+    """
+    path = get_vector_index_path()
+    index = None
+    if path:
+        try:
+            index = VectorIndex.load(path)
+            logger.info(f"Loaded vector index with {len(index)} documents from {path}")
+        except FileNotFoundError:
+            index = None
+    if index is None:
+        index = VectorIndex()
+        index.watermark = _watermark_to_str(_load_embeddings(index)[0])
+        if path:
+            index.save(path)
+        set_vector_index(index)
+    else:
+        set_vector_index(index)
+        refresh_vector_index()
+    logger.info(f"Vector index ready with {len(index)} documents")
+    return index
+
+
+def refresh_vector_index():
+    """
+    Brings the in-process vector index up to date with writes made by other processes.
+
+    Rows written since the index watermark, less VECTOR_INDEX_REFRESH_OVERLAP_SECONDS, are
+    (re)loaded and ids that no longer exist in the database are removed.
+    """
+    index = get_vector_index()
+    if index is None:
+        return
+    previous_watermark = index.watermark
+    since = datetime.fromisoformat(previous_watermark) if previous_watermark else None
+    watermark, changed = _load_embeddings(index, since=since, overlap=get_vector_index_refresh_overlap())
+    index.watermark = _watermark_to_str(watermark)
+    # Snapshot the indexed ids first so documents inserted meanwhile are not dropped
+    indexed_ids = index.ids()
+    with get_db_session() as session:
+        existing_ids = {row.id for row in session.query(law_documents.id).yield_per(50000)}
+    removed_ids = indexed_ids - existing_ids
+    for document_id in removed_ids:
+        index.remove(document_id)
+    if removed_ids or changed or index.watermark != previous_watermark:
+        # Writes made by other processes also invalidate this process's cached results
+        invalidate_result_cache()
+
+
+def _watermark_to_str(watermark: Optional[datetime]) -> Optional[str]:
+    return watermark.isoformat() if watermark is not None else None
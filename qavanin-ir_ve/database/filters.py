@@ -0,0 +1,107 @@
+import re
+from typing import Optional
+from .models import LawDocument as law_documents
+
+# Kinds of documents qavanin.ir lists, as stored in `law_documents.law_type`. Each kind has a partial
+# ANN index (see database/migrations.py), so a search filtered on it only walks documents of that kind
+LAW_TYPES = ("law", "regulation", "vote", "opinion")
+
+# Persian and Arabic-Indic digits, normalized to ASCII in dates
+_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
+_DATE_REGEX = re.compile(r"^(\d{4})[/-](\d{1,2})[/-](\d{1,2})$")
+
+
+def normalize_law_type(law_type: Optional[str]) -> Optional[str]:
+    """
+    Validate a law type.
+
+    Args:
+        law_type (str): One of `LAW_TYPES`, or None.
+
+    Returns:
+        str: The law type in lower case, or None.
+
+    Raises:
+        ValueError: If the law type is unknown.
+    """
+    if law_type is None or not law_type.strip():
+        return None
+    law_type = law_type.strip().lower()
+    if law_type not in LAW_TYPES:
+        raise ValueError(f"Unknown law type '{law_type}'. Allowed law types: {', '.join(LAW_TYPES)}.")
+    return law_type
+
+
+def normalize_approve_date(value: Optional[str]) -> Optional[str]:
+    """
+    Normalize a Jalali approval date to the zero-padded `YYYY/MM/DD` form it is stored in,
+    so dates compare correctly as strings.
+
+    Args:
+        value (str): The date, e.g. `1400/2/5` or `۱۴۰۰/۰۲/۰۵`, or None.
+
+    Returns:
+        str: The date as `YYYY/MM/DD`, or None.
+
+    Raises:
+        ValueError: If the date is not written as year/month/day.
+    """
+    if value is None or not value.strip():
+        return None
+    match = _DATE_REGEX.match(value.strip().translate(_DIGITS))
+    if not match or not 1 <= int(match.group(2)) <= 12 or not 1 <= int(match.group(3)) <= 31:
+        raise ValueError(f"Invalid approval date '{value}', expected YYYY/MM/DD (Jalali).")
+    year, month, day = match.groups()
+    return f"{year}/{int(month):02d}/{int(day):02d}"
+
+
+def build_search_filters(law_type: Optional[str] = None, zone: Optional[str] = None,
+                         approved_from: Optional[str] = None, approved_to: Optional[str] = None) -> dict:
+    """
+    Validate the metadata filters of a search.
+
+    Args:
+        law_type (str): Only return documents of this type (see `LAW_TYPES`).
+        zone (str): Only return documents of this zone.
+        approved_from (str): Only return documents approved on or after this Jalali date.
+        approved_to (str): Only return documents approved on or before this Jalali date.
+
+    Returns:
+        dict: The filters that are set, or {} for an unfiltered search.
+
+    Raises:
+        ValueError: If a filter is invalid.
+    """
+    filters = {
+        "law_type": normalize_law_type(law_type),
+        "zone": zone.strip() if zone and zone.strip() else None,
+        "approved_from": normalize_approve_date(approved_from),
+        "approved_to": normalize_approve_date(approved_to),
+    }
+    if filters["approved_from"] and filters["approved_to"] and filters["approved_from"] > filters["approved_to"]:
+        raise ValueError("approved_from must not be after approved_to.")
+    return {name: value for name, value in filters.items() if value is not None}
+
+
+def filter_conditions(filters: Optional[dict]) -> list:
+    """
+    Translate search filters into WHERE conditions on `law_documents`.
+
+    Args:
+        filters (dict): Filters built by `build_search_filters`, or None.
+
+    Returns:
+        list: The SQLAlchemy conditions, empty for an unfiltered search.
+    """
+    if not filters:
+        return []
+    conditions = []
+    if "law_type" in filters:
+        conditions.append(law_documents.law_type == filters["law_type"])
+    if "zone" in filters:
+        conditions.append(law_documents.zone == filters["zone"])
+    if "approved_from" in filters:
+        conditions.append(law_documents.approve_date >= filters["approved_from"])
+    if "approved_to" in filters:
+        conditions.append(law_documents.approve_date <= filters["approved_to"])
+    return conditions
@@ -0,0 +1,230 @@
+import argparse
+import logging
+from sqlalchemy import text, inspect, select, update, bindparam
+from .filters import LAW_TYPES
+from .models import Base, LawDocument
+from data_processing.dedup import content_hash
+
+logger = logging.getLogger(__name__)
+
+# Ordered schema migrations applied by `run_migrations`. Each migration is a name and a list
+# of SQL statements. Statements must be idempotent, because a fresh database created by
+# `Base.metadata.create_all` already has the current schema and still runs every migration once.
+MIGRATIONS = [
+    ("0001_add_source_id", [
+        "ALTER TABLE law_documents ADD COLUMN IF NOT EXISTS source_id VARCHAR(64)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_law_documents_source_id ON law_documents (source_id)",
+    ]),
+    # Hot/cold split: a narrow table for the embeddings, so similarity search and its index never
+    # touch the TOASTed law texts. It stays empty until `vector_storage.split_vector_storage` moves
+    # the embeddings into it; VECTOR_STORAGE then makes writes and searches use it.
+    ("0002_split_vector_storage", [
+        "CREATE TABLE IF NOT EXISTS law_document_vectors ("
+        "document_id INTEGER PRIMARY KEY REFERENCES law_documents (id) ON DELETE CASCADE, "
+        "embedding vector(384) NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS idx_law_document_vectors_embedding "
+        "ON law_document_vectors USING hnsw (embedding vector_l2_ops)",
+        # lz4 decompresses several times faster than the default pglz. It needs PostgreSQL 14
+        # built with lz4 and only applies to values written afterwards.
+        "DO $$ BEGIN "
+        "ALTER TABLE law_documents ALTER COLUMN content SET COMPRESSION lz4; "
+        "EXCEPTION WHEN others THEN "
+        "RAISE NOTICE 'lz4 compression is not available, law texts stay pglz-compressed'; "
+        "END $$",
+    ]),
+    # Content hashes let ingestion skip laws whose text is already stored (see data_processing/dedup.py)
+    ("0003_add_content_hash", [
+        "ALTER TABLE law_documents ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+        "UPDATE law_documents SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex') "
+        "WHERE content_hash IS NULL",
+        "CREATE INDEX IF NOT EXISTS idx_law_documents_content_hash ON law_documents (content_hash)",
+    ]),
+    # Search filters (see database/filters.py). The partial HNSW index of each law type is built
+    # outside this transaction, see CONCURRENT_INDEXES
+    ("0004_add_law_metadata", [
+        "ALTER TABLE law_documents ADD COLUMN IF NOT EXISTS law_type VARCHAR(16)",
+        "ALTER TABLE law_documents ADD COLUMN IF NOT EXISTS zone VARCHAR(64)",
+        "ALTER TABLE law_documents ADD COLUMN IF NOT EXISTS approve_date VARCHAR(10)",
+        "CREATE INDEX IF NOT EXISTS idx_law_documents_law_type ON law_documents (law_type)",
+        "CREATE INDEX IF NOT EXISTS idx_law_documents_zone ON law_documents (zone)",
+        "CREATE INDEX IF NOT EXISTS idx_law_documents_approve_date ON law_documents (approve_date)",
+    ]),
+    # pg_prewarm lets the API load the search table and indexes into shared buffers before it reports
+    # ready (see PostgresBackend.prewarm). Creating it needs privileges the application may not have.
+    ("0005_add_pg_prewarm", [
+        "DO $$ BEGIN "
+        "CREATE EXTENSION IF NOT EXISTS pg_prewarm; "
+        "EXCEPTION WHEN others THEN "
+        "RAISE NOTICE 'pg_prewarm could not be created, the cache is not warmed up after restarts'; "
+        "END $$",
+    ]),
+    # Earlier versions of 0002 mirrored every write into law_document_vectors with a trigger. The
+    # application now writes the embeddings to the table of its layout only, and the split layout
+    # leaves law_documents.embedding NULL.
+    ("0006_drop_vector_sync_trigger", [
+        "DROP TRIGGER IF EXISTS law_document_vectors_sync ON law_documents",
+        "DROP FUNCTION IF EXISTS law_document_vectors_sync()",
+        "ALTER TABLE law_documents ALTER COLUMN embedding DROP NOT NULL",
+    ]),
+    # Background job status, shared by every API worker (see api/jobs.py)
+    ("0007_add_document_jobs", [
+        "CREATE TABLE IF NOT EXISTS document_jobs ("
+        "job_id VARCHAR(32) PRIMARY KEY, "
+        "document_id INTEGER NOT NULL, "
+        "status VARCHAR(16) NOT NULL, "
+        "error TEXT, "
+        "created_at TIMESTAMP WITH TIME ZONE NOT NULL, "
+        "finished_at TIMESTAMP WITH TIME ZONE)",
+        "CREATE INDEX IF NOT EXISTS idx_document_jobs_document_id ON document_jobs (document_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_document_jobs_finished_at ON document_jobs (finished_at)",
+    ]),
+]
+
+
+# Indexes built with CREATE INDEX CONCURRENTLY by `create_concurrent_indexes`, outside any transaction,
+# because building them on a full table takes long and a plain CREATE INDEX blocks every write meanwhile.
+# Each law type gets a partial HNSW index, so a search filtered on it walks a graph of that type only
+# instead of filtering the results of the full index. They index law_documents.embedding, so they are
+# only built for the inline vector storage.
+CONCURRENT_INDEXES = [
+    (f"idx_law_documents_embedding_{law_type}",
+     f"ON law_documents USING hnsw (embedding vector_l2_ops) WHERE law_type = '{law_type}'")
+    for law_type in LAW_TYPES
+]
+
+
+def run_migrations(connection) -> list:
+    """
+    Applies the migrations that have not been applied yet, in order.
+
+    Applied migrations are recorded in the `schema_migrations` table. The caller owns the
+    transaction, so either all pending migrations are applied or none is.
+
+    Args:
+        connection (Connection): An open SQLAlchemy connection inside a transaction.
+
+    Returns:
+        list: The names of the migrations applied by this call.
+    """
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "name VARCHAR(255) PRIMARY KEY, "
+        "applied_at TIMESTAMP WITH TIME ZONE DEFAULT now())"
+    ))
+    applied = {row[0] for row in connection.execute(text("SELECT name FROM schema_migrations"))}
+
+    newly_applied = []
+    for name, statements in MIGRATIONS:
+        if name in applied:
+            continue
+        logger.info(f"Applying migration {name}...")
+        for statement in statements:
+            connection.execute(text(statement))
+        connection.execute(text("INSERT INTO schema_migrations (name) VALUES (:name)"), {"name": name})
+        newly_applied.append(name)
+    return newly_applied
+
+
+def upgrade_sqlite_schema(connection) -> list:
+    """
+    Brings the tables of an SQLite database created by an earlier version up to the current models.
+
+    `MIGRATIONS` is PostgreSQL SQL and SQLite has no `ADD COLUMN IF NOT EXISTS`, so the columns and
+    indexes missing from the existing tables are added from the models instead, and the content
+    hashes backfilled by migration 0003 are computed in Python. Tables that do not exist yet are
+    left to `Base.metadata.create_all`.
+
+    Args:
+        connection (Connection): An open SQLAlchemy connection inside a transaction.
+
+    Returns:
+        list: The columns and indexes added by this call.
+    """
+    inspector = inspect(connection)
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in columns:
+                column_type = column.type.compile(dialect=connection.dialect)
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                added.append(f"{table.name}.{column.name}")
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in indexes:
+                index.create(connection)
+                added.append(index.name)
+
+    if not inspector.has_table(LawDocument.__tablename__):
+        return added
+    rows = connection.execute(
+        select(LawDocument.id, LawDocument.content).where(LawDocument.content_hash.is_(None))).all()
+    if rows:
+        connection.execute(
+            update(LawDocument.__table__).where(LawDocument.__table__.c.id == bindparam("b_id"))
+            .values(content_hash=bindparam("b_hash")),
+            [{"b_id": row.id, "b_hash": content_hash(row.content)} for row in rows])
+    return added
+
+
+def _index_validity(connection, name: str):
+    """True if the index exists and is valid, False if a failed concurrent build left it invalid, None if missing."""
+    return connection.execute(text(
+        "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+    ), {"name": name}).scalar()
+
+
+def missing_concurrent_indexes(connection) -> list:
+    """
+    Lists the indexes of `CONCURRENT_INDEXES` that do not exist yet or are invalid.
+
+    Args:
+        connection (Connection): An open SQLAlchemy connection.
+
+    Returns:
+        list: The names of the indexes `create_concurrent_indexes` would build.
+    """
+    return [name for name, _ in CONCURRENT_INDEXES if not _index_validity(connection, name)]
+
+
+def create_concurrent_indexes(engine) -> list:
+    """
+    Builds the missing indexes of `CONCURRENT_INDEXES` with CREATE INDEX CONCURRENTLY.
+
+    Reads and writes go on while the indexes are built. An index left invalid by a failed or
+    interrupted build is dropped and built again.
+
+    Args:
+        engine (Engine): The engine of the PostgreSQL database.
+
+    Returns:
+        list: The names of the indexes built by this call.
+    """
+    built = []
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        for name, definition in CONCURRENT_INDEXES:
+            valid = _index_validity(connection, name)
+            if valid:
+                continue
+            if valid is False:
+                connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+            logger.info(f"Building index {name} concurrently...")
+            connection.execute(text(f"CREATE INDEX CONCURRENTLY {name} {definition}"))
+            built.append(name)
+    return built
+
+
+if __name__ == "__main__":
+    from .models import get_engine
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Build the indexes that are not built by the schema migrations.")
+    parser.add_argument("--concurrent-indexes", action="store_true",
+                        help="Build the partial HNSW indexes of the search filters without blocking writes.")
+    args = parser.parse_args()
+    if args.concurrent_indexes:
+        indexes = create_concurrent_indexes(get_engine())
+        logger.info(f"Built indexes: {', '.join(indexes) or 'none, all exist'}")
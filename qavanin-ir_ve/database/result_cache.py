@@ -0,0 +1,196 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Environment variables configuring the result cache
+RESULT_CACHE_ENV = "RESULT_CACHE"
+RESULT_CACHE_SIZE_ENV = "RESULT_CACHE_SIZE"
+RESULT_CACHE_TTL_ENV = "RESULT_CACHE_TTL_SECONDS"
+REDIS_URL_ENV = "REDIS_URL"
+# Number of uvicorn worker processes, set by the Docker image
+API_WORKERS_ENV = "API_WORKERS"
+
+_WHITESPACE_REGEX = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalize a query so that requests differing only in Unicode form or whitespace share a cache entry.
+
+    Args:
+        text (str): The query text.
+
+    Returns:
+        str: The normalized text.
+    """
+    return _WHITESPACE_REGEX.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+class ResultCache:
+    """
+    In-process LRU cache for search responses.
+
+    Every key embeds the current write generation. Writes to law_documents bump the
+    generation, so entries computed before a write can never be returned after it and
+    simply age out of the LRU.
+    """
+
+    # Lookups are served from memory and can run on the event loop
+    is_local = True
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0):
+        """
+        Initialize the ResultCache.
+
+        Args:
+            max_entries (int): Maximum number of cached responses (default: 1024).
+            ttl (float): Seconds a response stays valid (default: 300).
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def generation(self) -> int:
+        return self._generation
+
+    def bump_generation(self):
+        with self._lock:
+            self._generation += 1
+
+    def make_key(self, namespace: str, text: str, *params) -> str:
+        """
+        Build a cache key for a query.
+
+        Args:
+            namespace (str): The kind of response cached (e.g. the endpoint name).
+            text (str): The query text, normalized before hashing.
+            *params: Any other request parameters the response depends on (e.g. the limit).
+
+        Returns:
+            str: The cache key.
+        """
+        digest = hashlib.sha1(normalize_query(text).encode("utf-8")).hexdigest()
+        suffix = ":".join(str(param) for param in params)
+        return f"{namespace}:{self.generation()}:{suffix}:{digest}"
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class RedisResultCache(ResultCache):
+    """
+    Result cache stored in a Redis-compatible server.
+
+    The generation counter lives in the server too, so a write handled by one API worker
+    invalidates the cached responses of every worker.
+    """
+
+    is_local = False
+    GENERATION_KEY = "qavanin:result_cache:generation"
+
+    def __init__(self, url: str, ttl: float = 300.0):
+        """
+        Initialize the RedisResultCache.
+
+        Args:
+            url (str): The Redis connection URL.
+            ttl (float): Seconds a response stays valid (default: 300).
+        """
+        import redis
+
+        super().__init__(ttl=ttl)
+        self._redis = redis.Redis.from_url(url)
+
+    def generation(self) -> int:
+        return int(self._redis.get(self.GENERATION_KEY) or 0)
+
+    def bump_generation(self):
+        self._redis.incr(self.GENERATION_KEY)
+
+    def get(self, key: str):
+        value = self._redis.get(key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key: str, value):
+        # Milliseconds, so a TTL under a second does not become 0 (which Redis rejects)
+        self._redis.set(key, json.dumps(value, default=str), px=max(1, int(self.ttl * 1000)))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """
+    Return the configured result cache, or None if caching is disabled.
+
+    The cache is selected with RESULT_CACHE (`memory` or `redis`); the Redis cache connects to REDIS_URL.
+    The memory cache is private to each worker process: a write only invalidates the cache of the
+    worker that handled it, and the other workers serve their cached responses until the next
+    vector index refresh (VECTOR_INDEX_REFRESH_SECONDS) or for up to RESULT_CACHE_TTL_SECONDS.
+
+    Returns:
+        ResultCache: The shared result cache, or None.
+    """
+    global _cache
+    kind = os.getenv(RESULT_CACHE_ENV, "").strip().lower()
+    if not kind:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                ttl = float(os.getenv(RESULT_CACHE_TTL_ENV, "300"))
+                if kind == "redis":
+                    _cache = RedisResultCache(os.getenv(REDIS_URL_ENV, "redis://localhost:6379/0"), ttl=ttl)
+                elif kind == "memory":
+                    if int(os.getenv(API_WORKERS_ENV, "1") or 1) > 1:
+                        logger.warning("RESULT_CACHE=memory with several API workers: a write only invalidates "
+                                       "the cache of its worker, the others may serve stale results for up to "
+                                       f"{ttl:g} seconds. Use RESULT_CACHE=redis to share invalidations.")
+                    _cache = ResultCache(max_entries=int(os.getenv(RESULT_CACHE_SIZE_ENV, "1024")), ttl=ttl)
+                else:
+                    logger.warning(f"Unknown result cache type '{kind}', caching is disabled.")
+                    return None
+    return _cache
+
+
+def invalidate_result_cache():
+    """
+    Invalidate every cached response by bumping the write generation.
+
+    Called after every write to law_documents. Errors are logged, not raised, so a cache
+    outage never fails a write; cached entries still expire after their TTL.
+    """
+    cache = get_result_cache()
+    if cache is None:
+        return
+    try:
+        cache.bump_generation()
+    except Exception as e:
+        logger.error(f"Error invalidating the result cache: {str(e)}")
@@ -0,0 +1,321 @@
+import argparse
+import io
+import logging
+import time
+from functools import partial
+import numpy as np
+from sqlalchemy import select, insert, func, text
+from .models import LawDocument as law_documents, LawDocumentVector as law_document_vectors, get_engine, PRIMARY, \
+    REPLICA
+from .vector_type import format_vector
+from .vector_storage import select_embeddings, uses_split_storage
+from .db_oprations import get_db_session
+from .result_cache import invalidate_result_cache
+from data_processing.dedup import content_hash
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional; it is only needed to export and import snapshots
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+# Snapshot formats, chosen from the file extension unless given explicitly
+PARQUET = "parquet"
+ARROW = "arrow"
+_EXTENSIONS = {".parquet": PARQUET, ".arrow": ARROW, ".feather": ARROW, ".ipc": ARROW}
+
+# Version of the snapshot layout, stored in the schema metadata
+SNAPSHOT_VERSION = "1"
+
+# Columns of law_documents written to a snapshot, besides the embedding
+_COLUMNS = ("id", "source_id", "content", "content_hash", "law_type", "zone", "approve_date",
+            "created_at", "updated_at")
+
+# Escapes of the text format of COPY
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed. Install it to export and import snapshots.")
+
+
+def snapshot_schema(dim: int = None):
+    """
+    Build the Arrow schema of a snapshot.
+
+    The embeddings are a fixed-size list of float32, so they are written and read as one
+    contiguous float32 buffer per batch instead of one Python list per row.
+
+    Args:
+        dim (int): The dimension of the embeddings (default: the dimension of the column).
+
+    Returns:
+        pyarrow.Schema: The schema.
+    """
+    _require_pyarrow()
+    dim = dim or law_documents.embedding.type.dim
+    return pa.schema([
+        ("id", pa.int64()),
+        ("source_id", pa.string()),
+        ("content", pa.large_string()),
+        ("content_hash", pa.string()),
+        ("law_type", pa.string()),
+        ("zone", pa.string()),
+        ("approve_date", pa.string()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+        ("updated_at", pa.timestamp("us", tz="UTC")),
+        ("embedding", pa.list_(pa.float32(), dim)),
+    ], metadata={"qavanin.snapshot_version": SNAPSHOT_VERSION, "qavanin.embedding_dim": str(dim)})
+
+
+def _snapshot_format(path: str, snapshot_format: str = None) -> str:
+    if snapshot_format:
+        return snapshot_format
+    for extension, extension_format in _EXTENSIONS.items():
+        if path.endswith(extension):
+            return extension_format
+    raise ValueError(f"Cannot tell the snapshot format of '{path}', use one of: {', '.join(_EXTENSIONS)}.")
+
+
+def _record_batch(rows, schema):
+    """Build an Arrow record batch from rows of law_documents."""
+    dim = schema.field("embedding").type.list_size
+    embeddings = np.ascontiguousarray(np.stack([row.embedding for row in rows]), dtype=np.float32)
+    arrays = [pa.array([getattr(row, name) for row in rows], type=schema.field(name).type) for name in _COLUMNS]
+    arrays.append(pa.FixedSizeListArray.from_arrays(pa.array(embeddings.reshape(-1)), dim))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def export_snapshot(path: str, snapshot_format: str = None, batch_size: int = 10000) -> int:
+    """
+    Write every row of law_documents, with its embedding and metadata, to a Parquet or Arrow IPC file.
+
+    Rows are streamed from the database in batches of `batch_size` (read from a replica when
+    one is configured) and each batch is written as one Parquet row group or IPC record batch,
+    so memory use does not grow with the corpus.
+
+    Args:
+        path (str): The file to write.
+        snapshot_format (str): `parquet` or `arrow`, or None to choose from the extension.
+        batch_size (int): The number of rows per batch (default: 10000).
+
+    Returns:
+        int: The number of exported rows.
+    """
+    schema = snapshot_schema()
+    snapshot_format = _snapshot_format(path, snapshot_format)
+    if snapshot_format == PARQUET:
+        writer = pq.ParquetWriter(path, schema, compression="zstd")
+        write = partial(writer.write_batch, row_group_size=batch_size)
+    else:
+        writer = pa.ipc.new_file(path, schema)
+        write = writer.write_batch
+
+    exported = 0
+    columns = [getattr(law_documents, name) for name in _COLUMNS]
+    try:
+        with get_db_session(REPLICA) as session:
+            statement = select_embeddings(session, *columns).order_by(law_documents.id).execution_options(
+                yield_per=batch_size)
+            result = session.execute(statement)
+            for rows in result.partitions():
+                write(_record_batch(rows, schema))
+                exported += len(rows)
+                logger.info(f"Exported {exported} documents...")
+    finally:
+        writer.close()
+    return exported
+
+
+def _read_batches(path: str, snapshot_format: str, batch_size: int):
+    """Yield the record batches of a snapshot, checking that its embeddings fit the column."""
+    if snapshot_format == PARQUET:
+        snapshot = pq.ParquetFile(path)
+        schema = snapshot.schema_arrow
+        batches = snapshot.iter_batches(batch_size=batch_size)
+    else:
+        snapshot = pa.ipc.open_file(path)
+        schema = snapshot.schema
+        batches = (snapshot.get_batch(i) for i in range(snapshot.num_record_batches))
+
+    dim = law_documents.embedding.type.dim
+    embedding_type = schema.field("embedding").type
+    if getattr(embedding_type, "list_size", None) != dim:
+        raise ValueError(f"The snapshot embeddings are {embedding_type}, expected {dim} floats.")
+    for batch in batches:
+        yield batch
+
+
+def _batch_rows(batch) -> tuple:
+    """Return the columns of a record batch as Python lists, and its embeddings as a float32 matrix."""
+    dim = batch.schema.field("embedding").type.list_size
+    embeddings = batch.column("embedding").flatten().to_numpy().astype(np.float32, copy=False).reshape(-1, dim)
+    names = set(batch.schema.names)
+    columns = {name: batch.column(name).to_pylist() if name in names else [None] * batch.num_rows
+               for name in _COLUMNS}
+    # Snapshots of databases created before content hashes were stored
+    columns["content_hash"] = [digest or content_hash(content)
+                               for digest, content in zip(columns["content_hash"], columns["content"])]
+    return columns, embeddings
+
+
+def _copy_value(value) -> str:
+    if value is None:
+        return "\\N"
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value).translate(_COPY_ESCAPES)
+
+
+def _copy_batch(cursor, batch, split: bool):
+    """
+    Send a record batch to PostgreSQL with COPY FROM STDIN in the text format.
+
+    With the split vector storage the embeddings are copied into law_document_vectors by a second COPY.
+    """
+    columns, embeddings = _batch_rows(batch)
+    documents = io.StringIO()
+    vectors = io.StringIO()
+    for i, embedding in enumerate(embeddings):
+        documents.write("\t".join(_copy_value(columns[name][i]) for name in _COLUMNS))
+        if split:
+            vectors.write(f"{columns['id'][i]}\t{format_vector(embedding)}\n")
+            documents.write("\n")
+        else:
+            documents.write("\t" + format_vector(embedding) + "\n")
+    documents.seek(0)
+    copy_columns = _COLUMNS if split else _COLUMNS + ("embedding",)
+    cursor.copy_expert(f"COPY {law_documents.__tablename__} ({', '.join(copy_columns)}) FROM STDIN", documents)
+    if split:
+        vectors.seek(0)
+        cursor.copy_expert(f"COPY {law_document_vectors.__tablename__} (document_id, embedding) FROM STDIN", vectors)
+
+
+def _ann_indexes(connection) -> list:
+    """The names and definitions of the ANN indexes on law_documents and law_document_vectors."""
+    return connection.execute(text(
+        "SELECT indexname, indexdef FROM pg_indexes "
+        "WHERE tablename IN ('law_documents', 'law_document_vectors') "
+        "AND (indexdef LIKE '%USING hnsw%' OR indexdef LIKE '%USING ivfflat%')"
+    )).all()
+
+
+def _import_postgres(connection, batches, maintenance_work_mem: str = None) -> int:
+    """
+    Load the batches with COPY into an empty law_documents, building the ANN indexes once at the end.
+
+    Dropping the ANN indexes first means each row is written once instead of being inserted into
+    every graph. The embeddings go to the table of the configured vector storage.
+    """
+    indexes = _ann_indexes(connection)
+    for index in indexes:
+        connection.execute(text(f"DROP INDEX {index.indexname}"))
+
+    split = uses_split_storage(connection)
+    imported = 0
+    cursor = connection.connection.cursor()
+    try:
+        for batch in batches:
+            _copy_batch(cursor, batch, split)
+            imported += batch.num_rows
+            logger.info(f"Copied {imported} documents...")
+    finally:
+        cursor.close()
+
+    connection.execute(text(
+        "SELECT setval(pg_get_serial_sequence('law_documents', 'id'), COALESCE(MAX(id), 1)) FROM law_documents"
+    ))
+    connection.execute(text("ANALYZE law_documents"))
+    if split:
+        connection.execute(text("ANALYZE law_document_vectors"))
+
+    if maintenance_work_mem:
+        connection.execute(text("SELECT set_config('maintenance_work_mem', :value, true)"),
+                           {"value": maintenance_work_mem})
+    for index in indexes:
+        logger.info(f"Building index {index.indexname}...")
+        connection.execute(text(index.indexdef))
+    return imported
+
+
+def _import_rows(connection, batches) -> int:
+    """Load the batches with multi-row INSERTs, for databases without COPY (SQLite)."""
+    imported = 0
+    for batch in batches:
+        columns, embeddings = _batch_rows(batch)
+        connection.execute(insert(law_documents), [
+            {**{name: columns[name][i] for name in _COLUMNS}, "embedding": embedding}
+            for i, embedding in enumerate(embeddings)
+        ])
+        imported += batch.num_rows
+    return imported
+
+
+def import_snapshot(path: str, snapshot_format: str = None, batch_size: int = 10000, replace: bool = False,
+                    maintenance_work_mem: str = None) -> int:
+    """
+    Load a snapshot written by `export_snapshot` into law_documents, keeping the document IDs.
+
+    On PostgreSQL the rows are streamed with COPY and the ANN indexes are rebuilt once all rows
+    are loaded; everything runs in one transaction, so a failed import leaves the table as it was.
+    The in-process vector index of a running API does not see the imported rows until it is
+    rebuilt (restart the API, and delete a saved index at VECTOR_INDEX_PATH first).
+
+    Args:
+        path (str): The snapshot file.
+        snapshot_format (str): `parquet` or `arrow`, or None to choose from the extension.
+        batch_size (int): The number of rows read and sent per batch (default: 10000).
+        replace (bool): Delete the existing documents first; otherwise the table must be empty (default: False).
+        maintenance_work_mem (str): PostgreSQL memory for building the indexes, e.g. `2GB` (default: the server's).
+
+    Returns:
+        int: The number of imported rows.
+
+    Raises:
+        ValueError: If the table is not empty and `replace` is False, or the snapshot does not fit the table.
+    """
+    _require_pyarrow()
+    batches = _read_batches(path, _snapshot_format(path, snapshot_format), batch_size)
+    engine = get_engine(PRIMARY)
+    with engine.begin() as connection:
+        if replace:
+            if engine.dialect.name == "postgresql":
+                connection.execute(text("TRUNCATE law_documents CASCADE"))
+            else:
+                connection.execute(law_documents.__table__.delete())
+        elif connection.execute(select(func.count()).select_from(law_documents)).scalar():
+            raise ValueError("law_documents is not empty; import into a new database or replace the documents.")
+
+        if engine.dialect.name == "postgresql":
+            imported = _import_postgres(connection, batches, maintenance_work_mem)
+        else:
+            imported = _import_rows(connection, batches)
+
+    invalidate_result_cache()
+    return imported
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Export law_documents to, or import it from, a columnar snapshot.")
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("path", help="Snapshot file (.parquet, or .arrow/.feather/.ipc for Arrow IPC).")
+    parser.add_argument("--format", choices=(PARQUET, ARROW), help="Snapshot format (default: from the extension).")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Rows per batch (default: 10000).")
+    parser.add_argument("--replace", action="store_true", help="Import: delete the existing documents first.")
+    parser.add_argument("--maintenance-work-mem", help="Import: PostgreSQL memory for the index builds, e.g. 2GB.")
+    args = parser.parse_args()
+
+    start = time.time()
+    if args.command == "export":
+        count = export_snapshot(args.path, args.format, args.batch_size)
+    else:
+        from .models import init_db
+
+        init_db()
+        count = import_snapshot(args.path, args.format, args.batch_size, args.replace, args.maintenance_work_mem)
+    logger.info(f"{args.command.capitalize()}ed {count} documents in {time.time() - start:.1f} seconds.")
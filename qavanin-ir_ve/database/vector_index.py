@@ -0,0 +1,327 @@
+import json
+import logging
+import os
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Environment variables configuring the in-process index
+VECTOR_INDEX_ENV = "VECTOR_INDEX"
+VECTOR_INDEX_PATH_ENV = "VECTOR_INDEX_PATH"
+VECTOR_INDEX_REFRESH_ENV = "VECTOR_INDEX_REFRESH_SECONDS"
+VECTOR_INDEX_REFRESH_OVERLAP_ENV = "VECTOR_INDEX_REFRESH_OVERLAP_SECONDS"
+
+# Fraction of deleted rows after which the matrix is compacted
+_COMPACT_RATIO = 0.25
+
+
+class VectorIndex:
+    """
+    In-memory brute-force L2 index over the document embeddings.
+
+    The embeddings are kept in one contiguous float32 matrix and searched with a single
+    BLAS matrix-vector product. Searches only hold the lock long enough to grab the
+    current arrays, so appends and deletes never block readers for the duration of a search.
+    Rows a search may be reading are never rewritten: a new embedding of a document is appended
+    as a new row and its old row is tombstoned with an infinite norm, and compaction builds new
+    arrays. The database stays the source of truth; the index only maps a query to document ids.
+    """
+
+    def __init__(self, dim: int = 384):
+        """
+        Initialize an empty VectorIndex.
+
+        Args:
+            dim (int): The dimension of the embeddings (default: 384).
+        """
+        self.dim = dim
+        self.watermark = None
+        self._lock = threading.Lock()
+        self._matrix = np.empty((0, dim), dtype=np.float32)
+        self._norms = np.empty(0, dtype=np.float32)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._size = 0
+        self._deleted = 0
+        self._rows = {}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, document_id: int):
+        return document_id in self._rows
+
+    def ids(self) -> set:
+        """
+        Get the ids of all indexed documents.
+
+        Returns:
+            set: The indexed document ids.
+        """
+        with self._lock:
+            return set(self._rows)
+
+    def _ensure_capacity(self, needed: int):
+        capacity = self._matrix.shape[0]
+        writable = self._matrix.flags.writeable
+        if needed <= capacity and writable:
+            return
+        new_capacity = max(needed, capacity * 2, 1024) if needed > capacity else capacity
+        matrix = np.empty((new_capacity, self.dim), dtype=np.float32)
+        norms = np.empty(new_capacity, dtype=np.float32)
+        ids = np.empty(new_capacity, dtype=np.int64)
+        matrix[:self._size] = self._matrix[:self._size]
+        norms[:self._size] = self._norms[:self._size]
+        ids[:self._size] = self._ids[:self._size]
+        # Swap in new arrays instead of resizing so running searches keep a valid view
+        self._matrix, self._norms, self._ids = matrix, norms, ids
+
+    def add(self, document_id: int, embedding) -> bool:
+        """
+        Add a document to the index, or replace its embedding if it is already indexed.
+
+        Args:
+            document_id (int): The ID of the document.
+            embedding (List[float]): The embedding vector of the document.
+
+        Returns:
+            bool: False if the document was already indexed with this embedding, True otherwise.
+        """
+        vector = np.asarray(embedding, dtype=np.float32).reshape(self.dim)
+        with self._lock:
+            row = self._rows.get(document_id)
+            if row is not None:
+                if np.array_equal(self._matrix[row], vector):
+                    return False
+                self._tombstone(row)
+            self._ensure_capacity(self._size + 1)
+            row = self._size
+            self._ids[row] = document_id
+            self._matrix[row] = vector
+            self._norms[row] = vector @ vector
+            self._rows[document_id] = row
+            # Searches only see the row once the size covers it
+            self._size += 1
+            if self._deleted > _COMPACT_RATIO * self._size:
+                self._compact()
+            return True
+
+    def add_many(self, document_ids, embeddings):
+        """
+        Add or replace many documents at once.
+
+        Args:
+            document_ids (List[int]): The IDs of the documents.
+            embeddings (List[List[float]]): The embedding vectors, in the same order as the IDs.
+
+        Returns:
+            int: The number of documents added or whose embedding changed.
+        """
+        return sum(self.add(document_id, embedding) for document_id, embedding in zip(document_ids, embeddings))
+
+    def remove(self, document_id: int) -> bool:
+        """
+        Remove a document from the index.
+
+        Args:
+            document_id (int): The ID of the document to remove.
+
+        Returns:
+            bool: True if the document was indexed, False otherwise.
+        """
+        with self._lock:
+            row = self._rows.pop(document_id, None)
+            if row is None:
+                return False
+            self._tombstone(row)
+            if self._deleted > _COMPACT_RATIO * self._size:
+                self._compact()
+            return True
+
+    def _tombstone(self, row: int):
+        # An infinite norm keeps the row out of every top-k; the norms are never memory-mapped,
+        # and a search reading this one concurrently sees either the old norm or the tombstone
+        self._norms[row] = np.inf
+        self._deleted += 1
+
+    def _compact(self):
+        live = np.isfinite(self._norms[:self._size])
+        matrix = np.ascontiguousarray(self._matrix[:self._size][live])
+        norms = self._norms[:self._size][live].copy()
+        ids = self._ids[:self._size][live].copy()
+        self._matrix, self._norms, self._ids = matrix, norms, ids
+        self._size = len(ids)
+        self._deleted = 0
+        self._rows = {int(document_id): row for row, document_id in enumerate(ids)}
+
+    def _snapshot(self):
+        with self._lock:
+            size = self._size
+            return self._matrix[:size], self._norms[:size], self._ids[:size]
+
+    def search(self, query_embedding, limit: int) -> list[int]:
+        """
+        Find the ids of the documents closest to a query embedding.
+
+        Args:
+            query_embedding (List[float]): The embedding vector of the query.
+            limit (int): The maximum number of ids to return.
+
+        Returns:
+            List[int]: The document ids ordered by increasing L2 distance.
+        """
+        matrix, norms, ids = self._snapshot()
+        if len(ids) == 0 or limit <= 0:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(self.dim)
+        # ||x - q||^2 = ||x||^2 - 2 x.q + ||q||^2; the last term does not change the ranking
+        distances = norms - 2.0 * (matrix @ query)
+        return self._top_ids(distances, ids, limit)
+
+    def search_batch(self, query_embeddings, limit: int) -> list[list[int]]:
+        """
+        Find the closest document ids for several queries with one matrix product.
+
+        Args:
+            query_embeddings (List[List[float]]): The embedding vectors of the queries.
+            limit (int): The maximum number of ids to return per query.
+
+        Returns:
+            List[List[int]]: For each query, the document ids ordered by increasing L2 distance.
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.dim)
+        matrix, norms, ids = self._snapshot()
+        if len(ids) == 0 or limit <= 0:
+            return [[] for _ in range(len(queries))]
+        distances = norms[None, :] - 2.0 * (queries @ matrix.T)
+        return [self._top_ids(row, ids, limit) for row in distances]
+
+    @staticmethod
+    def _top_ids(distances: np.ndarray, ids: np.ndarray, limit: int) -> list[int]:
+        k = min(limit, len(ids))
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top], kind="stable")]
+        return [int(ids[i]) for i in top if np.isfinite(distances[i])]
+
+    def save(self, directory: str):
+        """
+        Save the index so other processes can memory-map it with `load`.
+
+        Args:
+            directory (str): The directory to write the index files to.
+        """
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            live = np.isfinite(self._norms[:self._size])
+            matrix = self._matrix[:self._size][live]
+            ids = self._ids[:self._size][live]
+            watermark = self.watermark
+        # Write to temporary files first so a concurrent reader never sees a partial index
+        for name, array in (("matrix.npy", matrix), ("ids.npy", ids)):
+            tmp_path = os.path.join(directory, f".{name}.tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp_path, os.path.join(directory, name))
+        tmp_path = os.path.join(directory, ".meta.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "watermark": watermark}, f)
+        os.replace(tmp_path, os.path.join(directory, "meta.json"))
+
+    @classmethod
+    def load(cls, directory: str) -> "VectorIndex":
+        """
+        Load an index saved with `save`, memory-mapping the embedding matrix read-only.
+
+        Worker processes loading the same files share the matrix through the page cache.
+        The matrix is copied into private memory on the first modification.
+
+        Args:
+            directory (str): The directory containing the index files.
+
+        Returns:
+            VectorIndex: The loaded index.
+        """
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        index = cls(dim=meta["dim"])
+        index.watermark = meta["watermark"]
+        index._matrix = np.load(os.path.join(directory, "matrix.npy"), mmap_mode="r")
+        index._ids = np.load(os.path.join(directory, "ids.npy"))
+        index._norms = np.einsum("ij,ij->i", index._matrix, index._matrix).astype(np.float32)
+        index._size = len(index._ids)
+        index._rows = {int(document_id): row for row, document_id in enumerate(index._ids)}
+        return index
+
+
+# The shared index, set once it has been built (see database.db_oprations.build_vector_index)
+_index = None
+
+
+def is_vector_index_enabled() -> bool:
+    """
+    Check whether the in-process vector index is enabled via the VECTOR_INDEX environment variable.
+
+    Returns:
+        bool: True if searches should be served from the in-process index.
+    """
+    kind = os.getenv(VECTOR_INDEX_ENV, "").strip().lower()
+    if kind and kind != "numpy":
+        logger.warning(f"Unknown vector index type '{kind}', the in-process index is disabled.")
+        return False
+    return kind == "numpy"
+
+
+def get_vector_index_path():
+    """
+    Return the directory the index is memory-mapped from and saved to, or None.
+
+    Returns:
+        str: The configured directory, or None.
+    """
+    return os.getenv(VECTOR_INDEX_PATH_ENV) or None
+
+
+def get_vector_index_refresh_seconds() -> float:
+    """
+    Return how often the index is resynchronized with the database (0 disables the refresh).
+
+    Returns:
+        float: The refresh interval in seconds.
+    """
+    return float(os.getenv(VECTOR_INDEX_REFRESH_ENV, "0") or 0)
+
+
+def get_vector_index_refresh_overlap() -> float:
+    """
+    Return how far before the index watermark a refresh looks for writes
+    (VECTOR_INDEX_REFRESH_OVERLAP_SECONDS, default 300).
+
+    A row's write time is taken when its transaction starts, so a transaction committing after a
+    refresh can add rows older than the watermark that refresh recorded. The overlap should exceed
+    the longest write transaction; rows reloaded with an unchanged embedding cost nothing else.
+
+    Returns:
+        float: The overlap in seconds.
+    """
+    return float(os.getenv(VECTOR_INDEX_REFRESH_OVERLAP_ENV, "300") or 0)
+
+
+def get_vector_index():
+    """
+    Return the shared in-process index, or None if it is disabled or not built yet.
+
+    Returns:
+        VectorIndex: The shared index, or None.
+    """
+    return _index
+
+
+def set_vector_index(index):
+    """
+    Install (or with None, remove) the shared in-process index.
+
+    Args:
+        index (VectorIndex): The index to serve searches from.
+    """
+    global _index
+    _index = index
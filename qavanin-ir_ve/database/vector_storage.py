@@ -0,0 +1,197 @@
+import argparse
+import logging
+import os
+from sqlalchemy import text, select
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from .models import LawDocument, LawDocumentVector
+
+logger = logging.getLogger(__name__)
+
+# Environment variable selecting where similarity search reads the embeddings from
+VECTOR_STORAGE_ENV = "VECTOR_STORAGE"
+
+# Store and search the embedding column of law_documents (the original layout)
+INLINE = "inline"
+# Store and search the embeddings in the narrow law_document_vectors table, as vector, after
+# `split_vector_storage` has moved them there; law_documents.embedding is then NULL
+SPLIT = "split"
+# Search the narrow law_document_vectors table after `convert_to_halfvec` has been run
+SPLIT_HALFVEC = "split_halfvec"
+
+_STORAGE_TYPES = {INLINE: "vector", SPLIT: "vector", SPLIT_HALFVEC: "halfvec"}
+
+
+def get_vector_storage() -> str:
+    """
+    Get the vector storage layout configured with VECTOR_STORAGE.
+
+    Unknown values are logged and treated as `inline`.
+
+    Returns:
+        str: `inline` (the default), `split` or `split_halfvec`.
+    """
+    storage = os.getenv(VECTOR_STORAGE_ENV, INLINE).strip().lower() or INLINE
+    if storage not in _STORAGE_TYPES:
+        logger.warning(f"Unknown {VECTOR_STORAGE_ENV} '{storage}', expected one of: {', '.join(_STORAGE_TYPES)}")
+        return INLINE
+    return storage
+
+
+def get_vector_source(storage: str = None) -> tuple:
+    """
+    Get the table, key column and SQL type that similarity search should read for a layout.
+
+    Args:
+        storage (str): The storage layout, or None for the configured one.
+
+    Returns:
+        tuple: The table name, the name of its document id column and the SQL type the query
+               embedding must be cast to.
+    """
+    storage = storage or get_vector_storage()
+    if storage == INLINE:
+        return "law_documents", "id", _STORAGE_TYPES[storage]
+    return "law_document_vectors", "document_id", _STORAGE_TYPES[storage]
+
+
+def uses_split_storage(bind) -> bool:
+    """
+    Tell whether the embeddings of a database live in law_document_vectors.
+
+    Only PostgreSQL has the split layouts; SQLite always stores the embeddings inline.
+
+    Args:
+        bind (Engine | Connection | Session): What the layout is checked for.
+
+    Returns:
+        bool: True for PostgreSQL with VECTOR_STORAGE `split` or `split_halfvec`.
+    """
+    if isinstance(bind, Session):
+        bind = bind.get_bind()
+    return bind.dialect.name == "postgresql" and get_vector_storage() != INLINE
+
+
+def select_embeddings(bind, *columns):
+    """
+    Build a SELECT of law_documents columns and the `embedding` of each document, from wherever the layout keeps it.
+
+    Args:
+        bind (Engine | Connection | Session): The database the statement runs on.
+        *columns: The columns of law_documents to select besides the embedding.
+
+    Returns:
+        Select: The statement, with the embedding as its last column.
+    """
+    if uses_split_storage(bind):
+        return select(*columns, LawDocumentVector.embedding).select_from(LawDocument).join(
+            LawDocumentVector, LawDocumentVector.document_id == LawDocument.id)
+    return select(*columns, LawDocument.embedding)
+
+
+def write_split_embeddings(session, embeddings: dict):
+    """
+    Insert or replace the embeddings of documents in law_document_vectors.
+
+    Args:
+        session (Session): The session of the write, whose transaction also wrote the documents.
+        embeddings (dict): The embedding of each document ID.
+    """
+    if not embeddings:
+        return
+    statement = pg_insert(LawDocumentVector).values(
+        [{"document_id": document_id, "embedding": embedding} for document_id, embedding in embeddings.items()])
+    session.execute(statement.on_conflict_do_update(
+        index_elements=[LawDocumentVector.document_id], set_={"embedding": statement.excluded.embedding}))
+
+
+def split_vector_storage(connection):
+    """
+    Moves the embeddings of law_documents into law_document_vectors, for VECTOR_STORAGE=split.
+
+    The embeddings are copied once and then set to NULL in law_documents, and the ANN indexes of
+    law_documents are dropped, so each embedding is stored and indexed once and writes only maintain
+    the HNSW index of the narrow table. Run it once per database, with every writer stopped, then set
+    VECTOR_STORAGE=split (or run `convert_to_halfvec` and set split_halfvec). Run VACUUM FULL (or
+    pg_repack) on law_documents afterwards to give the space back. The caller owns the transaction.
+
+    Args:
+        connection (Connection): An open SQLAlchemy connection inside a transaction.
+    """
+    logger.info("Moving the embeddings of law_documents to law_document_vectors...")
+    connection.execute(text(
+        "INSERT INTO law_document_vectors (document_id, embedding) "
+        "SELECT id, embedding FROM law_documents WHERE embedding IS NOT NULL "
+        "ON CONFLICT (document_id) DO UPDATE SET embedding = EXCLUDED.embedding"
+    ))
+    indexes = connection.execute(text(
+        "SELECT indexname FROM pg_indexes WHERE tablename = 'law_documents' "
+        "AND (indexdef LIKE '%USING hnsw%' OR indexdef LIKE '%USING ivfflat%')"
+    )).scalars().all()
+    for index in indexes:
+        connection.execute(text(f"DROP INDEX IF EXISTS {index}"))
+    connection.execute(text("UPDATE law_documents SET embedding = NULL WHERE embedding IS NOT NULL"))
+    logger.info(f"Embeddings moved; dropped {', '.join(indexes) or 'no'} indexes of law_documents.")
+
+
+def has_inline_vector_index(connection) -> bool:
+    """
+    Tell whether law_documents still has an ANN index, i.e. `split_vector_storage` has not been run.
+
+    Args:
+        connection (Connection): An open SQLAlchemy connection.
+
+    Returns:
+        bool: True if law_documents has an HNSW or IVFFlat index.
+    """
+    return bool(connection.execute(text(
+        "SELECT 1 FROM pg_indexes WHERE tablename = 'law_documents' "
+        "AND (indexdef LIKE '%USING hnsw%' OR indexdef LIKE '%USING ivfflat%') LIMIT 1"
+    )).scalar())
+
+
+def convert_to_halfvec(connection, dim: int = 384):
+    """
+    Converts the embeddings of law_document_vectors to half precision and rebuilds their index.
+
+    halfvec needs pgvector 0.7 or later and halves the size of the table and of the HNSW index.
+    Run it once per database, then set VECTOR_STORAGE=split_halfvec. The caller owns the transaction.
+
+    Args:
+        connection (Connection): An open SQLAlchemy connection inside a transaction.
+        dim (int): The dimension of the embeddings (default: 384).
+    """
+    column_type = connection.execute(text(
+        "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+        "WHERE attrelid = 'law_document_vectors'::regclass AND attname = 'embedding'"
+    )).scalar()
+    if column_type and column_type.startswith("halfvec"):
+        logger.info("law_document_vectors already stores halfvec embeddings.")
+        return
+    logger.info("Converting law_document_vectors to halfvec...")
+    connection.execute(text("DROP INDEX IF EXISTS idx_law_document_vectors_embedding"))
+    connection.execute(text(
+        f"ALTER TABLE law_document_vectors ALTER COLUMN embedding TYPE halfvec({dim}) "
+        f"USING embedding::halfvec({dim})"
+    ))
+    connection.execute(text(
+        "CREATE INDEX idx_law_document_vectors_embedding ON law_document_vectors "
+        "USING hnsw (embedding halfvec_l2_ops)"
+    ))
+    logger.info("law_document_vectors now stores halfvec embeddings.")
+
+
+if __name__ == "__main__":
+    from .models import get_engine
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Manage the split vector storage of law_documents.")
+    parser.add_argument("--split", action="store_true", help="Move the embeddings to law_document_vectors.")
+    parser.add_argument("--halfvec", action="store_true", help="Store the split embeddings as halfvec.")
+    args = parser.parse_args()
+    if args.split:
+        with get_engine().begin() as connection:
+            split_vector_storage(connection)
+    if args.halfvec:
+        with get_engine().begin() as connection:
+            convert_to_halfvec(connection)
@@ -0,0 +1,96 @@
+import numpy as np
+from pgvector import Vector
+from pgvector.sqlalchemy import VECTOR
+
+# Nine significant digits round-trip every float32 exactly
+_FLOAT32_FORMAT = "%.9g"
+
+
+def to_float32_vector(embedding, dim: int = None) -> np.ndarray:
+    """
+    Return an embedding as a contiguous float32 array, validating it as a whole.
+
+    Arrays that already are contiguous float32 are returned as is, without a copy.
+
+    Args:
+        embedding (np.ndarray | List[float]): The embedding vector.
+        dim (int): The expected dimension, or None to accept any.
+
+    Returns:
+        np.ndarray: The embedding as a 1-dimensional float32 array.
+
+    Raises:
+        ValueError: If the embedding is not 1-dimensional, has the wrong dimension or is not finite.
+    """
+    try:
+        vector = np.ascontiguousarray(embedding, dtype=np.float32)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Embedding must be a sequence of floats: {e}") from e
+    if vector.ndim != 1 or (dim is not None and vector.shape[0] != dim):
+        raise ValueError(f"Embedding must be a 1-dimensional vector of {dim or 'any number of'} floats, "
+                         f"got shape {vector.shape}.")
+    if not np.isfinite(vector).all():
+        raise ValueError("Embedding must only contain finite floats.")
+    return vector
+
+
+def format_vector(vector: np.ndarray) -> str:
+    """
+    Format a float32 vector in pgvector's text format.
+
+    This still goes through one list of Python floats (`tolist`), but formats it with a single
+    %-format call instead of one `str()` per element, about 3x faster than pgvector's adapter.
+    There is no text format that NumPy writes without Python floats; avoiding them takes the
+    binary protocol, which psycopg2 does not support.
+
+    Args:
+        vector (np.ndarray): The vector to format.
+
+    Returns:
+        str: The vector as `[x1,x2,...]`.
+    """
+    return "[" + ",".join([_FLOAT32_FORMAT] * len(vector)) % tuple(vector.tolist()) + "]"
+
+
+def parse_vector(value: str) -> np.ndarray:
+    """
+    Parse pgvector's text format straight into a float32 array, without a list of Python floats.
+
+    Args:
+        value (str): The vector as `[x1,x2,...]`.
+
+    Returns:
+        np.ndarray: The vector as a float32 array.
+    """
+    return np.fromstring(value[1:-1], sep=",", dtype=np.float32)
+
+
+class Float32Vector(VECTOR):
+    """
+    pgvector column type that binds and returns embeddings as float32 NumPy arrays.
+
+    The pgvector type converts every embedding through an array of Python floats in both
+    directions. psycopg2 only sends parameters as text, so the text format is kept: results
+    are parsed by NumPy without Python floats, and bound vectors are formatted with one
+    %-format call (see `format_vector`). Lists are still accepted when binding.
+    """
+
+    cache_ok = True
+
+    def bind_processor(self, dialect):
+        def process(value):
+            if value is None or isinstance(value, str):
+                return value
+            if isinstance(value, Vector):
+                return value.to_text()
+            return format_vector(to_float32_vector(value, self.dim))
+        return process
+
+    def result_processor(self, dialect, coltype):
+        def process(value):
+            if value is None:
+                return None
+            if isinstance(value, Vector):
+                return value.to_numpy()
+            return parse_vector(value)
+        return process
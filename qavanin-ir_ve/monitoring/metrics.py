@@ -0,0 +1,175 @@
+import logging
+import os
+import time
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger(__name__)
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, REGISTRY, generate_latest
+except ImportError:  # prometheus_client is optional; without it the metrics are not recorded
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+    Counter = Gauge = Histogram = REGISTRY = generate_latest = None
+
+try:
+    from opentelemetry import trace
+except ImportError:  # OpenTelemetry is optional; without it no spans are emitted
+    trace = None
+
+# Latency buckets in seconds, from cache hits to multi-second re-embeddings of long laws
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class _NoOpMetric:
+    """Stand-in for a prometheus_client metric when the package is not installed."""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+
+def _metric(metric_class, *args, **kwargs):
+    if metric_class is None:
+        return _NoOpMetric()
+    return metric_class(*args, **kwargs)
+
+
+REQUEST_LATENCY = _metric(
+    Histogram, "qavanin_request_duration_seconds", "Time spent handling HTTP requests.",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_PROGRESS = _metric(
+    Gauge, "qavanin_requests_in_progress", "HTTP requests currently being handled.", ["method"],
+    multiprocess_mode="livesum",
+)
+STAGE_LATENCY = _metric(
+    Histogram, "qavanin_stage_duration_seconds",
+    "Time spent in each stage of a request (embedding, ANN query, count query, serialization, ...).",
+    ["stage"], buckets=LATENCY_BUCKETS,
+)
+STAGE_ERRORS = _metric(Counter, "qavanin_stage_errors_total", "Stages that raised an exception.", ["stage"])
+EMBEDDING_BATCH_SIZE = _metric(
+    Histogram, "qavanin_embedding_batch_size", "Number of texts encoded per model call.",
+    buckets=BATCH_SIZE_BUCKETS,
+)
+RERANK_SKIPPED = _metric(
+    Counter, "qavanin_rerank_skipped_total",
+    "Re-ranked searches answered in ANN order, by reason (disabled, budget, busy, error).", ["reason"],
+)
+ADMISSION_REJECTED = _metric(
+    Counter, "qavanin_admission_rejected_total",
+    "Calls shed by a workload pool, by workload and reason (queue_full, queue_timeout).", ["workload", "reason"],
+)
+WORKLOAD_THREADS = _metric(
+    Gauge, "qavanin_workload_threads", "Worker threads of each workload pool by state.", ["workload", "state"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CONNECTIONS = _metric(
+    Gauge, "qavanin_db_pool_connections", "Database connections of each pool (primary, replica, ingest) by state.",
+    ["pool", "state"],
+    multiprocess_mode="livesum",
+)
+THREADPOOL_TOKENS = _metric(
+    Gauge, "qavanin_threadpool_tokens", "Worker threads of the request threadpool by state.", ["state"],
+    multiprocess_mode="livesum",
+)
+
+
+def is_metrics_enabled() -> bool:
+    """
+    Check whether metrics are recorded, that is whether prometheus_client is installed.
+
+    Returns:
+        bool: True if prometheus_client is installed.
+    """
+    return Histogram is not None
+
+
+@contextmanager
+def track_stage(stage: str):
+    """
+    Record the duration of a stage of request handling, and wrap it in a span when OpenTelemetry is installed.
+
+    Args:
+        stage (str): The name of the stage, e.g. `embed` or `ann_query`.
+    """
+    span = trace.get_tracer(__name__).start_as_current_span(stage) if trace is not None else nullcontext()
+    start = time.perf_counter()
+    with span:
+        try:
+            yield
+        except Exception:
+            STAGE_ERRORS.labels(stage).inc()
+            raise
+        finally:
+            STAGE_LATENCY.labels(stage).observe(time.perf_counter() - start)
+
+
+def observe_batch_size(size: int):
+    """
+    Record the number of texts encoded by one model call.
+
+    Args:
+        size (int): The number of texts.
+    """
+    EMBEDDING_BATCH_SIZE.observe(size)
+
+
+def update_pool_metrics(engine, name: str = "primary"):
+    """
+    Record the connection usage of an engine's pool.
+
+    Args:
+        engine (Engine): The SQLAlchemy engine, or None if it is not created yet.
+        name (str): The name of the pool, e.g. `primary` or `replica-0` (default: `primary`).
+    """
+    pool = getattr(engine, "pool", None)
+    if pool is None or not hasattr(pool, "checkedout"):
+        return
+    DB_POOL_CONNECTIONS.labels(name, "checked_out").set(pool.checkedout())
+    DB_POOL_CONNECTIONS.labels(name, "idle").set(pool.checkedin())
+    DB_POOL_CONNECTIONS.labels(name, "overflow").set(max(0, pool.overflow()))
+    DB_POOL_CONNECTIONS.labels(name, "size").set(pool.size())
+
+
+def update_threadpool_metrics(limiter):
+    """
+    Record how many threads of the request threadpool are busy.
+
+    Args:
+        limiter (CapacityLimiter): The anyio limiter bounding `run_in_threadpool`.
+    """
+    THREADPOOL_TOKENS.labels("borrowed").set(limiter.borrowed_tokens)
+    THREADPOOL_TOKENS.labels("total").set(limiter.total_tokens)
+    THREADPOOL_TOKENS.labels("waiting").set(limiter.statistics().tasks_waiting)
+
+
+def render_metrics() -> bytes:
+    """
+    Render the recorded metrics in the Prometheus text format.
+
+    With PROMETHEUS_MULTIPROC_DIR set, the metrics of all API workers are merged.
+
+    Returns:
+        bytes: The metrics, or an empty payload if prometheus_client is not installed.
+    """
+    if generate_latest is None:
+        return b""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import CollectorRegistry, multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
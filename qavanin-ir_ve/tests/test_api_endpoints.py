@@ -0,0 +1,563 @@
+import os
+import subprocess
+import sys
+import threading
+import pytest
+from fastapi.testclient import TestClient
+from api.main import app
+from api.router import endpoints
+from database.result_cache import ResultCache
+from api.jobs import JobQueue, MemoryJobStore
+from data_processing import reranker
+from api import warmup
+
+
+@pytest.fixture(scope="function")
+def client():
+    """Create a test client without running the lifespan (no model, no database)."""
+    app.state.ready = False
+    return TestClient(app)
+
+
+def test_import_does_not_load_model():
+    """Importing the API must not load torch or the SentenceTransformer model."""
+    # In a fresh interpreter, so modules imported by other tests do not count
+    result = subprocess.run(
+        [sys.executable, "-c", "import sys, api.main; "
+                               "print(sorted({'sentence_transformers', 'torch'} & set(sys.modules)))"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
+
+
+def test_startup_errors_are_raised(monkeypatch):
+    """A failed startup stops the server instead of leaving a worker that never becomes ready."""
+    from api import main
+
+    def fail():
+        raise RuntimeError("model not found")
+
+    monkeypatch.setattr(main, "get_engine", lambda: None)
+    monkeypatch.setattr(main, "load_model", fail)
+    with pytest.raises(RuntimeError, match="model not found"):
+        with TestClient(app):
+            pass
+    assert app.state.ready is False
+
+
+def test_ready_before_startup(client):
+    """The readiness probe reports 503 until the lifespan has loaded everything."""
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json() == {"ready": False}
+
+
+def test_ready_after_startup(client):
+    """The readiness probe reports 200 once the service is marked ready."""
+    app.state.ready = True
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json() == {"ready": True}
+
+
+def test_metrics_record_routes_and_stages(client, monkeypatch):
+    """Requests are labelled with their route template and the search stages are timed."""
+    pytest.importorskip("prometheus_client")
+    monkeypatch.setattr(endpoints, "get_result_cache", lambda: None)
+    monkeypatch.setattr(endpoints, "generate_embeddings", lambda text: [0.0])
+    monkeypatch.setattr(endpoints, "get_closest_document",
+                        lambda embedding, limit, offset, include_content, filters=None: [
+                            {"id": 7, "content": "tax law"}])
+    monkeypatch.setattr(endpoints, "get_document_count", lambda: 1)
+    client.post("/api/get_closest_match?limit=1&fields=id,snippet", json={"text": "tax"})
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert 'route="/api/get_closest_match"' in response.text
+    assert 'qavanin_stage_duration_seconds_count{stage="snippet"}' in response.text
+    assert 'qavanin_stage_duration_seconds_count{stage="serialize"}' in response.text
+
+
+def test_get_closest_matches_batches_queries(client, monkeypatch):
+    """The batch endpoint embeds all texts at once and returns results per text."""
+    calls = []
+
+    def fake_embeddings_batch(texts):
+        calls.append(list(texts))
+        return [[float(i)] for i in range(len(texts))]
+
+    def fake_closest_batch(embeddings, limit):
+        return [[{"id": int(embedding[0]), "content": "doc"}] for embedding in embeddings]
+
+    monkeypatch.setattr(endpoints, "generate_embeddings_batch", fake_embeddings_batch)
+    monkeypatch.setattr(endpoints, "get_closest_documents_batch", fake_closest_batch)
+    monkeypatch.setattr(endpoints, "get_document_count", lambda: 10)
+
+    response = client.post("/api/get_closest_matches?limit=1", json={"texts": ["first", "second"]})
+    assert response.status_code == 200
+    body = response.json()
+    assert calls == [["first", "second"]]
+    assert [result["text"] for result in body["results"]] == ["first", "second"]
+    assert [result["closest_documents"][0]["id"] for result in body["results"]] == [0, 1]
+    assert body["total_documents"] == 10
+
+
+def test_get_closest_matches_rejects_empty_batch(client):
+    """An empty batch is a client error."""
+    response = client.post("/api/get_closest_matches?limit=1", json={"texts": []})
+    assert response.status_code == 400
+
+
+def test_get_closest_match_served_from_cache(client, monkeypatch):
+    """A repeated search is answered from the result cache without embedding again."""
+    cache = ResultCache()
+    calls = []
+
+    def fake_embeddings(text):
+        calls.append(text)
+        return [0.0]
+
+    monkeypatch.setattr(endpoints, "get_result_cache", lambda: cache)
+    monkeypatch.setattr(endpoints, "generate_embeddings", fake_embeddings)
+    monkeypatch.setattr(endpoints, "get_closest_document",
+                        lambda embedding, limit, offset, include_content, filters=None: [{"id": 1, "content": "doc"}])
+    monkeypatch.setattr(endpoints, "get_document_count", lambda: 1)
+
+    first = client.post("/api/get_closest_match?limit=1", json={"text": "query"})
+    second = client.post("/api/get_closest_match?limit=1", json={"text": " query "})
+    assert first.json() == second.json()
+    assert calls == ["query"]
+
+    cache.bump_generation()
+    client.post("/api/get_closest_match?limit=1", json={"text": "query"})
+    assert len(calls) == 2
+
+
+def test_get_closest_match_snippets_and_pagination(client, monkeypatch):
+    """Snippet mode drops the full content and a full page returns a cursor to the next one."""
+    documents = [{"id": i, "content": "intro " * 100 + f"tax law {i} " + "outro " * 100} for i in range(4)]
+    offsets = []
+
+    def fake_closest(embedding, limit, offset, include_content, filters=None):
+        offsets.append(offset)
+        return documents[offset:offset + limit]
+
+    monkeypatch.setattr(endpoints, "get_result_cache", lambda: None)
+    monkeypatch.setattr(endpoints, "generate_embeddings", lambda text: [0.0])
+    monkeypatch.setattr(endpoints, "get_closest_document", fake_closest)
+    monkeypatch.setattr(endpoints, "get_document_count", lambda: 4)
+
+    response = client.post("/api/get_closest_match?limit=3&fields=id,snippet&snippet_width=40",
+                           json={"text": "tax"})
+    body = response.json()
+    assert response.status_code == 200
+    assert [doc["id"] for doc in body["closest_documents"]] == [0, 1, 2]
+    assert "content" not in body["closest_documents"][0]
+    assert "tax" in body["closest_documents"][0]["snippet"]["text"]
+    assert body["next_cursor"] is not None
+
+    next_cursor = body["next_cursor"]
+    response = client.post(f"/api/get_closest_match?limit=3&fields=id&cursor={next_cursor}", json={"text": " tax "})
+    body = response.json()
+    assert offsets == [0, 3]
+    assert body["closest_documents"] == [{"id": 3}]
+    assert body["next_cursor"] is None
+
+    # A cursor only pages through the search it came from, and not too deep
+    response = client.post(f"/api/get_closest_match?limit=3&fields=id&cursor={next_cursor}", json={"text": "customs"})
+    assert response.status_code == 400
+    cursor = endpoints._encode_cursor(endpoints.MAX_SEARCH_OFFSET + 1, endpoints._search_key("tax", {}, False))
+    response = client.post(f"/api/get_closest_match?limit=3&fields=id&cursor={cursor}", json={"text": "tax"})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("snippet_width", [0, -5, 2001])
+def test_get_closest_match_rejects_snippet_widths_out_of_range(client, snippet_width):
+    """A snippet is between 1 and MAX_SNIPPET_WIDTH characters long."""
+    response = client.post(f"/api/get_closest_match?limit=1&fields=snippet&snippet_width={snippet_width}",
+                           json={"text": "tax"})
+    assert response.status_code == 400
+
+
+def test_get_closest_match_clips_query_terms_longer_than_the_snippet(client, monkeypatch):
+    """A matched term wider than the snippet comes back clipped to the snippet width."""
+    term = "customs" * 10
+    monkeypatch.setattr(endpoints, "get_result_cache", lambda: None)
+    monkeypatch.setattr(endpoints, "generate_embeddings", lambda text: [0.0])
+    monkeypatch.setattr(endpoints, "get_closest_document",
+                        lambda embedding, limit, offset, include_content, filters=None: [
+                            {"id": 1, "content": f"law {term} duties {term}"}])
+    monkeypatch.setattr(endpoints, "get_document_count", lambda: 1)
+
+    response = client.post("/api/get_closest_match?limit=1&fields=snippet&snippet_width=20", json={"text": term})
+    assert response.status_code == 200
+    snippet = response.json()["closest_documents"][0]["snippet"]
+    assert 0 < len(snippet["text"]) <= 20 and "customs" in snippet["text"]
+
+
+def test_get_closest_match_rejects_unknown_fields(client):
+    """Asking for a field that does not exist is a client error."""
+    response = client.post("/api/get_closest_match?limit=3&fields=embedding", json={"text": "tax"})
+    assert response.status_code == 400
+
+
+def test_stream_document_content(client, monkeypatch):
+    """The full content of a document is streamed as Markdown."""
+    content = "# Title\nbody"
+    reads = []
+    monkeypatch.setattr(endpoints, "get_document_length", lambda document_id: len(content))
+    monkeypatch.setattr(endpoints, "get_document_chunk",
+                        lambda document_id, start, size: reads.append(start) or content[start - 1:start - 1 + size])
+    monkeypatch.setattr(endpoints, "CONTENT_CHUNK_CHARS", 5)
+
+    response = client.get("/api/get_document/1/content")
+    assert response.status_code == 200
+    assert response.text == "# Title\nbody"
+    assert reads == [1, 6, 11]
+    assert response.headers["content-type"].startswith("text/markdown")
+
+
+def test_stream_document_content_not_found(client, monkeypatch):
+    """Streaming a missing document returns 404."""
+    monkeypatch.setattr(endpoints, "get_document_length", lambda document_id: None)
+    assert client.get("/api/get_document/1/content").status_code == 404
+
+
+def test_upsert_documents_endpoint(client, monkeypatch):
+    """The bulk upsert embeds all documents at once and reports inserts and updates."""
+    written = []
+
+    def fake_upsert(documents):
+        written.extend(documents)
+        return [{"id": i, "source_id": doc["source_id"], "inserted": i == 0} for i, doc in enumerate(documents)]
+
+    embedded = []
+    monkeypatch.setattr(endpoints, "generate_embeddings_batch",
+                        lambda texts: embedded.extend(texts) or [[0.0]] * len(texts))
+    monkeypatch.setattr(endpoints, "upsert_documents", fake_upsert)
+    # Law 300 is already stored with the same text under another law ID
+    stored = endpoints.convert_to_markdown("Law 300 text")
+    monkeypatch.setattr(endpoints, "get_source_ids_by_content_hash",
+                        lambda hashes: {h: ["900"] for h in hashes if h == endpoints.content_hash(stored)})
+    monkeypatch.setattr(endpoints, "get_embeddings_by_content_hash", lambda hashes: {h: [1.0] for h in hashes})
+
+    response = client.post("/api/upsert_documents", json={"documents": [
+        {"source_id": "100", "text": "Law 100"},
+        {"source_id": "200", "text": "Law 200"},
+        {"source_id": "100", "text": "Law 100 again"},
+        {"source_id": "300", "text": "Law 300 text"},
+    ]})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["inserted"], body["updated"]) == (1, 2)
+    assert [doc["source_id"] for doc in written] == ["100", "200", "300"]
+    assert embedded == ["Law 100", "Law 200"]
+    assert written[2]["embedding"] == [1.0]
+    assert [(doc["source_id"], doc["reason"], doc["duplicate_of"]) for doc in body["skipped"]] == [
+        ("100", "source_id", "100")]
+
+
+def test_update_document_async_mode(client, monkeypatch):
+    """In async mode the content is stored at once and the re-embedding runs as a background job."""
+    queue = JobQueue(max_workers=1, store=MemoryJobStore())
+    written = {}
+    stored_hash = {7: endpoints.content_hash("new text"), 8: "hash of a later synchronous update"}
+
+    def fake_update(document_id, content, embedding, expected_content_hash=None):
+        if stored_hash[document_id] != expected_content_hash:
+            return None
+        written[document_id] = embedding
+        return {"content": content}
+
+    monkeypatch.setattr(endpoints, "get_job_queue", lambda: queue)
+    monkeypatch.setattr(endpoints, "update_document_content",
+                        lambda document_id, text: {"content": text, "updated_at": "2024-01-01T00:00:00"})
+    monkeypatch.setattr(endpoints, "generate_embeddings", lambda text: [0.5])
+    monkeypatch.setattr(endpoints, "update_document", fake_update)
+    monkeypatch.setattr(endpoints, "get_document_by_id", lambda document_id: {"id": document_id})
+
+    response = client.put("/api/update_document/7?async_mode=true", json={"text": "new text"})
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    # The document is written again before this job stores its result
+    stale_job_id = client.put("/api/update_document/8?async_mode=true", json={"text": "new text"}).json()["job_id"]
+
+    queue.shutdown(wait=True)
+    assert written == {7: [0.5]}
+    status_response = client.get(f"/api/jobs/{job_id}")
+    assert status_response.json()["status"] == "succeeded"
+    assert client.get(f"/api/jobs/{stale_job_id}").json()["status"] == "superseded"
+    assert client.get("/api/jobs/unknown").status_code == 404
+
+
+def test_job_queue_skips_superseded_jobs():
+    """A queued job is skipped when a newer job for the same document was submitted."""
+    queue = JobQueue(max_workers=1, store=MemoryJobStore())
+    release = threading.Event()
+    ran = []
+
+    blocker = queue.submit(1, release.wait)
+    older = queue.submit(2, ran.append, "older")
+    newer = queue.submit(2, ran.append, "newer")
+    release.set()
+    queue.shutdown(wait=True)
+
+    assert ran == ["newer"]
+    assert queue.get(blocker)["status"] == "succeeded"
+    assert queue.get(older)["status"] == "superseded"
+    assert queue.get(newer)["status"] == "succeeded"
+
+
+def test_get_closest_match_reranks_candidates_within_budget(client, monkeypatch):
+    """Re-ranking re-orders the ANN candidates, and is skipped when the budget is used up."""
+    monkeypatch.setattr(endpoints, "get_result_cache", lambda: None)
+    monkeypatch.setattr(endpoints, "generate_embeddings", lambda text: [0.0])
+    monkeypatch.setattr(endpoints, "get_document_count", lambda: 3)
+    fetched = []
+
+    def fake_closest(embedding, limit, offset, include_content, filters=None):
+        fetched.append((limit, offset, include_content))
+        return [{"id": i, "content": f"law {i}"} for i in (1, 2, 3)][:limit]
+
+    monkeypatch.setattr(endpoints, "get_closest_document", fake_closest)
+    monkeypatch.setattr(reranker, "_model", object())
+    monkeypatch.setattr(reranker, "_seconds_per_pair", None)
+    # The cross-encoder prefers the law the bi-encoder ranked last
+    monkeypatch.setattr(reranker, "score_pairs", lambda query, passages: [float(p[-1]) for p in passages])
+    monkeypatch.setenv("RERANK_CANDIDATES", "3")
+
+    response = client.post("/api/get_closest_match?limit=2&fields=id&rerank=true", json={"text": "tax"})
+    assert response.status_code == 200
+    assert response.json()["reranked"] is True
+    assert [doc["id"] for doc in response.json()["closest_documents"]] == [3, 2]
+    assert fetched == [(3, 0, True)]
+
+    response = client.post("/api/get_closest_match?limit=2&fields=id&rerank=true&rerank_budget_ms=0",
+                           json={"text": "tax"})
+    assert response.json()["reranked"] is False
+    assert [doc["id"] for doc in response.json()["closest_documents"]] == [1, 2]
+
+    # Another request holding the model skips re-ranking instead of waiting for it
+    with reranker._score_lock:
+        response = client.post("/api/get_closest_match?limit=2&fields=id&rerank=true", json={"text": "tax"})
+    assert response.json()["reranked"] is False
+
+    # Pages stop at the re-ranked candidates, and cannot start beyond them
+    response = client.post(f"/api/get_closest_match?limit=2&fields=id&rerank=true"
+                           f"&cursor={response.json()['next_cursor']}", json={"text": "tax"})
+    assert [doc["id"] for doc in response.json()["closest_documents"]] == [1]
+    assert response.json()["next_cursor"] is None
+    cursor = endpoints._encode_cursor(3, endpoints._search_key("tax", {}, True))
+    response = client.post(f"/api/get_closest_match?limit=2&fields=id&rerank=true&cursor={cursor}",
+                           json={"text": "tax"})
+    assert response.status_code == 400
+
+
+def test_rerank_falls_back_to_ann_order_on_errors(monkeypatch):
+    """A query term longer than a passage is scored, and a scoring failure keeps the ANN order."""
+    import time
+    token = "x" * (reranker.PASSAGE_WIDTH + 200)
+    documents = [{"id": 1, "content": f"law {token}"}, {"id": 2, "content": f"{token} {token}"}]
+    monkeypatch.setattr(reranker, "_model", object())
+    monkeypatch.setattr(reranker, "_seconds_per_pair", None)
+    monkeypatch.setattr(reranker, "score_pairs", lambda query, passages: [float("law" not in p) for p in passages])
+    reranked, done = reranker.rerank(token, documents, time.monotonic() + 60)
+    assert done is True and [doc["id"] for doc in reranked] == [2, 1]
+
+    def fail(query, passages):
+        raise RuntimeError("out of memory")
+
+    monkeypatch.setattr(reranker, "score_pairs", fail)
+    assert reranker.rerank(token, documents, time.monotonic() + 60) == (documents, False)
+    assert not reranker._score_lock.locked()
+
+
+def test_workload_pool_sheds_when_queue_is_full():
+    """A full queue is rejected with 429 and a call that waits too long with 503, both with Retry-After."""
+    import anyio
+    from api.admission import WorkloadPool, Overloaded
+
+    pool = WorkloadPool("embed", workers=1, max_queue=1, queue_timeout=0.2)
+    release = threading.Event()
+    errors = []
+
+    async def call():
+        try:
+            await pool.run(release.wait, 5)
+        except Overloaded as e:
+            errors.append((e.status_code, e.headers["Retry-After"]))
+
+    async def main():
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(call)  # runs
+            await anyio.sleep(0.05)
+            tg.start_soon(call)  # queued, then times out
+            await anyio.sleep(0.05)
+            await call()  # queue full
+            await anyio.sleep(0.3)
+            release.set()
+
+    anyio.run(main)
+    assert errors == [(429, "2"), (503, "1")]
+
+
+def test_search_limit_is_bounded_and_overload_is_passed_through(client, monkeypatch):
+    """Out-of-range limits are rejected, and a shed call answers 429 with Retry-After instead of 500."""
+    from api.admission import Overloaded
+
+    monkeypatch.setattr(endpoints, "get_result_cache", lambda: None)
+    assert client.post(f"/api/get_closest_match?limit={endpoints.MAX_SEARCH_LIMIT + 1}",
+                       json={"text": "tax"}).status_code == 400
+    assert client.post("/api/get_closest_matches?limit=0", json={"texts": ["tax"]}).status_code == 400
+
+    def overloaded(text):
+        raise Overloaded("embed", 429, 3)
+
+    monkeypatch.setattr(endpoints, "generate_embeddings", overloaded)
+    response = client.post("/api/get_closest_match?limit=1", json={"text": "tax"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3"
+
+
+def test_search_filters_are_validated_and_passed_to_the_search(client, monkeypatch):
+    """Metadata filters are normalized, reach the database search and are part of the cache key."""
+    seen = []
+    monkeypatch.setattr(endpoints, "get_result_cache", lambda: None)
+    monkeypatch.setattr(endpoints, "generate_embeddings", lambda text: [0.0])
+    monkeypatch.setattr(endpoints, "get_document_count", lambda: 1)
+    monkeypatch.setattr(endpoints, "get_closest_document",
+                        lambda embedding, limit, offset, include_content, filters=None: seen.append(filters) or [
+                            {"id": 1, "content": "doc"}])
+
+    response = client.post("/api/get_closest_match?limit=1&law_type=Regulation&approved_from=۱۴۰۰/۱/۱",
+                           json={"text": "tax"})
+    assert response.status_code == 200
+    assert seen == [{"law_type": "regulation", "approved_from": "1400/01/01"}]
+
+    assert client.post("/api/get_closest_match?limit=1&law_type=decree", json={"text": "tax"}).status_code == 400
+    assert client.post("/api/get_closest_match?limit=1&approved_from=1401/01/01&approved_to=1400/01/01",
+                       json={"text": "tax"}).status_code == 400
+
+
+def test_popular_queries_are_recorded_saved_and_replayed(client, monkeypatch, tmp_path):
+    """Unfiltered searches are counted, merged into the saved queries and replayed within the deadline."""
+    path = str(tmp_path / "queries.json")
+    recorder = warmup.QueryRecorder()
+    monkeypatch.setattr(warmup, "_recorder", recorder)
+    monkeypatch.setattr(endpoints, "get_result_cache", lambda: None)
+    monkeypatch.setattr(endpoints, "generate_embeddings", lambda text: [0.0])
+    monkeypatch.setattr(endpoints, "get_document_count", lambda: 1)
+    monkeypatch.setattr(endpoints, "get_closest_document",
+                        lambda embedding, limit, offset, include_content, filters=None: [{"id": 1, "content": "doc"}])
+    for text in ("tax", " tax ", "customs"):
+        assert client.post("/api/get_closest_match?limit=1", json={"text": text}).status_code == 200
+    assert client.post("/api/get_closest_match?limit=1&law_type=law", json={"text": "customs"}).status_code == 200
+    assert recorder.top(2) == ["tax", "customs"]
+
+    with open(path, "w", encoding="utf-8") as file:
+        file.write('{"queries": [{"text": "customs", "count": 6}]}')
+    recorder.save(path)
+    assert warmup.load_saved_queries(path) == {"customs": 7, "tax": 2}
+    assert recorder.top(10) == []
+    # Saving with nothing recorded leaves the counts alone; they only decay once per start
+    recorder.save(path)
+    assert warmup.load_saved_queries(path) == {"customs": 7, "tax": 2}
+    assert warmup.decay_saved_queries(path) == 2
+    assert warmup.load_saved_queries(path) == {"customs": 3.5, "tax": 1.0}
+
+    replayed = []
+    monkeypatch.setattr(warmup, "generate_embeddings", lambda text: text)
+    monkeypatch.setattr(warmup, "get_closest_document", lambda embedding, limit: replayed.append(embedding))
+    monkeypatch.setattr(warmup, "prewarm_database", lambda: {})
+    monkeypatch.setenv("WARMUP_QUERIES_PATH", path)
+    monkeypatch.setenv("WARMUP_QUERIES", "1")
+    warmup.warm_up()
+    assert replayed == ["customs"]
+    assert warmup.replay_queries(["tax"], deadline=0) == 0
+
+
+def test_embedding_sidecar_round_trip(tmp_path):
+    """The sidecar framing round-trips float32 rows, batches concurrent requests and refuses oversized frames."""
+    import asyncio
+    import socket
+    import time
+    import numpy as np
+    from data_processing.embedding_server import EmbeddingClient, EmbeddingServiceError, start_server
+
+    class FakeModel:
+        def __init__(self):
+            self.calls = []
+
+        def encode(self, sentences):
+            self.calls.append(list(sentences))
+            time.sleep(0.5 if "slow" in sentences else 0.05)
+            return np.array([[len(sentence), ord(sentence[0])] for sentence in sentences], dtype=np.float32)
+
+    model = FakeModel()
+    path = str(tmp_path / "embeddings.sock")
+    loop = asyncio.new_event_loop()
+    server, batcher = loop.run_until_complete(start_server(path, model, max_wait_ms=200, max_request_bytes=1024))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        client = EmbeddingClient(path, timeout=5)
+        embeddings = client.encode(["a", "bb"])
+        assert embeddings.dtype == np.float32
+        assert embeddings.tolist() == [[1.0, 97.0], [2.0, 98.0]]
+
+        results = {}
+        threads = [threading.Thread(target=lambda text=text: results.update({text: client.encode([text])}))
+                   for text in ("x", "yy", "zzz")]
+        for worker in threads:
+            worker.start()
+        for worker in threads:
+            worker.join()
+        assert {text: rows.tolist() for text, rows in results.items()} == {
+            "x": [[1.0, 120.0]], "yy": [[2.0, 121.0]], "zzz": [[3.0, 122.0]]}
+        assert len(model.calls) == 2
+
+        with pytest.raises(EmbeddingServiceError, match="exceeds"):
+            client.encode(["x" * 2000])
+        assert client.encode(["a"]).tolist() == [[1.0, 97.0]]
+
+        # A timed out request is not sent again
+        with pytest.raises(socket.timeout):
+            EmbeddingClient(path, timeout=0.1).encode(["slow"])
+        time.sleep(0.6)
+        assert sum(call == ["slow"] for call in model.calls) == 1
+    finally:
+        async def shutdown():
+            server.close()
+            await batcher.stop()
+            connections = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in connections:
+                task.cancel()
+            await asyncio.gather(*connections, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(shutdown(), loop).result(5)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+        loop.close()
+
+
+def test_load_test_percentiles_and_baseline_comparison():
+    """The load test reports nearest-rank percentiles and flags p95 regressions beyond the tolerance."""
+    from benchmarks.load_test import compare, percentile
+
+    latencies = [float(value) for value in range(1, 101)]
+    assert percentile(latencies, 0.50) == 50.0
+    assert percentile(latencies, 0.95) == 95.0
+    assert percentile(latencies, 1.0) == 100.0
+    assert percentile([7.0], 0.99) == 7.0
+    assert percentile([], 0.5) is None
+
+    baseline = {"results": {"search": {"p95_ms": 100.0}, "get": {"p95_ms": 10.0}, "update": {"p95_ms": None}}}
+    current = {"results": {"search": {"p95_ms": 119.0}, "get": {"p95_ms": 13.0}, "update": {"p95_ms": 50.0},
+                           "all": {"p95_ms": 90.0}}}
+    assert compare(current, baseline, 0.2) == [{"operation": "get", "baseline_p95_ms": 10.0, "p95_ms": 13.0}]
+    assert compare(current, baseline, 0.5) == []
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,173 @@
+import json
+import lxml.html
+import pytest
+from crawler.link_extractor import extract_listing_links
+from crawler.tree_text import parse_tree_text, render_markdown
+from crawler.sharding import parse_shard, select_shard, write_manifest, merge_manifests
+
+
+def test_shards_partition_pages_and_law_ids():
+    """Every page and law ID lands in exactly one shard, whatever order the keys come in."""
+    pages = list(range(1, 162))
+    law_ids = [str(100000 + i) for i in range(500)]
+    shards = [parse_shard(f"{i}/4") for i in range(4)]
+
+    assert sorted(page for shard in shards for page in select_shard(pages, shard)) == pages
+    assert sorted(law_id for shard in shards for law_id in select_shard(law_ids, shard)) == law_ids
+    assert select_shard(reversed(law_ids), shards[1]) == list(reversed(select_shard(law_ids, shards[1])))
+
+    with pytest.raises(ValueError):
+        parse_shard("4/4")
+
+
+def test_merge_manifests(tmp_path):
+    """Merging keeps the links of all shards once and drops failures that a retry completed."""
+    write_manifest(tmp_path / "a.json", "pages", (0, 2), [2], [4], ["/Law/TreeText/?IDS=1", "/Law/TreeText/?IDS=2"])
+    write_manifest(tmp_path / "b.json", "pages", (1, 2), [1, 3], [], ["/Law/TreeText/?IDS=2", "/Law/TreeText/?IDS=3"])
+    write_manifest(tmp_path / "retry.json", "pages", (0, 2), [4], [], [])
+
+    merged = merge_manifests([tmp_path / "a.json", tmp_path / "b.json", tmp_path / "retry.json"])
+    assert merged["completed"] == [2, 1, 3, 4]
+    assert merged["failed"] == []
+    assert merged["links"] == ["/Law/TreeText/?IDS=1", "/Law/TreeText/?IDS=2", "/Law/TreeText/?IDS=3"]
+    assert json.loads((tmp_path / "a.json").read_text(encoding="utf-8"))["shard"] == "0/2"
+
+
+def test_http_scraper_retries_bad_gateway():
+    """The HTTP backend retries 502s from the mock until the page is served."""
+    pytest.importorskip("aiohttp")
+    pytest.importorskip("requests")
+    from benchmarks.mock_qavanin import MockQavanin, MockQavaninServer
+    from crawler.http_scraper import HttpWebScraper
+
+    mock = MockQavanin(laws=50, error_rate=0.5, seed=3)
+    with MockQavaninServer(mock) as server, HttpWebScraper(retries=10, backoff=0.001) as web_scraper:
+        content = web_scraper.get_page_content(server.base_url + "?PageNumber=1&page=1&size=25")
+    assert content.count("/Law/TreeText/?IDS=") == 25
+    assert mock.stats["requests"] == mock.stats["bad_gateway"] + 1
+
+
+LISTING_PAGE = (
+    '<html><body><div id="menu"><td class="text-justify"><a href="/menu">menu</a></td></div>'
+    '<div id="main"><table class="border-list table table-striped table-hover"><tbody>'
+    '<tr><td class="text-justify"><a href="/Law/TreeText/?IDS=1">1</a></td></tr>'
+    '<tr><td class="text-justify"><span><a href="/nested">nested</a></span><a href="/Law/TreeText/?IDS=2">2</a></td></tr>'
+    '<tr><td><a href="/other-cell">other</a></td></tr>'
+    '</tbody></table></div></body></html>'
+)
+LINKS_XPATH = ('//div[@id="main"]//table[@class="border-list table table-striped table-hover"]'
+               '//td[@class="text-justify"]/a/@href')
+
+
+@pytest.mark.parametrize("html_content", [
+    LISTING_PAGE,
+    # Not written the usual way, so the streaming parser is used instead of the table slice
+    LISTING_PAGE.replace('id="main"', "id='main'"),
+    LISTING_PAGE.encode("utf-8"),
+])
+def test_extract_listing_links_matches_xpath(html_content):
+    """The streaming extractor returns the same links as the full-tree XPath."""
+    expected = lxml.html.fromstring(html_content).xpath(LINKS_XPATH)
+    assert extract_listing_links(html_content) == expected == ["/Law/TreeText/?IDS=1", "/Law/TreeText/?IDS=2"]
+
+
+def test_parse_tree_text_records_hierarchy_and_offsets():
+    """TreeText paragraphs become article/note/clause records with offsets into the page text."""
+    html_content = (
+        '<html><head><title>قوانین</title></head><body><h1 class="LawTitle">قانون نمونه</h1>'
+        '<p class="SecTex">مصوب ۱۴۰۰/۲/۵</p>'
+        '<p class="SecTex">ماده ۱ - این <span>قانون</span> اجرا شود.</p>'
+        '<p class="SecTex">الف - بند اول</p>'
+        '<p class="SecTex">تبصره ۱ - یک تبصره</p>'
+        '<p class="SecTex">ب) بند زیر تبصره</p>'
+        '<p class="SecTex">ماده ۲ - ماده دوم</p>'
+        '<p class="SecTex">بند ج - بند سوم</p>'
+        '<p class="SecTex">در - این ماده بند نیست</p>'
+        '<p class="Other">فهرست</p></body></html>'
+    )
+    structure = parse_tree_text(html_content)
+
+    assert structure["title"] == "قانون نمونه"
+    assert structure["approval_date"] == "1400/02/05"
+    assert [(r["kind"], r["article"], r["note"], r["clause"]) for r in structure["records"]] == [
+        ("text", None, None, None),
+        ("article", "1", None, None),
+        ("clause", "1", None, "الف"),
+        ("note", "1", "1", None),
+        ("clause", "1", "1", "ب"),
+        ("article", "2", None, None),
+        ("clause", "2", None, "ج"),
+        ("text", "2", None, None),
+    ]
+    assert structure["records"][1]["body"] == "این قانون اجرا شود."
+    for record in structure["records"]:
+        assert structure["text"][record["start"]:record["end"]] == record["text"]
+
+    markdown = render_markdown(structure)
+    assert markdown.startswith("# قانون نمونه")
+    assert "### ماده ۱\n\nاین قانون اجرا شود." in markdown
+    assert "**تبصره ۱** - یک تبصره" in markdown
+    assert "- **ب** - بند زیر تبصره" in markdown
+
+
+def test_deduplicate_skips_repeats_and_near_duplicates():
+    from data_processing.dedup import content_hash, deduplicate, embed_distinct
+
+    law = " ".join(f"ماده {i} این قانون در تاریخ تصویب لازم الاجرا است" for i in range(40))
+    amended = law.replace("ماده 7 ", "ماده 7 اصلاحی ")
+    unrelated = " ".join(f"بند {i} آیین نامه اجرایی مالیات بر ارزش افزوده" for i in range(40))
+    documents = [
+        {"source_id": "1", "content": law},
+        {"source_id": "2", "content": amended},
+        {"source_id": "3", "content": unrelated},
+        {"source_id": "1", "content": unrelated},
+        {"source_id": "4", "content": "stored text"},
+        {"source_id": "5", "content": "recrawled text"},
+    ]
+    known_hashes = {content_hash("stored text"): ["9"], content_hash("recrawled text"): ["5", "6"]}
+
+    # Near-duplicates are kept unless asked for, and so is a law whose text is stored under another law ID
+    kept, skipped = deduplicate(documents, known_hashes=known_hashes)
+    assert [document["source_id"] for document in kept] == ["1", "2", "3", "4"]
+    assert [(s["source_id"], s["reason"], s["duplicate_of"]) for s in skipped] == [
+        ("1", "source_id", "1"), ("5", "unchanged", "5")]
+
+    kept, skipped = deduplicate(documents, near_duplicate_threshold=0.9, known_hashes=known_hashes)
+    assert [document["source_id"] for document in kept] == ["1", "3", "4"]
+    assert (skipped[0]["source_id"], skipped[0]["reason"], skipped[0]["duplicate_of"]) == ("2", "near_duplicate", "1")
+    assert skipped[0]["similarity"] >= 0.9
+
+    # Each distinct text is embedded once; a text stored under another law ID reuses its embedding
+    embedded = []
+    documents = [{"text": text, "content": text} for text in ("a", "b", "a", "stored text")]
+    embeddings = embed_distinct(documents, lambda texts: embedded.extend(texts) or [f"e({t})" for t in texts],
+                                {content_hash("stored text"): "stored"})
+    assert embedded == ["a", "b"]
+    assert embeddings == ["e(a)", "e(b)", "e(a)", "stored"]
+
+
+def test_html_link_extractor_returns_only_new_links():
+    """Each call returns the links of its own page, so a crawl does not repeat earlier pages' links."""
+    from crawler.parser import HTMLLinkExtractor, dedupe_links
+
+    page = ('<div id="main"><table class="border-list table table-striped table-hover">'
+            '<tr><td class="text-justify"><a href="/Law/TreeText/?IDS={}">law</a></td></tr></table></div>')
+    extractor = HTMLLinkExtractor()
+    assert extractor.extract_links(page.format(1)) == ["/Law/TreeText/?IDS=1"]
+    assert extractor.extract_links(page.format(2)) == ["/Law/TreeText/?IDS=2"]
+    assert extractor.get_urls() == ["/Law/TreeText/?IDS=1", "/Law/TreeText/?IDS=2"]
+    assert dedupe_links(["/Law/TreeText/?IDS=1", "/Law/TreeText/?IDS=2", "/Law/TreeText/?IDS=1&x=1"]) == \
+        ["/Law/TreeText/?IDS=1", "/Law/TreeText/?IDS=2"]
+
+
+def test_listing_metadata():
+    from crawler.metadata import listing_query, infer_law_type
+    from database.filters import normalize_approve_date
+
+    assert listing_query() == ""
+    assert listing_query("vote", "مالیات") == "&_IsVote=true&Zone=%D9%85%D8%A7%D9%84%DB%8C%D8%A7%D8%AA"
+    assert [infer_law_type(title) for title in ("قانون مالیات", "آيين نامه اجرایی", "رأی وحدت رویه", "فهرست")] == \
+        ["law", "regulation", "vote", None]
+    assert normalize_approve_date("۱۴۰۰/۲/۵") == "1400/02/05"
+    with pytest.raises(ValueError):
+        normalize_approve_date("1400/13/01")